@@ -1,152 +1,230 @@
-import hashlib
-import json
-import os
-from json import JSONDecodeError
-
+#     Copyright 2023, MCSL Team, mailto:lxhtt@vip.qq.com
+#
+#     Part of "MCSL2", a simple and multifunctional Minecraft server launcher.
+#
+#     Licensed under the GNU General Public License, Version 3.0, with our
+#     additional agreements. (the "License");
+#     you may not use this file except in compliance with the License.
+#     You may obtain a copy of the License at
+#
+#        https://github.com/MCSLTeam/MCSL2/raw/master/LICENSE
+#
+################################################################################
+"""
+Server config validation pass, checks every server's config and core file in parallel.
+"""
 
-class ServerSettingController:
-    _servers: dict = {}
+import os
+from concurrent.futures import ThreadPoolExecutor
+from json import loads
+from os import path as osp
+from typing import Dict, List, NamedTuple
+
+from PyQt5.QtCore import QObject, pyqtSignal
+
+from MCSL2Lib.Controllers.fileHashController import FileHashService
+from MCSL2Lib.Controllers.serverConfigRepository import (
+    SERVER_CONFIG_FILE,
+    ServerConfigRepository,
+)
+from MCSL2Lib.singleton import Singleton
+from MCSL2Lib.utils import MCSL2Logger
+
+MAX_WORKERS = 8
+
+# 配置中必须存在的键和类型，字符串不能为空，整数必须为正数
+_REQUIRED_KEYS = {
+    "core_file_name": str,
+    "java_path": str,
+    "min_memory": int,
+    "max_memory": int,
+    "memory_unit": str,
+    "jvm_arg": list,
+    "server_type": str,
+    "output_decoding": str,
+    "input_encoding": str,
+    "icon": str,
+}
+
+
+class ServerValidationResult(NamedTuple):
+    """一个服务器目录的检查结果"""
+
+    name: str
+    # 发现的问题，为空时配置有效
+    problems: List[str]
+    # 核心文件的MD5，找不到核心文件时为空
+    coreMd5: str
+    # 目录中有配置文件但不在服务器列表中
+    orphan: bool = False
+    # 服务器列表中记录的核心文件MD5与当前不同
+    coreChanged: bool = False
+
+    @property
+    def isValid(self) -> bool:
+        return not self.problems
+
+
+def checkServerConfig(config: dict) -> List[str]:
+    """检查配置中各项的类型和取值，返回发现的问题"""
+    problems = []
+    for key, _type in _REQUIRED_KEYS.items():
+        if key not in config:
+            problems.append(f"缺少配置项 {key}")
+            continue
+        value = config[key]
+        if not isinstance(value, _type) or (_type is int and isinstance(value, bool)):
+            problems.append(f"配置项 {key} 的类型不正确")
+        elif _type is str and value == "":
+            problems.append(f"配置项 {key} 为空")
+        elif _type is int and value <= 0:
+            problems.append(f"配置项 {key} 必须大于0")
+    if not problems:
+        if config["memory_unit"] not in ("M", "G"):
+            problems.append("内存单位只能为M或G")
+        if config["min_memory"] > config["max_memory"]:
+            problems.append("最小内存大于最大内存")
+    return problems
+
+
+def validateServerDir(serverDir: str, name: str, listed: bool) -> ServerValidationResult:
+    """检查一个服务器目录，在工作线程中调用；listed为目录是否在服务器列表中"""
+    problems = []
+    try:
+        entries = {entry.name: entry for entry in os.scandir(serverDir)}
+    except OSError as e:
+        return ServerValidationResult(name, [f"无法读取服务器目录：{e}"], "", not listed)
+
+    config = {}
+    configEntry = entries.get(SERVER_CONFIG_FILE)
+    if configEntry is None or not configEntry.is_file():
+        problems.append("配置文件不存在")
+    else:
+        try:
+            with open(configEntry.path, "r", encoding="utf-8") as f:
+                config = loads(f.read())
+            if not isinstance(config, dict):
+                raise ValueError("不是JSON对象")
+        except (OSError, ValueError) as e:
+            problems.append(f"配置文件损坏：{e}")
+            config = {}
+        else:
+            problems.extend(checkServerConfig(config))
+            if not listed and config.get("name") != name:
+                problems.append("配置中的名称与目录名不一致")
+
+    coreMd5 = ""
+    coreFileName = config.get("core_file_name")
+    if isinstance(coreFileName, str) and coreFileName:
+        coreEntry = entries.get(coreFileName)
+        if coreEntry is None or not coreEntry.is_file():
+            problems.append(f"核心文件 {coreFileName} 不存在")
+        else:
+            try:
+                coreMd5 = FileHashService().md5(coreEntry.path)
+            except OSError as e:
+                problems.append(f"无法读取核心文件：{e}")
+
+    storedMd5 = config.get("core_md5")
+    coreChanged = bool(coreMd5 and storedMd5 and storedMd5 != coreMd5)
+    return ServerValidationResult(name, problems, coreMd5, not listed, coreChanged)
+
+
+@Singleton
+class ServerSettingController(QObject):
+    """
+    启动时的服务器配置检查。\n
+    并行检查Servers下的每个服务器目录：配置文件能否读取、各项是否有效、核心文件是否存在，
+    并与服务器列表中记录的核心文件MD5比较。MD5由FileHashService计算并缓存，文件没有变化时
+    不会重新计算。有配置文件但不在列表中的有效服务器目录会加入列表。\n
+    检查不会移除任何服务器，有问题的服务器通过validationFinished报告，不会阻塞启动。
+    """
+
+    # 有问题的服务器(ServerValidationResult的列表)，以及本次加入列表的服务器名称
+    validationFinished = pyqtSignal(list, list)
+
+    def __init__(self, serversDir: str = "Servers"):
+        super().__init__()
+        self.serversDir = serversDir
+        self.results: Dict[str, ServerValidationResult] = {}
+
+    def load(self) -> List[ServerValidationResult]:
+        """
+        检查所有服务器，返回有问题的服务器。\n
+        会阻塞到检查完成，应在工作线程中调用(启动时在readLastServerConfigThread中调用)。
+        """
+        repository = ServerConfigRepository()
+        listed = set(repository.names())
+        try:
+            dirs = [entry for entry in os.scandir(self.serversDir) if entry.is_dir()]
+        except OSError as e:
+            MCSL2Logger.warning(f"无法读取服务器目录：{e}")
+            dirs = []
+        # 只检查列表中的服务器和含有配置文件的目录，其余目录不是服务器
+        targets = [
+            (entry.path, entry.name, entry.name in listed)
+            for entry in dirs
+            if entry.name in listed or osp.isfile(osp.join(entry.path, SERVER_CONFIG_FILE))
+        ]
+        found = {name for _, name, _ in targets}
+        results = [
+            ServerValidationResult(name, ["服务器目录不存在"], "")
+            for name in listed
+            if name not in found
+        ]
+        with ThreadPoolExecutor(max_workers=min(MAX_WORKERS, os.cpu_count() or 4)) as pool:
+            results.extend(pool.map(lambda t: validateServerDir(*t), targets))
+
+        adopted = []
+        for result in results:
+            if result.orphan:
+                if result.isValid and self._adopt(repository, result):
+                    adopted.append(result.name)
+            elif result.coreMd5:
+                self._recordCoreMd5(repository, result)
+        self.results = {result.name: result for result in results}
+        invalid = [r for r in results if not r.isValid or r.coreChanged]
+        for result in invalid:
+            problems = "；".join(result.problems) or "核心文件已变化"
+            MCSL2Logger.warning(f"服务器 {result.name} 的配置有问题：{problems}")
+        MCSL2Logger.info(
+            f"已检查{len(results)}个服务器，{len(invalid)}个有问题，加入列表{len(adopted)}个"
+        )
+        self.validationFinished.emit(invalid, adopted)
+        return invalid
 
-    @classmethod
-    def calcMD5(cls, serverName):
-        if serverName not in cls._servers:
-            return ""
+    def checkServerConfig(self, serverName: str) -> bool:
+        """上次检查时该服务器是否有效，未检查过时视为有效"""
+        result = self.results.get(serverName)
+        return result is None or result.isValid
 
-        file = os.path.join(
-            "MCSL2", "Servers", serverName, cls._servers.get(serverName)["core_file_name"]
-        )
+    def _adopt(self, repository, result: ServerValidationResult) -> bool:
+        """把目录中的配置加入服务器列表"""
         try:
-            with open(file, "rb") as f:
-                md5 = hashlib.md5(f.read()).hexdigest()
-            return md5
-        except FileNotFoundError:
-            return ""
-
-    @classmethod
-    def addServerConfig(cls, serverName, serverConfig):
-        cls._servers.update({serverName: serverConfig})
-
-    @classmethod
-    def checkServerConfig(cls, serverName):
-        if serverName not in cls._servers:
+            with open(
+                osp.join(self.serversDir, result.name, SERVER_CONFIG_FILE), "r", encoding="utf-8"
+            ) as f:
+                config = loads(f.read())
+            config["core_md5"] = result.coreMd5
+            repository.append(config)
+        except (OSError, ValueError) as e:
+            MCSL2Logger.warning(f"无法将服务器 {result.name} 加入列表：{e}")
             return False
-        return cls._checkServerConfig(cls._servers.get(serverName))
-
-    @classmethod
-    def _checkServerConfig(cls, config):
-        # check server core md5
-        if (t := config.get("core_md5")) != (md5 := cls.calcMD5(config.get("name"))):
-            if md5 == "":
-                return False  # 无法定位核心文件
-            elif t is None:
-                config["core_md5"] = md5
-            else:
-                return False  # 核心文件已被修改
-
-        # check server config
-        keys = {
-            "core_file_name": str,
-            "java_path": str,
-            "min_memory": int,
-            "max_memory": int,
-            "memory_unit": str,
-            "jvm_arg": list,
-            "server_type": str,
-            "output_decoding": str,
-            "input_encoding": str,
-            "icon": str,
-        }
-        configKeys = set(config.keys())
-        # if configKeys contains all keys
-        if set(keys.keys()).issubset(configKeys):
-            for key, _type in keys.items():
-                if not isinstance(config[key], _type):
-                    return False
-                if _type == str and config[key] == "":
-                    return False
-                if _type == int and config[key] <= 0:
-                    return False
-
+        MCSL2Logger.info(f"已将服务器目录 {result.name} 加入服务器列表")
         return True
 
-    @classmethod
-    def load(cls):
+    @staticmethod
+    def _recordCoreMd5(repository, result: ServerValidationResult):
         """
-        加载服务器配置,包括服务器列表和服务器配置,并检查配置是否正确
+        记录核心文件的MD5。\n
+        核心文件变化时只报告一次，之后以新的MD5为准，避免正常更换核心后每次启动都提示。
         """
-        # load server list
-        if os.path.exists(p := os.path.join("MCSL2", "MCSL2_Servers.json")):
-            with open(p, "r") as f:
-                try:
-                    cls._servers = json.load(f)
-                except JSONDecodeError:
-                    # make backup
-                    f.close()
-                    if os.path.exists(p := os.path.join("MCSL2", "MCSL2_Servers.json")):
-                        os.rename(p, p + ".bak")
-        elif os.path.exists(p := os.path.join("MCSL2", "MCSL2_ServerList.json")):  # 旧版兼容
-            with open(p, "r") as f:
-                try:
-                    cls._servers = json.load(f)["MCSLServerList"]  # 旧版兼容
-                    cls._servers = {e["name"]: e for e in cls._servers}  # 将旧版的List转为Dict
-                except JSONDecodeError:
-                    # make backup
-                    f.close()
-                    if os.path.exists(p := os.path.join("MCSL2", "MCSL2_ServerList.json")):
-                        os.rename(p, p + ".bak")
-        else:
-            pass  # 默认为空
-        # end load server list
-
-        # check server list
-        for idx, e in enumerate(cls._servers.copy()):
-            if not cls.checkServerConfig(e["name"]):
-                cls._servers[e["name"]] = None
-        cls._servers = {k: v for k, v in cls._servers.items() if v is not None}
-        # end check server list
-
-        # load server config from dirs : MCSL2\Servers\*
-        servers: dict = {}
-        for e in os.listdir(p := os.path.join("MCSL2", "Servers")):
-            if not os.path.isdir(os.path.join(p, e)):
-                continue
-
-            if os.path.exists(os.path.join(p, e, "MCSL2ServerConfig.json")):
-                try:
-                    with open(os.path.join(p, e, "MCSL2ServerConfig.json"), "r") as f:
-                        servers.append(json.load(f))
-                except:
-                    pass
-
-        # check server config
-        for name, e in enumerate(servers.items()):
-            if not cls._checkServerConfig(e):
-                if servers.get(name) is not None:
-                    pass
-                else:
-                    servers[name] = None  # 如果存在重名的服务器,则不添加
-        servers = {k: v for k, v in servers.items() if v is not None}
-        # end check server config
-
-        # combine server config
-        cls._servers = {**cls._servers, **servers}
-
-    @classmethod
-    def save(cls):
-        # make backup
-        if os.path.exists(p := os.path.join("MCSL2", "MCSL2_Servers.json")):
-            os.rename(p, p + ".bak")
-        with open(p, "w") as f:
-            json.dump(cls._servers, f)
-
-        # save server config
-        for name, e in cls._servers.items():
-            # 如果服务器文件夹不存在，则跳过
-            if not os.path.exists(os.path.exists(p := os.path.join("MCSL2", "Servers", name))):
-                continue
-            os.rename(p, p + ".bak")
-            with open(p, "w") as f:
-                json.dump(e, f)
-
-    def __new__(cls, *args, **kwargs):
-        raise RuntimeError("不要new这个啊啊啊啊啊啊啊啊啊啊啊啊啊啊")
+        record = repository.get(result.name)
+        if record is None or record.extra.get("core_md5") == result.coreMd5:
+            return
+        config = record.toDict()
+        config["core_md5"] = result.coreMd5
+        try:
+            repository.update(result.name, config)
+        except (OSError, KeyError, ValueError) as e:
+            MCSL2Logger.warning(f"无法记录服务器 {result.name} 的核心文件MD5：{e}")
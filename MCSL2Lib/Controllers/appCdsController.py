@@ -0,0 +1,274 @@
+#     Copyright 2023, MCSL Team, mailto:lxhtt@vip.qq.com
+#
+#     Part of "MCSL2", a simple and multifunctional Minecraft server launcher.
+#
+#     Licensed under the GNU General Public License, Version 3.0, with our
+#     additional agreements. (the "License");
+#     you may not use this file except in compliance with the License.
+#     You may obtain a copy of the License at
+#
+#        https://github.com/MCSLTeam/MCSL2/raw/master/LICENSE
+#
+################################################################################
+"""
+AppCDS (class data sharing) archives per server and per Java, to speed up JVM startup.
+"""
+
+import hashlib
+import os
+import re
+from json import dumps, loads
+from os import path as osp
+from shutil import which
+from typing import Dict, List, Optional
+
+from MCSL2Lib.Controllers.javaDetector import getJavaVersion
+from MCSL2Lib.utils import MCSL2Logger, writeFileAtomic
+
+CDS_DIR_NAME = "MCSL2AppCDS"
+JAVA_VERSION_CACHE_FILE = "MCSL2/MCSL2_JavaVersionCache.json"
+# -XX:ArchiveClassesAtExit(动态归档)从JDK 13开始支持
+MIN_CDS_JAVA = 13
+# JDK 19起可用-XX:+AutoCreateSharedArchive，归档失效时由JVM自动重建
+AUTO_CREATE_JAVA = 19
+# 会影响归档是否可用的目录，其中的文件增删改都会使归档失效
+TRACKED_DIRS = ("mods", "libraries")
+CDS_FLAG_PREFIXES = (
+    "-XX:SharedArchiveFile=",
+    "-XX:ArchiveClassesAtExit=",
+    "-XX:+AutoCreateSharedArchive",
+)
+# 只影响堆大小的参数，与归档能否使用无关，不计入指纹；改内存不会使归档失效
+HEAP_SIZE_FLAG_PREFIXES = (
+    "-Xms",
+    "-Xmx",
+    "-Xmn",
+    "-XX:MaxRAM",
+    "-XX:InitialRAMPercentage=",
+    "-XX:MinRAMPercentage=",
+    "-XX:MaxHeapSize=",
+    "-XX:InitialHeapSize=",
+    "-XX:MinHeapSize=",
+    "-XX:NewSize=",
+    "-XX:MaxNewSize=",
+)
+
+_RELEASE_VERSION_PATTERN = re.compile(r'^JAVA_VERSION="([^"]+)"', re.MULTILINE)
+# Java路径 -> [文件戳, 主版本号]，首次使用时从JAVA_VERSION_CACHE_FILE读取
+_javaVersionCache: Optional[Dict[str, list]] = None
+
+
+def fileStamp(path: str) -> str:
+    """文件的大小和修改时间，不存在时为"-" """
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return "-"
+    return f"{stat.st_size}:{stat.st_mtime_ns}"
+
+
+def majorVersion(version: str) -> int:
+    """从版本字符串取主版本号，如1.8.0_392为8、17.0.9为17，无法识别时为0"""
+    match = re.match(r"(\d+)(?:\.(\d+))?", version)
+    if match is None:
+        return 0
+    major = int(match.group(1))
+    if major == 1 and match.group(2):
+        return int(match.group(2))
+    return major
+
+
+def resolveJava(javaPath: str) -> str:
+    return osp.realpath(which(javaPath) or javaPath)
+
+
+def _loadJavaVersionCache() -> Dict[str, list]:
+    global _javaVersionCache
+    if _javaVersionCache is None:
+        try:
+            with open(JAVA_VERSION_CACHE_FILE, "r", encoding="utf-8") as f:
+                _javaVersionCache = dict(loads(f.read()))
+        except FileNotFoundError:
+            _javaVersionCache = {}
+        except (OSError, ValueError, TypeError) as e:
+            MCSL2Logger.warning(f"读取Java版本缓存失败，将重新获取：{e}")
+            _javaVersionCache = {}
+    return _javaVersionCache
+
+
+def javaMajorVersion(javaPath: str) -> int:
+    """
+    Java主版本号。\n
+    优先读取JAVA_HOME下的release文件，没有时才运行java -version。
+    结果按Java路径和文件戳缓存并写入MCSL2_JavaVersionCache.json，
+    Java没有变化时重启MCSL2也不会再在界面线程中运行java -version。
+    """
+    javaPath = resolveJava(javaPath)
+    stamp = fileStamp(javaPath)
+    cache = _loadJavaVersionCache()
+    cached = cache.get(javaPath)
+    if isinstance(cached, list) and len(cached) == 2 and cached[0] == stamp:
+        return int(cached[1])
+    version = ""
+    try:
+        with open(
+            osp.join(osp.dirname(osp.dirname(javaPath)), "release"), "r", encoding="utf-8"
+        ) as f:
+            match = _RELEASE_VERSION_PATTERN.search(f.read())
+            if match is not None:
+                version = match.group(1)
+    except OSError:
+        pass
+    if not version and osp.exists(javaPath):
+        version = getJavaVersion(javaPath)
+    major = majorVersion(version)
+    cache[javaPath] = [stamp, major]
+    try:
+        writeFileAtomic(JAVA_VERSION_CACHE_FILE, dumps(cache, separators=(",", ":")))
+    except OSError as e:
+        MCSL2Logger.warning(f"保存Java版本缓存失败：{e}")
+    return major
+
+
+class AppCdsArchive:
+    """
+    一个服务器在一个Java下的AppCDS归档。\n
+    归档文件名取自指纹：Java、启动参数、核心文件(或Forge的参数文件)以及mods、libraries目录中
+    每个文件的大小和修改时间，任何一项变化都会得到新的文件名，旧归档随即删除。\n
+    第一次启动时加上-XX:ArchiveClassesAtExit，服务器正常关闭时JVM写出归档；
+    之后的启动加上-XX:SharedArchiveFile使用它。非正常退出时删除可能不完整的归档，
+    崩溃后自动重启时也不再创建。
+    """
+
+    def __init__(self, serverDir: str, javaPath: str, args: List[str]):
+        self.serverDir = serverDir
+        self.javaPath = javaPath
+        self.args = [a for a in args if not a.startswith(CDS_FLAG_PREFIXES)]
+        self.javaVersion = javaMajorVersion(javaPath)
+        self.archiveDir = osp.join(serverDir, CDS_DIR_NAME)
+        self.archivePath = self.currentArchivePath()
+        # 本次启动是否在创建归档
+        self.creating = False
+        # 创建归档时服务器非正常退出
+        self.creationFailed = False
+
+    def isSupported(self) -> bool:
+        return self.javaVersion >= MIN_CDS_JAVA
+
+    def _trackedFiles(self) -> List[str]:
+        """参数中引用的文件：-jar的核心文件、Forge的@参数文件"""
+        files = []
+        for i, arg in enumerate(self.args):
+            if arg == "-jar" and i + 1 < len(self.args):
+                files.append(self.args[i + 1])
+            elif arg.startswith("@"):
+                files.append(arg[1:])
+        return files
+
+    def fingerprint(self) -> str:
+        digest = hashlib.sha1()
+
+        def feed(*parts: str):
+            digest.update("\0".join(parts).encode("utf-8", errors="replace") + b"\n")
+
+        javaPath = resolveJava(self.javaPath)
+        feed("java", javaPath, fileStamp(javaPath), str(self.javaVersion))
+        feed("args", *(a for a in self.args if not a.startswith(HEAP_SIZE_FLAG_PREFIXES)))
+        for file in self._trackedFiles():
+            feed("file", file, fileStamp(osp.join(self.serverDir, file)))
+        for directory in TRACKED_DIRS:
+            root = osp.join(self.serverDir, directory)
+            for dirPath, dirNames, fileNames in os.walk(root):
+                dirNames.sort()
+                for name in sorted(fileNames):
+                    if name.endswith((".jar", ".zip")):
+                        path = osp.join(dirPath, name)
+                        feed("dep", osp.relpath(path, root), fileStamp(path))
+        return digest.hexdigest()
+
+    def currentArchivePath(self) -> str:
+        return osp.join(self.archiveDir, f"{self.fingerprint()[:20]}.jsa")
+
+    def removeStaleArchives(self):
+        """删除指纹不再匹配的旧归档"""
+        if not osp.isdir(self.archiveDir):
+            return
+        for name in os.listdir(self.archiveDir):
+            path = osp.join(self.archiveDir, name)
+            if path != self.archivePath:
+                try:
+                    os.remove(path)
+                    MCSL2Logger.info(f"AppCDS归档已失效，已删除：{path}")
+                except OSError:
+                    pass
+
+    def apply(self, args: List[str]) -> List[str]:
+        """返回加入了CDS参数的启动参数，Java版本不支持时原样返回"""
+        args = [a for a in args if not a.startswith(CDS_FLAG_PREFIXES)]
+        if not self.isSupported():
+            MCSL2Logger.info(f"Java {self.javaVersion or '未知版本'} 不支持动态AppCDS归档，已跳过")
+            return args
+        os.makedirs(self.archiveDir, exist_ok=True)
+        self.removeStaleArchives()
+        archive = osp.abspath(self.archivePath)
+        if self.javaVersion >= AUTO_CREATE_JAVA:
+            flags = ["-XX:+AutoCreateSharedArchive", f"-XX:SharedArchiveFile={archive}"]
+            self.creating = not osp.exists(archive)
+        elif osp.exists(archive):
+            flags = [f"-XX:SharedArchiveFile={archive}"]
+        else:
+            flags = [f"-XX:ArchiveClassesAtExit={archive}"]
+            self.creating = True
+        MCSL2Logger.info(
+            ("正在创建AppCDS归档：" if self.creating else "使用AppCDS归档：") + archive
+        )
+        return self._insertFlags(args, flags)
+
+    def relaunchArgs(self, args: List[str]) -> List[str]:
+        """
+        崩溃或重启后按原参数重新启动时调用，返回更新了CDS参数的启动参数。\n
+        上次创建归档时非正常退出则不再创建，避免每次自动重启都带上创建归档的参数；
+        上次已创建成功则改为使用归档。
+        """
+        if self.creationFailed:
+            MCSL2Logger.info("上次创建AppCDS归档时服务器未正常关闭，重新启动时不再创建")
+            return [a for a in args if not a.startswith(CDS_FLAG_PREFIXES)]
+        if not self.creating and osp.exists(self.archivePath):
+            args = [a for a in args if not a.startswith(CDS_FLAG_PREFIXES)]
+            flags = [f"-XX:SharedArchiveFile={osp.abspath(self.archivePath)}"]
+            if self.javaVersion >= AUTO_CREATE_JAVA:
+                flags.insert(0, "-XX:+AutoCreateSharedArchive")
+            return self._insertFlags(args, flags)
+        return args
+
+    @staticmethod
+    def _insertFlags(args: List[str], flags: List[str]) -> List[str]:
+        # JVM选项必须在-jar或@参数文件之前，放在-Xms/-Xmx之后即可
+        position = next(
+            (i for i, a in enumerate(args) if not a.startswith("-X")),
+            len(args),
+        )
+        return args[:position] + flags + args[position:]
+
+    def onServerExited(self, exitCode: int) -> Optional[bool]:
+        """服务器退出后调用，返回本次是否成功创建了归档，没有在创建时返回None"""
+        if not self.creating:
+            return None
+        self.creating = False
+        if exitCode == 0 and osp.exists(self.archivePath):
+            # 服务端第一次运行时可能下载依赖或改写文件，归档对应的是运行结束时的状态
+            archivePath = self.currentArchivePath()
+            if archivePath != self.archivePath:
+                os.replace(self.archivePath, archivePath)
+                self.archivePath = archivePath
+            MCSL2Logger.info(
+                f"AppCDS归档已创建：{self.archivePath}，"
+                f"{osp.getsize(self.archivePath) / 1024 / 1024:.1f}MB"
+            )
+            return True
+        self.creationFailed = True
+        try:
+            os.remove(self.archivePath)
+        except OSError:
+            pass
+        return False
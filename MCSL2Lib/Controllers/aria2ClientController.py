@@ -14,11 +14,10 @@
 A controller for aria2 download engine.
 """
 
-import hashlib
 import json
 import subprocess
 import time
-from os import getcwd, mkdir, remove
+from os import getcwd, mkdir, remove, stat
 from os import path as osp
 from platform import system
 from shutil import which
@@ -28,6 +27,7 @@ from typing import Optional, Callable, Dict
 from PyQt5.QtCore import QThread, pyqtSignal, QObject, QProcess, QTimer, QMutex
 from aria2p import Client, API, Download
 
+from MCSL2Lib.Controllers.fileHashController import FileHashService
 from MCSL2Lib.Controllers.settingsController import cfg
 from MCSL2Lib.utils import workingThreads
 from MCSL2Lib.utils import MCSL2Logger
@@ -804,6 +804,8 @@ class DL_EntryManager(QObject):
         super().__init__()
         self.entries = _entries
         self.mutex = mutex
+        # 本次是否有记录的校验标记被更新，需要写回文件
+        self.stampsChanged = False
 
     def fileExisted(self):
         """
@@ -817,9 +819,15 @@ class DL_EntryManager(QObject):
                 f.write("{}")
 
     def read(self, check=True, autoDelete=True):
+        """
+        读取下载记录，check为True时检查每条记录的核心文件。\n
+        只有校验标记与文件不一致的核心文件才会重新计算md5；有记录被删除或校验标记更新时才写回文件。
+        """
         self.fileExisted()
         with open(DL_EntryManager.file, "r") as f:
             self.entries = json.load(f)
+        self.stampsChanged = False
+        count = len(self.entries)
         for coreName, coreData in self.entries.copy().items():
             if check and not self.checkCoreEntry(coreName, coreData["md5"], autoDelete):
                 MCSL2Logger.info(f"删除不完整的核心文件记录: {coreName}")
@@ -827,7 +835,8 @@ class DL_EntryManager(QObject):
                     self.entries.pop(coreName)
                 except KeyError:
                     pass
-        self.flush()
+        if self.stampsChanged or len(self.entries) != count:
+            self.flush()
         MCSL2Logger.info(f"读取下载记录: {len(self.entries)}条")
         self.onReadEntries.emit(self.entries)
         return self.entries
@@ -850,11 +859,22 @@ class DL_EntryManager(QObject):
         """
         coreFileName = osp.join(self.path, coreName)
         # 计算md5
-        with open(coreFileName, "rb") as f:
-            md5 = hashlib.md5(f.read()).hexdigest()
-        extraData.update({"md5": md5})
+        md5 = FileHashService().md5(coreFileName)
+        extraData.update({"md5": md5, "verified": self.verificationStamp(coreFileName, md5)})
         self.addEntry(coreName, extraData)
 
+    @staticmethod
+    def verificationStamp(coreFileName: str, md5: str) -> Optional[dict]:
+        """
+        核心文件的校验标记：校验通过时文件的大小、修改时间和md5。\n
+        文件的大小和修改时间都没变时，不需要重新计算md5。
+        """
+        try:
+            fileStat = stat(coreFileName)
+        except OSError:
+            return None
+        return {"size": fileStat.st_size, "mtime": fileStat.st_mtime_ns, "md5": md5}
+
     def popCoreEntry(self, coreName: str, autoDelete=True) -> Dict:
         """
         删除核心文件的记录并返回删除的记录的原条目，如果autoDelete为True则同时删除核心文件
@@ -892,10 +912,23 @@ class DL_EntryManager(QObject):
         """
         coreFileName = osp.join(self.path, coreName)
         if osp.exists(coreFileName):
-            # 计算md5
-            with open(coreFileName, "rb") as f:
-                fileMd5 = hashlib.md5(f.read()).hexdigest()
+            # 校验标记与文件一致时不再计算md5
+            stamp = self.verificationStamp(coreFileName, originMd5)
+            self.mutex.lock()
+            verified = self.entries.get(coreName, {}).get("verified")
+            self.mutex.unlock()
+            if stamp is not None and verified == stamp:
+                return True
+            try:
+                fileMd5 = FileHashService().md5(coreFileName)
+            except OSError:
+                fileMd5 = ""
             if fileMd5 == originMd5:
+                self.mutex.lock()
+                if coreName in self.entries:
+                    self.entries[coreName]["verified"] = stamp
+                    self.stampsChanged = True
+                self.mutex.unlock()
                 return True
             if autoDelete:
                 try:  # 删除文件和记录
@@ -946,12 +979,13 @@ class DL_EntryManager(QObject):
 
     def GetEntries(self, check=True, autoDelete=True):
         """
-        获取所有正确的记录
+        获取所有正确的记录，与read一样只在有记录被删除或校验标记更新时写回文件
         """
         self.mutex.lock()
         entries_snapshot = self.entries.copy()
         self.mutex.unlock()
         rv = entries_snapshot.copy()
+        self.stampsChanged = False
 
         # # 检查记录一致性
         # with open(self.file, "r") as f:
@@ -966,7 +1000,8 @@ class DL_EntryManager(QObject):
         for entryName in entries_snapshot.keys():
             if self.tryGetEntry(entryName, check, autoDelete) is None:
                 rv.pop(entryName)
-        self.flush()
+        if self.stampsChanged or len(self.entries) != len(entries_snapshot):
+            self.flush()
         # else:
         #     print("记录一致,无需重新计算各条目完整性")
         return rv
@@ -1013,7 +1048,8 @@ class DL_EntryController(QObject):
         self.mutex = entries_mutex
         self.entries = entries
         self.worker = DL_EntryManager(self.entries, self.mutex)
-        self.worker.read()
+        # 这里只读取记录，不检查核心文件；检查在工作线程中第一次获取记录时进行
+        self.worker.read(check=False)
         self.worker.moveToThread(workingThreads.getThread("DL_Entry"))
 
         self.resultReady.connect(lambda _: self.worker.deleteLater())
@@ -1029,4 +1065,4 @@ def set_entries(_):
 
 # entries = DL_EntryManager(entries, entries_mutex).read()
 (controller := DL_EntryController()).resultReady.connect(lambda d: set_entries(d))
-controller.work.emit(("read", {}))
+controller.work.emit(("read", {"check": False}))
@@ -0,0 +1,141 @@
+#     Copyright 2023, MCSL Team, mailto:lxhtt@vip.qq.com
+#
+#     Part of "MCSL2", a simple and multifunctional Minecraft server launcher.
+#
+#     Licensed under the GNU General Public License, Version 3.0, with our
+#     additional agreements. (the "License");
+#     you may not use this file except in compliance with the License.
+#     You may obtain a copy of the License at
+#
+#        https://github.com/MCSLTeam/MCSL2/raw/master/LICENSE
+#
+################################################################################
+"""
+Bounded console log buffer, keeps the newest lines compactly in memory and
+spills older lines to a log file on disk.
+"""
+
+import os
+from array import array
+from os import path as osp
+from typing import Iterable, Optional, Tuple
+
+from MCSL2Lib.utils import MCSL2Logger
+
+
+class ConsoleLogBuffer:
+    """
+    有上限的终端日志环形缓冲区。\n
+    所有行以UTF-8连续存放在一个bytearray里，另用数组记录每行的结束偏移和颜色等级，
+    每行只多占用9字节。\n
+    行数超过上限时，一次性淘汰最旧的1/8，被淘汰的行追加写入spillPath(若有)，
+    因此无论服务器运行多久，内存占用都是平的。\n
+    清空时剩余的行也写入spillPath，磁盘上保留完整的日志；每次启动服务器时由rotateSpill
+    把上一次的日志改名为.1保留。
+    """
+
+    def __init__(self, capacity: int = 5000, spillPath: Optional[str] = None):
+        self.capacity = max(capacity, 1)
+        self.spillPath = spillPath
+        self._data = bytearray()
+        self._ends = array("Q")  # 每行(含换行符)在_data中的结束偏移
+        self._levels = bytearray()  # 每行的颜色等级
+        self._spillFile = None
+        # 累计被淘汰的行数，供视图计算行号的变化
+        self.evictedLines = 0
+
+    def __len__(self) -> int:
+        return len(self._ends)
+
+    def setCapacity(self, capacity: int):
+        self.capacity = max(capacity, 1)
+        self._evict()
+
+    def append(self, text: str, level: int = 0):
+        """追加一行，level为颜色等级"""
+        self._data += text.encode("utf-8", errors="surrogateescape")
+        self._data += b"\n"
+        self._ends.append(len(self._data))
+        self._levels.append(level)
+        self._evict()
+
+    def extend(self, lines: Iterable[Tuple[str, int]]):
+        """追加多行已分类的日志，每项为(文本, 颜色等级)"""
+        data, ends, levels = self._data, self._ends, self._levels
+        for text, level in lines:
+            data += text.encode("utf-8", errors="surrogateescape")
+            data += b"\n"
+            ends.append(len(data))
+            levels.append(level)
+        self._evict()
+
+    def text(self, row: int) -> str:
+        start = self._ends[row - 1] if row else 0
+        return self._data[start : self._ends[row] - 1].decode("utf-8", errors="surrogateescape")
+
+    def level(self, row: int) -> int:
+        return self._levels[row]
+
+    def __iter__(self):
+        return (self.text(row) for row in range(len(self)))
+
+    def _evict(self):
+        count = len(self._ends)
+        if count <= self.capacity:
+            return
+        # 多淘汰一些，摊薄移动内存的开销
+        drop = min(count, count - self.capacity + self.capacity // 8)
+        cut = self._ends[drop - 1]
+        self._spill(cut)
+        del self._data[:cut]
+        self._ends = array("Q", (end - cut for end in self._ends[drop:]))
+        del self._levels[:drop]
+        self.evictedLines += drop
+
+    def _spill(self, cut: int):
+        """把_data的前cut字节写入磁盘"""
+        if self.spillPath is None:
+            return
+        try:
+            if self._spillFile is None:
+                os.makedirs(osp.dirname(self.spillPath) or ".", exist_ok=True)
+                self._spillFile = open(self.spillPath, "ab")
+            with memoryview(self._data) as view:
+                self._spillFile.write(view[:cut])
+            self._spillFile.flush()
+        except OSError as e:
+            MCSL2Logger.warning(f"写入终端日志文件{self.spillPath}失败：{e}")
+            self.spillPath = None
+
+    def clear(self, truncateSpill: bool = False):
+        """
+        清空缓冲区，剩余的行写入磁盘上的日志文件；truncateSpill为True时改为删除日志文件
+        """
+        if not truncateSpill and self._ends:
+            self._spill(len(self._data))
+        self.evictedLines += len(self._ends)
+        self._data = bytearray()
+        self._ends = array("Q")
+        self._levels = bytearray()
+        if truncateSpill and self.spillPath is not None:
+            self.closeSpill()
+            if osp.exists(self.spillPath):
+                try:
+                    os.remove(self.spillPath)
+                except OSError:
+                    pass
+
+    def rotateSpill(self):
+        """把磁盘上的日志文件改名为.1(覆盖更早的)，之后的行写入新文件"""
+        self.closeSpill()
+        if self.spillPath is None or not osp.exists(self.spillPath):
+            return
+        try:
+            os.replace(self.spillPath, f"{self.spillPath}.1")
+        except OSError as e:
+            MCSL2Logger.warning(f"轮换终端日志文件{self.spillPath}失败：{e}")
+
+    def closeSpill(self):
+        if self._spillFile is not None:
+            self._spillFile.close()
+            self._spillFile = None
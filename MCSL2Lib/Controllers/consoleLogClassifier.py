@@ -0,0 +1,169 @@
+#     Copyright 2023, MCSL Team, mailto:lxhtt@vip.qq.com
+#
+#     Part of "MCSL2", a simple and multifunctional Minecraft server launcher.
+#
+#     Licensed under the GNU General Public License, Version 3.0, with our
+#     additional agreements. (the "License");
+#     you may not use this file except in compliance with the License.
+#     You may obtain a copy of the License at
+#
+#        https://github.com/MCSLTeam/MCSL2/raw/master/LICENSE
+#
+################################################################################
+"""
+Single-pass console log classifier, picks the color level, strips ANSI codes and
+translates known phrases of a server log line at once.
+"""
+
+import enum
+import re
+from typing import Dict, NamedTuple, Optional, Tuple
+
+
+class ConsoleLogLevel(enum.IntEnum):
+    """日志颜色等级，数值越大优先级越高(与旧版关键词循环的覆盖顺序一致)"""
+
+    NONE = 0
+    INFO = 1  # 绿
+    WARN = 2  # 橙
+    ERROR = 3  # 红
+    DEBUG = 4  # 蓝
+
+
+_LEVELS = tuple(ConsoleLogLevel)
+
+
+class ConsoleLogFlag(enum.IntFlag):
+    NONE = 0
+    HIDDEN = enum.auto()  # 无需显示的行
+    LOADING_LIBRARIES = enum.auto()  # 服务器开始加载
+    DONE_WORD = enum.auto()  # 含有"Done"
+    EXCLAMATION = enum.auto()  # 含有"!"
+    INVALID_CHAR = enum.auto()  # 含有无法解码的字符
+
+
+class ClassifiedLine(NamedTuple):
+    text: str
+    level: ConsoleLogLevel
+    flags: ConsoleLogFlag
+
+    @property
+    def isDone(self) -> bool:
+        """服务器启动完成的行，即同时含有"Done"和"!" """
+        return ConsoleLogFlag.DONE_WORD in self.flags and ConsoleLogFlag.EXCLAMATION in self.flags
+
+
+# fmt: off
+LEVEL_KEYWORDS: Dict[ConsoleLogLevel, Tuple[str, ...]] = {
+    ConsoleLogLevel.INFO: ("INFO", "Info", "info", "tip", "tips", "hint", "HINT", "提示"),
+    ConsoleLogLevel.WARN: (
+        "WARN", "Warning", "warn", "alert", "ALERT", "Alert", "CAUTION", "Caution", "警告",
+    ),
+    ConsoleLogLevel.ERROR: (
+        "ERR", "Err", "Fatal", "FATAL", "Critical", "Danger", "DANGER", "错",
+        "at java", "at net", "at oolloo", "Caused by", "at sun",
+    ),
+    ConsoleLogLevel.DEBUG: (
+        "DEBUG", "Debug", "debug", "调试", "TEST", "Test", "Unknown command", "MCSL2",
+    ),
+}
+# fmt: on
+
+FLAG_KEYWORDS: Dict[str, ConsoleLogFlag] = {
+    "Disabling terminal, you're running in an unsupported environment.": ConsoleLogFlag.HIDDEN,
+    "Advanced terminal features are not available in this environment": ConsoleLogFlag.HIDDEN,
+    "Unable to instantiate org.fusesource.jansi.WindowsAnsiOutputStream": ConsoleLogFlag.HIDDEN,
+    "Loading libraries, please wait...": ConsoleLogFlag.LOADING_LIBRARIES,
+    "Done": ConsoleLogFlag.DONE_WORD,
+    "!": ConsoleLogFlag.EXCLAMATION,
+    "�": ConsoleLogFlag.INVALID_CHAR,
+}
+
+# ANSI颜色控制码，包括ESC已被去掉的残缺形式；不带参数的"[m"只在紧跟"["时去掉，以免误伤"[main/INFO]"
+ANSI_PATTERN = r"\x1b\[[\d;]*m|\[\d{1,3}(?:;\d{1,3})*m|\[m(?=\[)"
+
+
+class ConsoleLogClassifier:
+    """
+    预编译的日志分类器。\n
+    所有关键词、需翻译的短语和ANSI控制码被合并为一个正则，每行只扫描一次。\n
+    translations: 原文 -> 译文，应由界面使用self.tr()预先翻译好后传入
+    """
+
+    def __init__(self, translations: Optional[Dict[str, str]] = None):
+        translations = translations or {}
+        # token -> (替换文本, 等级, 标志)，等级和标志存为int以减少每次匹配的开销
+        self._tokens: Dict[str, Tuple[str, int, int]] = {}
+        for token in set(translations) | set(FLAG_KEYWORDS) | {
+            k for keywords in LEVEL_KEYWORDS.values() for k in keywords
+        }:
+            self._tokens[token] = (
+                translations.get(token, token),
+                int(self._levelOf(token)),
+                int(self._flagsOf(token)),
+            )
+        # 所有token合并为一棵前缀树形式的正则，匹配时贪婪地取最长的一个，
+        # 保证"main/INFO"优先于"INFO"，"ERROR"优先于"ERR"；
+        # 前面的首字符预检让大部分位置不用进入分支就能跳过
+        firstChars = "".join(sorted({re.escape(t[0]) for t in self._tokens}))
+        self._pattern = re.compile(
+            f"(?=[\\x1b\\[{firstChars}])"
+            f"(?:(?P<ansi>{ANSI_PATTERN})|(?P<token>{self._buildTriePattern(self._tokens)}))"
+        )
+        self._level = 0
+        self._flags = 0
+
+    @staticmethod
+    def _buildTriePattern(tokens) -> str:
+        """把一组字符串构建为前缀树形式的正则"""
+        root: dict = {}
+        for token in tokens:
+            node = root
+            for char in token:
+                node = node.setdefault(char, {})
+            node[""] = True
+
+        def build(node: dict) -> str:
+            branches = [
+                re.escape(char) + build(child) for char, child in sorted(node.items()) if char
+            ]
+            if not branches:
+                return ""
+            isEnd = "" in node
+            if len(branches) == 1 and not isEnd:
+                return branches[0]
+            return f"(?:{'|'.join(branches)}){'?' if isEnd else ''}"
+
+        return build(root)
+
+    @staticmethod
+    def _levelOf(token: str) -> ConsoleLogLevel:
+        level = ConsoleLogLevel.NONE
+        for keywordLevel, keywords in LEVEL_KEYWORDS.items():
+            if keywordLevel > level and any(k in token for k in keywords):
+                level = keywordLevel
+        return level
+
+    @staticmethod
+    def _flagsOf(token: str) -> ConsoleLogFlag:
+        flags = ConsoleLogFlag.NONE
+        for keyword, flag in FLAG_KEYWORDS.items():
+            if keyword in token:
+                flags |= flag
+        return flags
+
+    def _onMatch(self, match) -> str:
+        if match.lastgroup == "ansi":
+            return ""
+        replacement, level, flags = self._tokens[match.group()]
+        if level > self._level:
+            self._level = level
+        self._flags |= flags
+        return replacement
+
+    def classify(self, line: str) -> ClassifiedLine:
+        """对一行日志分类并改写"""
+        self._level = 0
+        self._flags = 0
+        text = self._pattern.sub(self._onMatch, line)
+        return ClassifiedLine(text, _LEVELS[self._level], ConsoleLogFlag(self._flags))
@@ -0,0 +1,201 @@
+#     Copyright 2023, MCSL Team, mailto:lxhtt@vip.qq.com
+#
+#     Part of "MCSL2", a simple and multifunctional Minecraft server launcher.
+#
+#     Licensed under the GNU General Public License, Version 3.0, with our
+#     additional agreements. (the "License");
+#     you may not use this file except in compliance with the License.
+#     You may obtain a copy of the License at
+#
+#        https://github.com/MCSLTeam/MCSL2/raw/master/LICENSE
+#
+################################################################################
+"""
+File hashing service shared by all integrity checks, streaming and persistently cached.
+"""
+
+import hashlib
+import os
+from concurrent.futures import Future, ThreadPoolExecutor
+from json import dumps, loads
+from os import path as osp
+from threading import Lock, Timer, local
+from typing import Dict, Iterable, NamedTuple, Optional, Tuple
+
+from MCSL2Lib.singleton import Singleton
+from MCSL2Lib.utils import MCSL2Logger, writeFileAtomic
+
+FILE_HASH_CACHE_FILE = "MCSL2/MCSL2_FileHashCache.json"
+HASH_CHUNK_SIZE = 1024 * 1024
+MAX_WORKERS = 4
+# 计算出新的结果后，等待这么久再写入缓存文件，一批文件只写一次
+SAVE_DELAY = 1.0
+
+# 每个线程复用一个读取缓冲区
+_buffers = local()
+
+
+class FileDigests(NamedTuple):
+    md5: str
+    sha1: str
+    sha256: str
+
+
+def fileStamp(path: str) -> Tuple[int, int, int]:
+    """(大小, 修改时间, inode)，文件不存在时抛出OSError"""
+    stat = os.stat(path)
+    return stat.st_size, stat.st_mtime_ns, stat.st_ino
+
+
+def hashFile(path: str) -> FileDigests:
+    """分块读取文件，一次读取同时计算MD5、SHA1和SHA256，不会把整个文件读入内存"""
+    buffer = getattr(_buffers, "buffer", None)
+    if buffer is None:
+        buffer = _buffers.buffer = memoryview(bytearray(HASH_CHUNK_SIZE))
+    md5, sha1, sha256 = hashlib.md5(), hashlib.sha1(), hashlib.sha256()
+    with open(path, "rb", buffering=0) as f:
+        while size := f.readinto(buffer):
+            chunk = buffer[:size]
+            md5.update(chunk)
+            sha1.update(chunk)
+            sha256.update(chunk)
+    return FileDigests(md5.hexdigest(), sha1.hexdigest(), sha256.hexdigest())
+
+
+def _cacheKey(path: str) -> str:
+    return osp.normcase(osp.abspath(path))
+
+
+@Singleton
+class FileHashService:
+    """
+    文件哈希服务，核心文件、下载记录等所有完整性检查都通过它计算哈希。\n
+    结果按(路径, 大小, 修改时间, inode)缓存，保存在MCSL2/MCSL2_FileHashCache.json，
+    文件没有变化时不会重新读取。可在任意线程中调用：digests等方法在调用的线程中计算，
+    submit和digestsMany在服务的线程池中计算。\n
+    新的结果延迟SAVE_DELAY秒写入缓存文件；延迟写入的定时器是守护线程，退出前应调用flush立即写入。
+    """
+
+    def __init__(self, cachePath: str = FILE_HASH_CACHE_FILE):
+        self.cachePath = cachePath
+        self._lock = Lock()
+        # 路径 -> (大小, 修改时间, inode, 哈希)
+        self._cache: Dict[str, Tuple[Tuple[int, int, int], FileDigests]] = {}
+        self._pending: Dict[str, Future] = {}
+        self._saveTimer: Optional[Timer] = None
+        self._pool = ThreadPoolExecutor(
+            max_workers=min(MAX_WORKERS, os.cpu_count() or 2), thread_name_prefix="FileHash"
+        )
+        self._load()
+
+    def _load(self):
+        try:
+            with open(self.cachePath, "r", encoding="utf-8") as f:
+                for path, (size, mtime, inode, md5, sha1, sha256) in loads(f.read()).items():
+                    self._cache[path] = ((size, mtime, inode), FileDigests(md5, sha1, sha256))
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError, TypeError, AttributeError) as e:
+            MCSL2Logger.warning(f"读取文件哈希缓存失败，将重新计算：{e}")
+            self._cache.clear()
+
+    def cached(self, path: str) -> Optional[FileDigests]:
+        """文件没有变化时返回缓存的结果，否则返回None，不会读取文件"""
+        try:
+            stamp = fileStamp(path)
+        except OSError:
+            return None
+        with self._lock:
+            entry = self._cache.get(_cacheKey(path))
+        return entry[1] if entry is not None and entry[0] == stamp else None
+
+    def digests(self, path: str) -> FileDigests:
+        """文件的哈希，文件不存在或无法读取时抛出OSError"""
+        key = _cacheKey(path)
+        stamp = fileStamp(path)
+        with self._lock:
+            entry = self._cache.get(key)
+        if entry is not None and entry[0] == stamp:
+            return entry[1]
+        digests = hashFile(path)
+        # 计算过程中文件被修改时不缓存
+        if fileStamp(path) == stamp:
+            with self._lock:
+                self._cache[key] = (stamp, digests)
+            self._saveLater()
+        return digests
+
+    def md5(self, path: str) -> str:
+        return self.digests(path).md5
+
+    def sha1(self, path: str) -> str:
+        return self.digests(path).sha1
+
+    def sha256(self, path: str) -> str:
+        return self.digests(path).sha256
+
+    def submit(self, path: str) -> Future:
+        """在线程池中计算，同一文件正在计算时返回同一个Future"""
+        key = _cacheKey(path)
+        with self._lock:
+            future = self._pending.get(key)
+            if future is not None:
+                return future
+            future = self._pending[key] = self._pool.submit(self.digests, path)
+        # 在锁外登记回调：已完成的Future会在当前线程中立即调用回调，回调需要再次获取锁
+        future.add_done_callback(lambda _: self._popPending(key))
+        return future
+
+    def _popPending(self, key: str):
+        with self._lock:
+            self._pending.pop(key, None)
+
+    def digestsMany(self, paths: Iterable[str]) -> Dict[str, Optional[FileDigests]]:
+        """并行计算多个文件的哈希，无法读取的文件为None"""
+        futures = {path: self.submit(path) for path in paths}
+        results = {}
+        for path, future in futures.items():
+            try:
+                results[path] = future.result()
+            except OSError:
+                results[path] = None
+        return results
+
+    def _saveLater(self):
+        with self._lock:
+            if self._saveTimer is not None:
+                return
+            # 守护线程，不会拖延退出；退出时由flush写入
+            self._saveTimer = Timer(SAVE_DELAY, self.save)
+            self._saveTimer.daemon = True
+            self._saveTimer.start()
+
+    def flush(self):
+        """有等待写入的结果时立即写入缓存文件，退出前在界面线程中调用"""
+        with self._lock:
+            timer = self._saveTimer
+        if timer is None:
+            return
+        timer.cancel()
+        # 定时器可能已经开始写入，等它结束再写，避免同时写同一个临时文件
+        timer.join()
+        self.save()
+
+    def save(self):
+        """写入缓存文件，已不存在的文件不再保留"""
+        with self._lock:
+            self._saveTimer = None
+            cache = dict(self._cache)
+        removed = [path for path in cache if not osp.exists(path)]
+        with self._lock:
+            for path in removed:
+                cache.pop(path)
+                self._cache.pop(path, None)
+        text = dumps(
+            {path: [*stamp, *digests] for path, (stamp, digests) in cache.items()},
+            separators=(",", ":"),
+        )
+        try:
+            writeFileAtomic(self.cachePath, text)
+        except OSError as e:
+            MCSL2Logger.warning(f"保存文件哈希缓存失败：{e}")
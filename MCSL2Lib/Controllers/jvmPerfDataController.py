@@ -0,0 +1,206 @@
+#     Copyright 2023, MCSL Team, mailto:lxhtt@vip.qq.com
+#
+#     Part of "MCSL2", a simple and multifunctional Minecraft server launcher.
+#
+#     Licensed under the GNU General Public License, Version 3.0, with our
+#     additional agreements. (the "License");
+#     you may not use this file except in compliance with the License.
+#     You may obtain a copy of the License at
+#
+#        https://github.com/MCSLTeam/MCSL2/raw/master/LICENSE
+#
+################################################################################
+"""
+Reads HotSpot performance counters (hsperfdata) of a running JVM via mmap.
+"""
+
+import getpass
+import mmap
+import struct
+import tempfile
+from glob import glob
+from os import path as osp
+from typing import Dict, NamedTuple, Optional, Tuple, Union
+
+# PerfDataPrologue: magic(大端), byte_order, major, minor, accessible, used, overflow,
+# mod_time_stamp, entry_offset, num_entries
+PERF_DATA_MAGIC = 0xCAFEC0C0
+_PROLOGUE = "iBBBBiiqii"
+# PerfDataEntry: entry_length, name_offset, vector_length, data_type, flags, data_units,
+# data_variability, data_offset
+_ENTRY = "iiicBBBi"
+_ENTRY_SIZE = 20
+
+
+class JvmStats(NamedTuple):
+    """一次采样的JVM统计，内存单位为字节，时间单位为秒"""
+
+    heapUsed: int
+    heapCommitted: int
+    heapMax: int
+    metaspaceUsed: int
+    gcCount: int
+    gcTime: float
+    safepointTime: float
+    loadedClasses: int
+
+
+def perfDataPath(pid: int) -> Optional[str]:
+    """
+    找到进程的hsperfdata文件。\n
+    通常在<临时目录>/hsperfdata_<用户名>/<pid>；用户名取不到或不一致时(如以其他用户运行)，
+    再在所有hsperfdata_*目录中查找。
+    """
+    tempDir = tempfile.gettempdir()
+    try:
+        candidate = osp.join(tempDir, f"hsperfdata_{getpass.getuser()}", str(pid))
+        if osp.isfile(candidate):
+            return candidate
+    except Exception:
+        pass
+    for candidate in glob(osp.join(tempDir, "hsperfdata_*", str(pid))):
+        if osp.isfile(candidate):
+            return candidate
+    return None
+
+
+class HotSpotPerfData:
+    """
+    HotSpot性能计数器读取器。\n
+    JVM默认(-XX:+UsePerfData)把计数器放在一个共享内存文件里，jstat读的就是它。
+    这里把文件只读映射进来，首次读取时解析一遍条目表，记下每个计数器的偏移，
+    之后每次采样只在映射上按偏移解包几个整数，不复制文件，也不需要启动jstat或挂载agent。\n
+    JVM运行中可能追加新的计数器，条目数变化时只解析新增的部分。
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = open(path, "rb")
+        try:
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError):
+            self._file.close()
+            raise
+        magic = struct.unpack_from(">I", self._map, 0)[0]
+        if magic != PERF_DATA_MAGIC:
+            self.close()
+            raise ValueError(f"{path}不是hsperfdata文件")
+        self._byteOrder = "<" if self._map[4] == 1 else ">"
+        # 计数器名 -> (数据偏移, 类型, 向量长度)
+        self._counters: Dict[str, Tuple[int, bytes, int]] = {}
+        self._parsedEntries = 0
+        self._nextEntry = 0
+        self._frequency = 0
+        self._scanEntries()
+
+    @classmethod
+    def forPid(cls, pid: int) -> Optional["HotSpotPerfData"]:
+        """打开进程的计数器文件，找不到或无法映射时返回None"""
+        path = perfDataPath(pid)
+        if path is None:
+            return None
+        try:
+            return cls(path)
+        except (OSError, ValueError, struct.error):
+            return None
+
+    def close(self):
+        try:
+            self._map.close()
+        finally:
+            self._file.close()
+
+    def _prologue(self) -> tuple:
+        return struct.unpack_from(self._byteOrder + _PROLOGUE, self._map, 0)
+
+    def _scanEntries(self):
+        _, _, _, _, accessible, _, _, _, entryOffset, numEntries = self._prologue()
+        if not accessible or numEntries == self._parsedEntries:
+            return
+        offset = self._nextEntry or entryOffset
+        entryFormat = self._byteOrder + _ENTRY
+        size = len(self._map)
+        while self._parsedEntries < numEntries and offset + _ENTRY_SIZE <= size:
+            length, nameOffset, vectorLength, dataType, _, _, _, dataOffset = struct.unpack_from(
+                entryFormat, self._map, offset
+            )
+            if length <= 0:
+                break
+            nameStart = offset + nameOffset
+            nameEnd = self._map.find(b"\x00", nameStart, offset + length)
+            name = self._map[nameStart:nameEnd].decode("ascii", errors="replace")
+            self._counters[name] = (offset + dataOffset, dataType, vectorLength)
+            offset += length
+            self._parsedEntries += 1
+        self._nextEntry = offset
+        self._frequency = self.long("sun.os.hrt.frequency") or self._frequency
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._counters
+
+    def names(self):
+        return self._counters.keys()
+
+    def long(self, name: str, default: int = 0) -> int:
+        counter = self._counters.get(name, None)
+        if counter is None or counter[1] != b"J":
+            return default
+        return struct.unpack_from(self._byteOrder + "q", self._map, counter[0])[0]
+
+    def string(self, name: str, default: str = "") -> str:
+        counter = self._counters.get(name, None)
+        if counter is None or counter[1] != b"B":
+            return default
+        raw = self._map[counter[0] : counter[0] + counter[2]]
+        return raw.split(b"\x00", 1)[0].decode("utf-8", errors="replace")
+
+    def value(self, name: str) -> Union[int, str, None]:
+        counter = self._counters.get(name, None)
+        if counter is None:
+            return None
+        return self.long(name) if counter[1] == b"J" else self.string(name)
+
+    def seconds(self, name: str) -> float:
+        """把以高精度时钟tick计的计数器换算为秒"""
+        return self.long(name) / self._frequency if self._frequency else 0.0
+
+    def _sumGenerations(self, suffix: str) -> int:
+        # generation 0为新生代，1为老年代；旧版JVM的generation 2是永久代，不计入堆
+        total = 0
+        for generation in (0, 1):
+            spaces = self.long(f"sun.gc.generation.{generation}.spaces")
+            if suffix == "used":
+                total += sum(
+                    self.long(f"sun.gc.generation.{generation}.space.{space}.used")
+                    for space in range(spaces)
+                )
+            else:
+                total += self.long(f"sun.gc.generation.{generation}.{suffix}")
+        return total
+
+    def sample(self) -> Optional[JvmStats]:
+        """读取一次统计，JVM已退出或计数器不可用时返回None"""
+        try:
+            self._scanEntries()
+            if "sun.gc.generation.0.spaces" not in self._counters:
+                return None
+            gcCount = 0
+            gcTime = 0.0
+            collector = 0
+            while f"sun.gc.collector.{collector}.invocations" in self._counters:
+                gcCount += self.long(f"sun.gc.collector.{collector}.invocations")
+                gcTime += self.seconds(f"sun.gc.collector.{collector}.time")
+                collector += 1
+            return JvmStats(
+                heapUsed=self._sumGenerations("used"),
+                heapCommitted=self._sumGenerations("capacity"),
+                heapMax=self._sumGenerations("maxCapacity"),
+                metaspaceUsed=self.long("sun.gc.metaspace.used"),
+                gcCount=gcCount,
+                gcTime=gcTime,
+                safepointTime=self.seconds("sun.rt.safepointTime"),
+                loadedClasses=self.long("java.cls.loadedClasses"),
+            )
+        except (ValueError, struct.error):
+            # 映射已关闭或文件被截断
+            return None
@@ -0,0 +1,187 @@
+#     Copyright 2023, MCSL Team, mailto:lxhtt@vip.qq.com
+#
+#     Part of "MCSL2", a simple and multifunctional Minecraft server launcher.
+#
+#     Licensed under the GNU General Public License, Version 3.0, with our
+#     additional agreements. (the "License");
+#     you may not use this file except in compliance with the License.
+#     You may obtain a copy of the License at
+#
+#        https://github.com/MCSLTeam/MCSL2/raw/master/LICENSE
+#
+################################################################################
+"""
+Memory admission control, checks a launch against running servers and free RAM.
+"""
+
+import json
+from os import path as osp
+from time import time
+from typing import List, NamedTuple
+
+import psutil
+
+from MCSL2Lib.utils import MCSL2Logger, writeFileAtomic
+
+MEMORY_HISTORY_FILE = "MCSL2MemoryHistory.json"
+MIB = 1048576
+UNIT_BYTES = {"M": MIB, "G": 1024 * MIB}
+
+# 没有运行记录时，JVM堆外开销(元空间、代码缓存、线程栈、GC数据结构等)按堆的比例估算，且不少于下限
+DEFAULT_OVERHEAD_RATIO = 0.25
+MIN_DEFAULT_OVERHEAD = 384 * MIB
+# 为系统和其他程序保留的内存：总内存的5%，且不少于512MB
+SYSTEM_RESERVE_RATIO = 0.05
+MIN_SYSTEM_RESERVE = 512 * MIB
+# 启动后剩余内存低于总内存的此比例时给出警告
+WARN_HEADROOM_RATIO = 0.05
+# 建议的最大内存不低于此值，且按此粒度向下取整
+MIN_SUGGESTED_HEAP = 512 * MIB
+SUGGESTED_HEAP_STEP = 256 * MIB
+# 每个服务器保留的运行记录数，估算开销时使用最近几次
+HISTORY_LIMIT = 20
+ESTIMATE_RUNS = 5
+
+
+def unitBytes(memUnit: str) -> int:
+    return UNIT_BYTES.get(memUnit, MIB)
+
+
+def formatMemory(size: int) -> str:
+    """以G或M显示，不足1G时用M"""
+    if abs(size) >= UNIT_BYTES["G"]:
+        return f"{size / UNIT_BYTES['G']:.1f}G"
+    return f"{size // MIB}M"
+
+
+def memoryHistoryFile(serverName: str) -> str:
+    return osp.join("Servers", serverName, MEMORY_HISTORY_FILE)
+
+
+class MemoryRecord(NamedTuple):
+    """一次运行的内存记录，单位均为字节"""
+
+    time: float
+    heap: int
+    peakRss: int
+
+    @property
+    def overhead(self) -> int:
+        """RSS峰值超出最大堆的部分，堆没用满时为负数"""
+        return self.peakRss - self.heap
+
+
+def loadMemoryHistory(serverName: str) -> List[MemoryRecord]:
+    try:
+        with open(memoryHistoryFile(serverName), "r", encoding="utf-8") as f:
+            return [
+                MemoryRecord(float(r["time"]), int(r["heap"]), int(r["peak_rss"]))
+                for r in json.load(f)
+            ]
+    except FileNotFoundError:
+        return []
+    except (OSError, ValueError, KeyError, TypeError) as e:
+        MCSL2Logger.warning(f"读取服务器 {serverName} 的内存记录失败：{e}")
+        return []
+
+
+def appendMemoryRecord(serverName: str, heap: int, peakRss: int):
+    """记录一次运行的RSS峰值，只保留最近HISTORY_LIMIT条"""
+    records = loadMemoryHistory(serverName)
+    records.append(MemoryRecord(time(), heap, peakRss))
+    writeFileAtomic(
+        memoryHistoryFile(serverName),
+        json.dumps(
+            [
+                {"time": int(r.time), "heap": r.heap, "peak_rss": r.peakRss}
+                for r in records[-HISTORY_LIMIT:]
+            ],
+            indent=4,
+        ),
+    )
+
+
+def estimateFootprint(serverName: str, heap: int) -> int:
+    """
+    估算以heap为最大堆运行时的RSS峰值。\n
+    有运行记录时取最近几次中最大的堆外开销(不少于MIN_DEFAULT_OVERHEAD)，否则按堆的比例估算。
+    """
+    records = loadMemoryHistory(serverName)[-ESTIMATE_RUNS:]
+    if records:
+        return heap + max(max(r.overhead for r in records), MIN_DEFAULT_OVERHEAD)
+    return heap + max(int(heap * DEFAULT_OVERHEAD_RATIO), MIN_DEFAULT_OVERHEAD)
+
+
+def processRss(pid: int) -> int:
+    if not pid:
+        return 0
+    try:
+        return psutil.Process(pid).memory_info().rss
+    except (psutil.Error, OSError):
+        return 0
+
+
+class RunningFootprint(NamedTuple):
+    serverName: str
+    rss: int
+    estimate: int
+
+
+class AdmissionDecision(NamedTuple):
+    """
+    启动前的内存检查结果，单位均为字节。\n
+    verdict：ok可以启动；warn可以启动但剩余内存不多；reduce需要降低最大内存；
+    refuse降到最低也放不下。
+    """
+
+    verdict: str
+    # 新服务器的最大堆和估算的RSS峰值
+    heap: int
+    estimate: int
+    # 运行中的服务器，按估算的RSS峰值计(已超出估算的按当前RSS计)
+    running: List[RunningFootprint]
+    # 可供服务器使用的内存：可用内存+运行中的服务器当前RSS-系统保留
+    capacity: int
+    # verdict为reduce时建议的最大堆
+    suggestedHeap: int
+
+    @property
+    def needed(self) -> int:
+        return self.estimate + sum(max(r.rss, r.estimate) for r in self.running)
+
+    @property
+    def headroom(self) -> int:
+        return self.capacity - self.needed
+
+
+def evaluateLaunch(serverName: str, heap: int, runningHandlers: list) -> AdmissionDecision:
+    """
+    检查以heap为最大堆启动服务器后，所有服务器按估算的峰值占满内存时是否会超出物理内存。\n
+    runningHandlers为运行中的ServerHandler。
+    """
+    memory = psutil.virtual_memory()
+    running = []
+    for handler in runningHandlers:
+        variables = handler.serverVariables
+        runningHeap = variables.maxMem * unitBytes(variables.memUnit)
+        running.append(
+            RunningFootprint(
+                handler.serverName,
+                processRss(handler.processId()),
+                estimateFootprint(handler.serverName, runningHeap),
+            )
+        )
+    reserve = max(int(memory.total * SYSTEM_RESERVE_RATIO), MIN_SYSTEM_RESERVE)
+    capacity = memory.available + sum(r.rss for r in running) - reserve
+    estimate = estimateFootprint(serverName, heap)
+    decision = AdmissionDecision("ok", heap, estimate, running, capacity, heap)
+    headroom = decision.headroom
+    if headroom >= memory.total * WARN_HEADROOM_RATIO:
+        return decision
+    if headroom >= 0:
+        return decision._replace(verdict="warn")
+    # 堆外开销基本不随堆大小变化，少掉的部分全部从堆里扣
+    suggested = (heap + headroom) // SUGGESTED_HEAP_STEP * SUGGESTED_HEAP_STEP
+    if suggested >= MIN_SUGGESTED_HEAP:
+        return decision._replace(verdict="reduce", suggestedHeap=suggested)
+    return decision._replace(verdict="refuse", suggestedHeap=0)
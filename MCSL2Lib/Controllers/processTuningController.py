@@ -0,0 +1,351 @@
+#     Copyright 2023, MCSL Team, mailto:lxhtt@vip.qq.com
+#
+#     Part of "MCSL2", a simple and multifunctional Minecraft server launcher.
+#
+#     Licensed under the GNU General Public License, Version 3.0, with our
+#     additional agreements. (the "License");
+#     you may not use this file except in compliance with the License.
+#     You may obtain a copy of the License at
+#
+#        https://github.com/MCSLTeam/MCSL2/raw/master/LICENSE
+#
+################################################################################
+"""
+Per-server process priority, I/O class and CPU affinity, with automatic core allocation.
+"""
+
+import json
+import os
+from os import path as osp
+from platform import system
+from typing import Dict, List, Optional, Tuple
+
+import psutil
+from PyQt5.QtCore import QObject
+
+from MCSL2Lib.singleton import Singleton
+from MCSL2Lib.utils import MCSL2Logger, writeFileAtomic
+
+IO_CLASSES = ("default", "high", "low", "idle")
+AFFINITY_MODES = ("none", "auto", "manual")
+
+_isWindows = "windows" in system().lower()
+_isLinux = "linux" in system().lower()
+
+
+def parseCpuList(text: str) -> List[int]:
+    """解析形如"0-3,8,10-11"的CPU列表，与/sys中的cpulist格式相同"""
+    cpus = set()
+    for part in text.replace(" ", "").split(","):
+        if not part:
+            continue
+        start, _, end = part.partition("-")
+        cpus.update(range(int(start), int(end or start) + 1))
+    return sorted(cpus)
+
+
+def formatCpuList(cpus: List[int]) -> str:
+    ranges = []
+    for cpu in sorted(set(cpus)):
+        if ranges and cpu == ranges[-1][1] + 1:
+            ranges[-1][1] = cpu
+        else:
+            ranges.append([cpu, cpu])
+    return ",".join(f"{a}-{b}" if a != b else f"{a}" for a, b in ranges)
+
+
+class ProcessTuning:
+    """一个服务器的进程调度设置，保存在服务器目录的MCSL2ProcessTuning.json中"""
+
+    fileName = "MCSL2ProcessTuning.json"
+
+    def __init__(
+        self,
+        nice: int = 0,
+        ioClass: str = "default",
+        affinityMode: str = "none",
+        cpus: Optional[List[int]] = None,
+    ):
+        self.nice = nice
+        self.ioClass = ioClass
+        self.affinityMode = affinityMode
+        self.cpus: List[int] = cpus or []
+
+    def isDefault(self) -> bool:
+        return self.nice == 0 and self.ioClass == "default" and self.affinityMode == "none"
+
+    def toDict(self) -> dict:
+        return {
+            "nice": self.nice,
+            "io_class": self.ioClass,
+            "affinity_mode": self.affinityMode,
+            "cpus": formatCpuList(self.cpus),
+        }
+
+    @classmethod
+    def file(cls, serverName: str) -> str:
+        return osp.join("Servers", serverName, cls.fileName)
+
+    @classmethod
+    def load(cls, serverName: str) -> "ProcessTuning":
+        try:
+            with open(cls.file(serverName), "r", encoding="utf-8") as f:
+                data = json.load(f)
+            tuning = cls(
+                max(-20, min(19, int(data.get("nice", 0)))),
+                data.get("io_class", "default"),
+                data.get("affinity_mode", "none"),
+                parseCpuList(str(data.get("cpus", ""))),
+            )
+        except FileNotFoundError:
+            return cls()
+        except (OSError, ValueError, TypeError) as e:
+            MCSL2Logger.warning(f"读取服务器 {serverName} 的进程调度设置失败：{e}")
+            return cls()
+        if tuning.ioClass not in IO_CLASSES:
+            tuning.ioClass = "default"
+        if tuning.affinityMode not in AFFINITY_MODES:
+            tuning.affinityMode = "none"
+        return tuning
+
+    def save(self, serverName: str):
+        writeFileAtomic(
+            self.file(serverName), json.dumps(self.toDict(), ensure_ascii=False, indent=4)
+        )
+
+
+class CpuTopology:
+    """
+    CPU拓扑：NUMA节点 -> 物理核心 -> 逻辑CPU。\n
+    Linux下读取/sys；其他系统按psutil给出的物理核心数，把相邻的逻辑CPU视为同一核心的超线程。
+    """
+
+    def __init__(self, nodes: List[List[Tuple[int, ...]]]):
+        # nodes[节点][核心] = 该物理核心的逻辑CPU
+        self.nodes = [node for node in nodes if node]
+
+    @property
+    def cores(self) -> List[Tuple[int, ...]]:
+        return [core for node in self.nodes for core in node]
+
+    @classmethod
+    def detect(cls, sysRoot: str = "/sys/devices/system") -> "CpuTopology":
+        available = set(range(psutil.cpu_count() or 1))
+        if hasattr(psutil.Process, "cpu_affinity"):
+            try:
+                available = set(psutil.Process().cpu_affinity())
+            except (psutil.Error, OSError):
+                pass
+        if _isLinux and osp.isdir(osp.join(sysRoot, "cpu")):
+            topology = cls._fromSys(sysRoot, available)
+            if topology.cores:
+                return topology
+        return cls._fromCounts(sorted(available))
+
+    @classmethod
+    def _fromSys(cls, sysRoot: str, available: set) -> "CpuTopology":
+        def read(path: str) -> str:
+            with open(path, "r", encoding="utf-8") as f:
+                return f.read().strip()
+
+        coreOf: Dict[int, Tuple[str, str]] = {}
+        for cpu in sorted(available):
+            base = osp.join(sysRoot, "cpu", f"cpu{cpu}", "topology")
+            try:
+                coreOf[cpu] = (
+                    read(osp.join(base, "physical_package_id")),
+                    read(osp.join(base, "core_id")),
+                )
+            except OSError:
+                coreOf[cpu] = ("0", str(cpu))
+        nodeCpus: List[List[int]] = []
+        nodeRoot = osp.join(sysRoot, "node")
+        if osp.isdir(nodeRoot):
+            for name in sorted(os.listdir(nodeRoot)):
+                if name.startswith("node") and name[4:].isdigit():
+                    try:
+                        cpus = parseCpuList(read(osp.join(nodeRoot, name, "cpulist")))
+                    except (OSError, ValueError):
+                        continue
+                    nodeCpus.append([c for c in cpus if c in available])
+        if not nodeCpus:
+            nodeCpus = [sorted(available)]
+        nodes = []
+        for cpus in nodeCpus:
+            cores: Dict[Tuple[str, str], List[int]] = {}
+            for cpu in cpus:
+                cores.setdefault(coreOf[cpu], []).append(cpu)
+            nodes.append(sorted(tuple(c) for c in cores.values()))
+        return cls(nodes)
+
+    @classmethod
+    def _fromCounts(cls, cpus: List[int]) -> "CpuTopology":
+        physical = psutil.cpu_count(logical=False) or len(cpus)
+        perCore = max(1, len(cpus) // max(physical, 1))
+        return cls([[tuple(cpus[i : i + perCore]) for i in range(0, len(cpus), perCore)]])
+
+
+@Singleton
+class CoreAllocator(QObject):
+    """
+    自动模式下为运行中的服务器分配物理核心。\n
+    核心数足够时第一个物理核心留给MCSL2界面；服务器尽量放在同一个NUMA节点内，
+    节点按每个服务器能分到的核心数从多到少选择，节点内把核心连续地平均分给各服务器。
+    有服务器启动或关闭时重新分配，已运行的服务器也会随之调整。
+    """
+
+    # 物理核心数达到此值时，为界面保留一个核心
+    reserveForLauncherFrom = 4
+
+    def __init__(self):
+        super().__init__()
+        self.topology = CpuTopology.detect()
+        self._handlers: Dict[str, QObject] = {}
+        # 服务器名称 -> 分到的逻辑CPU
+        self._assigned: Dict[str, List[int]] = {}
+
+    def attach(self, handler):
+        self._handlers[handler.serverName] = handler
+
+    def detach(self, serverName: str):
+        self._handlers.pop(serverName, None)
+        self._assigned.pop(serverName, None)
+
+    def allCpus(self) -> List[int]:
+        return sorted(cpu for core in self.topology.cores for cpu in core)
+
+    def allocate(self, serverNames: List[str]) -> Dict[str, List[int]]:
+        """为一组服务器计算分配结果，不修改状态"""
+        nodes = [list(node) for node in self.topology.nodes]
+        if sum(len(node) for node in nodes) >= self.reserveForLauncherFrom:
+            nodes[0] = nodes[0][1:]
+        nodes = [node for node in nodes if node]
+        # 先把服务器分到节点：每次选"分配后每个服务器的核心数"最多的节点
+        perNode: List[List[str]] = [[] for _ in nodes]
+        for name in sorted(serverNames):
+            best = max(range(len(nodes)), key=lambda i: len(nodes[i]) / (len(perNode[i]) + 1))
+            perNode[best].append(name)
+        result = {}
+        for cores, names in zip(nodes, perNode):
+            for i, name in enumerate(names):
+                if len(names) <= len(cores):
+                    start = i * len(cores) // len(names)
+                    end = (i + 1) * len(cores) // len(names)
+                    chosen = cores[start:end]
+                else:
+                    # 服务器比核心多，只能共用
+                    chosen = [cores[i % len(cores)]]
+                result[name] = sorted(cpu for core in chosen for cpu in core)
+        return result
+
+    def rebalance(self) -> Dict[str, List[int]]:
+        """按当前运行中且为自动模式的服务器重新分配，并应用到已变化的服务器"""
+        autoHandlers = {
+            name: h
+            for name, h in self._handlers.items()
+            if h.isServerRunning() and h.processTuning.affinityMode == "auto"
+        }
+        assigned = self.allocate(list(autoHandlers))
+        for name, cpus in assigned.items():
+            if self._assigned.get(name) != cpus:
+                setAffinity(autoHandlers[name].processId(), cpus)
+                MCSL2Logger.info(f"服务器 {name} 自动分配CPU：{formatCpuList(cpus)}")
+        self._assigned = assigned
+        return assigned
+
+    def assigned(self, serverName: str) -> List[int]:
+        return list(self._assigned.get(serverName, []))
+
+
+def _threads(pid: int) -> List[psutil.Process]:
+    """
+    进程的所有线程。\n
+    Linux下优先级、I/O优先级和亲和性都是按线程设置的，只设置主线程的话JVM已创建的线程不受影响，
+    因此逐个线程设置；其他系统是按进程设置的。
+    """
+    process = psutil.Process(pid)
+    if not _isLinux:
+        return [process]
+    threads = [process]
+    for thread in process.threads():
+        if thread.id != pid:
+            try:
+                threads.append(psutil.Process(thread.id))
+            except psutil.Error:
+                pass
+    return threads
+
+
+def _niceValue(nice: int):
+    """Windows没有nice值，换算为优先级类别"""
+    if not _isWindows:
+        return nice
+    if nice <= -10:
+        return psutil.HIGH_PRIORITY_CLASS
+    if nice < 0:
+        return psutil.ABOVE_NORMAL_PRIORITY_CLASS
+    if nice == 0:
+        return psutil.NORMAL_PRIORITY_CLASS
+    if nice < 10:
+        return psutil.BELOW_NORMAL_PRIORITY_CLASS
+    return psutil.IDLE_PRIORITY_CLASS
+
+
+def _ioniceArgs(ioClass: str) -> Optional[tuple]:
+    if _isWindows:
+        return {
+            "high": (psutil.IOPRIO_HIGH,),
+            "low": (psutil.IOPRIO_LOW,),
+            "idle": (psutil.IOPRIO_VERYLOW,),
+        }.get(ioClass, (psutil.IOPRIO_NORMAL,))
+    if _isLinux:
+        return {
+            "high": (psutil.IOPRIO_CLASS_BE, 0),
+            "low": (psutil.IOPRIO_CLASS_BE, 7),
+            "idle": (psutil.IOPRIO_CLASS_IDLE,),
+        }.get(ioClass, (psutil.IOPRIO_CLASS_NONE,))
+    return None
+
+
+def setAffinity(pid: int, cpus: List[int]) -> bool:
+    if not pid or not hasattr(psutil.Process, "cpu_affinity"):
+        return False
+    try:
+        for thread in _threads(pid):
+            thread.cpu_affinity(cpus)
+        return True
+    except (psutil.Error, OSError, ValueError) as e:
+        MCSL2Logger.warning(f"设置CPU亲和性失败：{e}")
+        return False
+
+
+def applyProcessTuning(pid: int, tuning: ProcessTuning, cpus: List[int]) -> List[str]:
+    """
+    对进程应用优先级、I/O优先级和CPU亲和性。\n
+    返回失败项的说明，例如没有权限调高优先级。
+    """
+    errors = []
+    try:
+        threads = _threads(pid)
+    except psutil.Error as e:
+        return [str(e)]
+    try:
+        value = _niceValue(tuning.nice)
+        for thread in threads:
+            thread.nice(value)
+    except (psutil.Error, OSError) as e:
+        errors.append(f"优先级：{e}")
+    ioniceArgs = _ioniceArgs(tuning.ioClass)
+    if ioniceArgs is not None and hasattr(psutil.Process, "ionice"):
+        try:
+            for thread in threads:
+                thread.ionice(*ioniceArgs)
+        except (psutil.Error, OSError, ValueError) as e:
+            errors.append(f"I/O优先级：{e}")
+    if hasattr(psutil.Process, "cpu_affinity"):
+        try:
+            for thread in threads:
+                thread.cpu_affinity(cpus)
+        except (psutil.Error, OSError, ValueError) as e:
+            errors.append(f"CPU亲和性：{e}")
+    return errors
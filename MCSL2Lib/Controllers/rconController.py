@@ -0,0 +1,199 @@
+#     Copyright 2023, MCSL Team, mailto:lxhtt@vip.qq.com
+#
+#     Part of "MCSL2", a simple and multifunctional Minecraft server launcher.
+#
+#     Licensed under the GNU General Public License, Version 3.0, with our
+#     additional agreements. (the "License");
+#     you may not use this file except in compliance with the License.
+#     You may obtain a copy of the License at
+#
+#        https://github.com/MCSLTeam/MCSL2/raw/master/LICENSE
+#
+################################################################################
+"""
+Minecraft RCON client on a persistent QTcpSocket, with pipelined requests.
+"""
+
+import struct
+from collections import deque
+from typing import Callable, Deque, Dict, List, NamedTuple, Optional, Tuple
+
+from PyQt5.QtCore import QObject, pyqtSignal
+from PyQt5.QtNetwork import QAbstractSocket, QTcpSocket
+
+from MCSL2Lib.utils import MCSL2Logger
+
+PACKET_RESPONSE = 0
+PACKET_COMMAND = 2
+PACKET_LOGIN = 3
+
+# 响应回调，连接失败或断开时参数为None
+RconCallback = Callable[[Optional[str]], None]
+
+
+def encodePacket(requestId: int, packetType: int, body: str) -> bytes:
+    payload = struct.pack("<ii", requestId, packetType) + body.encode("utf-8") + b"\x00\x00"
+    return struct.pack("<i", len(payload)) + payload
+
+
+def decodePackets(buffer: bytearray) -> List[Tuple[int, int, str]]:
+    """从缓冲区取出所有完整的包，返回[(请求id, 类型, 正文)]，不完整的部分留在缓冲区"""
+    packets = []
+    while len(buffer) >= 4:
+        length = struct.unpack_from("<i", buffer, 0)[0]
+        if len(buffer) < 4 + length:
+            break
+        requestId, packetType = struct.unpack_from("<ii", buffer, 4)
+        body = bytes(buffer[12 : 4 + length]).rstrip(b"\x00").decode("utf-8", errors="replace")
+        del buffer[: 4 + length]
+        packets.append((requestId, packetType, body))
+    return packets
+
+
+class RconEndpoint(NamedTuple):
+    host: str
+    port: int
+    password: str
+
+
+def rconEndpoint(properties) -> Optional[RconEndpoint]:
+    """从server.properties读取RCON设置，未开启或没有密码时返回None"""
+    if properties.get("enable-rcon", "false").strip().lower() != "true":
+        return None
+    password = properties.get("rcon.password", "")
+    if not password:
+        return None
+    try:
+        port = int(properties.get("rcon.port", "25575"))
+    except ValueError:
+        return None
+    return RconEndpoint(properties.get("server-ip", "") or "127.0.0.1", port, password)
+
+
+class RconClient(QObject):
+    """
+    RCON客户端，每个服务器一条持久连接。\n
+    基于QTcpSocket，全部由事件循环驱动，不阻塞界面线程。连接并认证成功之前发起的请求先排队，
+    认证后一次性写出；请求不必等上一条响应即可发送(流水线)，响应按请求id交给对应的回调。\n
+    响应可能分成多个包，每条指令后紧跟一个空的响应类型包作为结束标记：服务器按顺序处理，
+    收到标记的回应时该指令的分包一定已经收完。
+    """
+
+    readyChanged = pyqtSignal(bool)
+    authFailed = pyqtSignal()
+
+    def __init__(self, endpoint: RconEndpoint, parent=None):
+        super().__init__(parent)
+        self.endpoint = endpoint
+        self.ready = False
+        self._socket = QTcpSocket(self)
+        self._socket.connected.connect(self._login)
+        self._socket.readyRead.connect(self._onReadyRead)
+        self._socket.disconnected.connect(self._onDisconnected)
+        self._socket.errorOccurred.connect(self._onError)
+        self._buffer = bytearray()
+        self._nextId = 1
+        self._loginId = 0
+        # 认证前排队的请求
+        self._queued: Deque[Tuple[int, str]] = deque()
+        self._callbacks: Dict[int, Optional[RconCallback]] = {}
+        # 尚未收完的分包响应
+        self._partial: Dict[int, List[str]] = {}
+        # 结束标记包的id -> 对应的请求id
+        self._sentinels: Dict[int, int] = {}
+
+    def _allocateId(self) -> int:
+        requestId = self._nextId
+        self._nextId = self._nextId % 0x7FFFFFFF + 1
+        return requestId
+
+    def isConnecting(self) -> bool:
+        return self._socket.state() != QAbstractSocket.UnconnectedState and not self.ready
+
+    def ensureConnected(self):
+        if self._socket.state() == QAbstractSocket.UnconnectedState:
+            self._buffer.clear()
+            self._socket.connectToHost(self.endpoint.host, self.endpoint.port)
+
+    def request(self, command: str, callback: Optional[RconCallback] = None) -> int:
+        """发送一条指令，返回请求id；响应(或失败时的None)交给callback"""
+        requestId = self._allocateId()
+        self._callbacks[requestId] = callback
+        if self.ready:
+            self._write(requestId, command)
+        else:
+            self._queued.append((requestId, command))
+            self.ensureConnected()
+        return requestId
+
+    def close(self):
+        self._socket.abort()
+        self._fail()
+
+    def _write(self, requestId: int, command: str):
+        sentinelId = self._allocateId()
+        self._sentinels[sentinelId] = requestId
+        self._socket.write(
+            encodePacket(requestId, PACKET_COMMAND, command)
+            + encodePacket(sentinelId, PACKET_RESPONSE, "")
+        )
+
+    def _login(self):
+        self._loginId = self._allocateId()
+        self._socket.write(encodePacket(self._loginId, PACKET_LOGIN, self.endpoint.password))
+
+    def _setReady(self, ready: bool):
+        if ready != self.ready:
+            self.ready = ready
+            self.readyChanged.emit(ready)
+
+    def _onReadyRead(self):
+        self._buffer += self._socket.readAll().data()
+        for requestId, packetType, body in decodePackets(self._buffer):
+            if not self.ready:
+                self._onLoginResponse(requestId, packetType)
+                continue
+            ownerId = self._sentinels.pop(requestId, None)
+            if ownerId is None:
+                if requestId in self._callbacks:
+                    self._partial.setdefault(requestId, []).append(body)
+                continue
+            # 结束标记的回应，对应指令的响应已全部收到
+            parts = self._partial.pop(ownerId, [])
+            callback = self._callbacks.pop(ownerId, None)
+            if callback is not None:
+                callback("".join(parts))
+
+    def _onLoginResponse(self, requestId: int, packetType: int):
+        if requestId == -1:
+            MCSL2Logger.warning(
+                f"RCON认证失败：{self.endpoint.host}:{self.endpoint.port}，请检查rcon.password"
+            )
+            self.authFailed.emit()
+            self.close()
+            return
+        # 部分实现会在认证结果前先发一个空的响应包
+        if requestId != self._loginId or packetType != PACKET_COMMAND:
+            return
+        self._setReady(True)
+        while self._queued:
+            self._write(*self._queued.popleft())
+
+    def _onError(self, _):
+        MCSL2Logger.warning(f"RCON连接错误：{self._socket.errorString()}")
+        if self._socket.state() == QAbstractSocket.UnconnectedState:
+            self._fail()
+
+    def _onDisconnected(self):
+        self._fail()
+
+    def _fail(self):
+        """连接断开，所有未完成的请求以None回调"""
+        self._setReady(False)
+        self._queued.clear()
+        self._partial.clear()
+        self._sentinels.clear()
+        callbacks, self._callbacks = self._callbacks, {}
+        for callback in callbacks.values():
+            if callback is not None:
+                callback(None)
@@ -0,0 +1,306 @@
+#     Copyright 2023, MCSL Team, mailto:lxhtt@vip.qq.com
+#
+#     Part of "MCSL2", a simple and multifunctional Minecraft server launcher.
+#
+#     Licensed under the GNU General Public License, Version 3.0, with our
+#     additional agreements. (the "License");
+#     you may not use this file except in compliance with the License.
+#     You may obtain a copy of the License at
+#
+#        https://github.com/MCSLTeam/MCSL2/raw/master/LICENSE
+#
+################################################################################
+"""
+Per-server command queue with pacing, and a cron-style command scheduler.
+"""
+
+import heapq
+import itertools
+import json
+from calendar import monthrange
+from collections import deque
+from datetime import datetime, timedelta
+from os import path as osp
+from typing import Deque, Dict, FrozenSet, List, Optional, Tuple
+
+from PyQt5.QtCore import QObject, QTimer, pyqtSignal
+
+from MCSL2Lib.Controllers.settingsController import cfg
+from MCSL2Lib.singleton import Singleton
+from MCSL2Lib.utils import MCSL2Logger
+
+# 计划任务中表示重启服务器的特殊指令
+RESTART_COMMAND = "@restart"
+
+
+class ServerCommandQueue(QObject):
+    """
+    服务器指令队列，每个服务器实例一个。\n
+    指令按每tick(50毫秒)最多commandsPerTick条的速度写入服务器，避免一次性导入上百条指令时
+    把主线程塞满；MCSL2发出的指令与待发送的指令重复时不会重复排队，用户手动输入的指令总是排队。
+    队列为空时新指令立即发送。
+    """
+
+    # 队列长度变化，参数为待发送的指令数
+    pendingChanged = pyqtSignal(int)
+
+    tickInterval = 50
+
+    def __init__(self, handler, parent=None):
+        super().__init__(parent)
+        self.handler = handler
+        self._pending: Deque[str] = deque()
+        # 待发送的指令 -> 条数，用于判断重复
+        self._pendingCounts: Dict[str, int] = {}
+        # 当前tick内已发送的指令数；定时器在运行即表示处于一个tick中
+        self._sentThisTick = 0
+        self._timer = QTimer(self)
+        self._timer.setInterval(self.tickInterval)
+        self._timer.timeout.connect(self._onTick)
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    def isPending(self, command: str) -> bool:
+        return command in self._pendingCounts
+
+    def enqueue(self, command: str, dedupe: bool = True) -> bool:
+        """
+        排队一条指令，返回是否入队。\n
+        服务器未运行时，或dedupe为True且与待发送的指令重复时返回False。
+        """
+        if not self.handler.isServerRunning():
+            return False
+        if dedupe and command in self._pendingCounts:
+            return False
+        self._pending.append(command)
+        self._pendingCounts[command] = self._pendingCounts.get(command, 0) + 1
+        if not self._timer.isActive():
+            # 空闲时开启新的tick，本条立即发送
+            self._sentThisTick = 0
+            self._timer.start()
+            self._send()
+        self.pendingChanged.emit(len(self._pending))
+        return True
+
+    def clear(self):
+        self._pending.clear()
+        self._pendingCounts.clear()
+        self._timer.stop()
+        self.pendingChanged.emit(0)
+
+    def _send(self):
+        budget = cfg.get(cfg.commandsPerTick) - self._sentThisTick
+        for _ in range(min(budget, len(self._pending))):
+            command = self._pending.popleft()
+            if self._pendingCounts[command] == 1:
+                del self._pendingCounts[command]
+            else:
+                self._pendingCounts[command] -= 1
+            self.handler.writeCommand(command)
+            self._sentThisTick += 1
+
+    def _onTick(self):
+        if not self.handler.isServerRunning():
+            self.clear()
+            return
+        if not self._pending:
+            # 一整个tick没有新指令，停止计时
+            self._timer.stop()
+            return
+        self._sentThisTick = 0
+        self._send()
+        self.pendingChanged.emit(len(self._pending))
+
+
+class CronExpression:
+    """
+    五段式cron表达式：分 时 日 月 周。\n
+    每段支持*、数字、a-b、逗号分隔的列表和/步长；周日可写作0或7。
+    日和周都不是*时，满足其一即可(与crontab一致)。
+    """
+
+    _RANGES = ((0, 59), (0, 23), (1, 31), (1, 12), (0, 7))
+
+    def __init__(self, expression: str):
+        self.expression = expression.strip()
+        fields = self.expression.split()
+        if len(fields) != 5:
+            raise ValueError(f"cron表达式应有5段：{expression}")
+        parsed = [self._parseField(f, lo, hi) for f, (lo, hi) in zip(fields, self._RANGES)]
+        self.minutes, self.hours, self.days, self.months, weekdays = parsed
+        # cron中0和7都是周日，datetime.weekday()中周一为0
+        self.weekdays = frozenset((d - 1) % 7 for d in weekdays)
+        self._anyDay = fields[2] == "*"
+        self._anyWeekday = fields[4] == "*"
+
+    @staticmethod
+    def _parseField(field: str, lo: int, hi: int) -> FrozenSet[int]:
+        values = set()
+        for part in field.split(","):
+            rangePart, _, stepPart = part.partition("/")
+            step = int(stepPart) if stepPart else 1
+            if rangePart == "*":
+                start, end = lo, hi
+            elif "-" in rangePart:
+                start, end = (int(v) for v in rangePart.split("-", 1))
+            else:
+                start = int(rangePart)
+                end = hi if stepPart else start
+            if not lo <= start <= end <= hi or step < 1:
+                raise ValueError(f"cron字段超出范围：{field}")
+            values.update(range(start, end + 1, step))
+        return frozenset(values)
+
+    def _dayMatches(self, dt: datetime) -> bool:
+        dayOk = dt.day in self.days
+        weekdayOk = dt.weekday() in self.weekdays
+        if self._anyDay or self._anyWeekday:
+            return dayOk and weekdayOk
+        return dayOk or weekdayOk
+
+    def matches(self, dt: datetime) -> bool:
+        return (
+            dt.minute in self.minutes
+            and dt.hour in self.hours
+            and dt.month in self.months
+            and self._dayMatches(dt)
+        )
+
+    def next(self, after: datetime) -> datetime:
+        """after之后(不含)的下一个触发时刻，不匹配的月、日、时整段跳过"""
+        dt = after.replace(second=0, microsecond=0) + timedelta(minutes=1)
+        limit = after + timedelta(days=366 * 5)
+        while dt <= limit:
+            if dt.month not in self.months:
+                days = monthrange(dt.year, dt.month)[1] - dt.day + 1
+                dt = (dt + timedelta(days=days)).replace(hour=0, minute=0)
+            elif not self._dayMatches(dt):
+                dt = (dt + timedelta(days=1)).replace(hour=0, minute=0)
+            elif dt.hour not in self.hours:
+                dt = (dt + timedelta(hours=1)).replace(minute=0)
+            elif dt.minute not in self.minutes:
+                dt += timedelta(minutes=1)
+            else:
+                return dt
+        raise ValueError(f"cron表达式永远不会触发：{self.expression}")
+
+
+class ScheduledJob:
+    """一个计划任务：在cron表达式匹配的时刻向服务器发送指令"""
+
+    def __init__(self, serverName: str, cron: str, command: str, enabled: bool = True):
+        self.serverName = serverName
+        self.cron = CronExpression(cron)
+        self.command = command
+        self.enabled = enabled
+        self.nextRun: Optional[datetime] = None
+
+
+@Singleton
+class CommandScheduler(QObject):
+    """
+    所有服务器共用的计划任务调度器。\n
+    任务按下次触发时刻放在一个最小堆里，只用一个QTimer等待堆顶的任务，
+    任务再多也不会有更多的定时器。服务器未运行时到点的任务直接跳过。\n
+    任务写在各服务器目录的MCSL2Schedule.json中(暂无编辑界面，手动编辑)，格式为
+    {"jobs": [{"cron": "0 4 * * *", "command": "@restart", "enabled": true}]}；
+    服务器实例创建时通过attach加载，之后每次启动服务器时重新加载，修改后重启服务器即可生效。
+    """
+
+    scheduleFileName = "MCSL2Schedule.json"
+
+    def __init__(self):
+        super().__init__()
+        self._heap: List[Tuple[datetime, int, ScheduledJob]] = []
+        self._jobs: Dict[str, List[ScheduledJob]] = {}
+        self._handlers: Dict[str, QObject] = {}
+        self._counter = itertools.count()
+        self._timer = QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.timeout.connect(self._runDue)
+
+    @classmethod
+    def scheduleFile(cls, serverName: str) -> str:
+        return osp.join("Servers", serverName, cls.scheduleFileName)
+
+    def attach(self, handler):
+        """登记服务器实例并加载它的计划任务"""
+        self._handlers[handler.serverName] = handler
+        self.loadServer(handler.serverName)
+
+    def detach(self, serverName: str):
+        self._handlers.pop(serverName, None)
+        self.setJobs(serverName, [])
+
+    def loadServer(self, serverName: str):
+        """读取服务器的计划任务，替换已加载的任务"""
+        jobs = []
+        path = self.scheduleFile(serverName)
+        if osp.exists(path):
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    data = json.load(f)
+                for item in data.get("jobs", []):
+                    try:
+                        jobs.append(
+                            ScheduledJob(
+                                serverName, item["cron"], item["command"], item.get("enabled", True)
+                            )
+                        )
+                    except (KeyError, ValueError) as e:
+                        MCSL2Logger.warning(f"服务器 {serverName} 的计划任务无效，已忽略：{e}")
+            except (OSError, ValueError) as e:
+                MCSL2Logger.warning(f"读取服务器 {serverName} 的计划任务失败：{e}")
+        if jobs:
+            MCSL2Logger.info(f"已加载服务器 {serverName} 的{len(jobs)}个计划任务")
+        self.setJobs(serverName, jobs)
+
+    def setJobs(self, serverName: str, jobs: List[ScheduledJob]):
+        self._jobs[serverName] = list(jobs)
+        # 旧任务留在堆中，弹出时发现已不在任务列表里就丢弃
+        now = datetime.now()
+        for job in jobs:
+            self._push(job, now)
+        self._arm()
+
+    def _push(self, job: ScheduledJob, after: datetime):
+        if not job.enabled:
+            job.nextRun = None
+            return
+        job.nextRun = job.cron.next(after)
+        heapq.heappush(self._heap, (job.nextRun, next(self._counter), job))
+
+    def _isLive(self, runAt: datetime, job: ScheduledJob) -> bool:
+        return job.nextRun == runAt and job in self._jobs.get(job.serverName, [])
+
+    def _arm(self):
+        while self._heap and not self._isLive(self._heap[0][0], self._heap[0][2]):
+            heapq.heappop(self._heap)
+        if not self._heap:
+            self._timer.stop()
+            return
+        delay = (self._heap[0][0] - datetime.now()).total_seconds()
+        # 最长等一小时再重新计算，避免系统休眠或调整时间后定时器偏差太大
+        self._timer.start(int(min(max(delay, 0.0), 3600.0) * 1000))
+
+    def _runDue(self):
+        now = datetime.now()
+        while self._heap and self._heap[0][0] <= now:
+            runAt, _, job = heapq.heappop(self._heap)
+            if not self._isLive(runAt, job):
+                continue
+            self._push(job, now)
+            self._trigger(job)
+        self._arm()
+
+    def _trigger(self, job: ScheduledJob):
+        handler = self._handlers.get(job.serverName, None)
+        if handler is None or not handler.isServerRunning():
+            return
+        MCSL2Logger.info(f"服务器 {job.serverName} 执行计划任务：{job.command}")
+        handler.appendLog(self.tr("[MCSL2 | 提示]：执行计划任务：") + job.command)
+        if job.command == RESTART_COMMAND:
+            handler.restartServer()
+        else:
+            handler.sendCommand(job.command)
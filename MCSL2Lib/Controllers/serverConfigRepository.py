@@ -0,0 +1,368 @@
+#     Copyright 2023, MCSL Team, mailto:lxhtt@vip.qq.com
+#
+#     Part of "MCSL2", a simple and multifunctional Minecraft server launcher.
+#
+#     Licensed under the GNU General Public License, Version 3.0, with our
+#     additional agreements. (the "License");
+#     you may not use this file except in compliance with the License.
+#     You may obtain a copy of the License at
+#
+#        https://github.com/MCSLTeam/MCSL2/raw/master/LICENSE
+#
+################################################################################
+"""
+Server config repository, one file per server plus a compact index, cached by mtime.
+"""
+
+import os
+from json import dumps, loads
+from os import path as osp
+from threading import RLock
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from PyQt5.QtCore import QObject, pyqtSignal
+
+from MCSL2Lib.singleton import Singleton
+from MCSL2Lib.utils import MCSL2Logger, writeFileAtomic
+
+# 服务器的顺序，只有名称
+SERVER_INDEX_FILE = "MCSL2/MCSL2_ServerIndex.json"
+# 每个服务器的配置，在各自的服务器目录下
+SERVER_CONFIG_FILE = "MCSL2ServerConfig.json"
+# 旧版的全局服务器列表，第一次启动时迁移，之后作为镜像继续生成，供旧版MCSL2读取
+LEGACY_SERVER_LIST_FILE = "MCSL2/MCSL2_ServerList.json"
+
+# 配置字典的键 -> ServerConfigRecord的字段
+_FIELDS = (
+    ("name", "name", ""),
+    ("core_file_name", "coreFileName", ""),
+    ("java_path", "javaPath", ""),
+    ("min_memory", "minMem", 0),
+    ("max_memory", "maxMem", 0),
+    ("memory_unit", "memUnit", "M"),
+    ("jvm_arg", "jvmArg", []),
+    ("output_decoding", "outputDecoding", "follow"),
+    ("input_encoding", "inputEncoding", "follow"),
+    ("icon", "icon", "Grass.png"),
+    ("server_type", "serverType", ""),
+    ("extra_data", "extraData", {}),
+)
+_KNOWN_KEYS = frozenset(key for key, _, _ in _FIELDS)
+
+
+class ServerConfigRecord(NamedTuple):
+    """一个服务器的配置"""
+
+    name: str
+    coreFileName: str
+    javaPath: str
+    minMem: int
+    maxMem: int
+    memUnit: str
+    jvmArg: List[str]
+    outputDecoding: str
+    inputEncoding: str
+    icon: str
+    serverType: str
+    extraData: dict
+    # 不认识的键原样保留，写回时不会丢失
+    extra: dict
+
+    @classmethod
+    def fromDict(cls, config: dict) -> "ServerConfigRecord":
+        values = {
+            field: config.get(key, default.copy() if isinstance(default, (list, dict)) else default)
+            for key, field, default in _FIELDS
+        }
+        return cls(**values, extra={k: v for k, v in config.items() if k not in _KNOWN_KEYS})
+
+    def toDict(self) -> dict:
+        """转为配置文件中的字典，每次返回新的字典，修改它不会影响缓存"""
+        config = {key: getattr(self, field) for key, field, _ in _FIELDS}
+        config["jvm_arg"] = list(self.jvmArg)
+        config["extra_data"] = dict(self.extraData)
+        config.update(self.extra)
+        return config
+
+
+def _fileStamp(path: str) -> Optional[Tuple[int, int]]:
+    """(修改时间, 大小)，文件不存在时为None"""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+@Singleton
+class ServerConfigRepository(QObject):
+    """
+    服务器配置仓库，进程内共享。\n
+    每个服务器的配置保存在Servers/<名称>/MCSL2ServerConfig.json，服务器的顺序保存在
+    MCSL2/MCSL2_ServerIndex.json(只有名称的紧凑列表)。读取时只比较文件的修改时间和大小，
+    文件被外部修改后才重新解析；按名称建立索引，选择、编辑、列出服务器都不需要再解析JSON。
+    可在工作线程中使用，读写都加锁；所有写入都是先写临时文件再替换。\n
+    为了兼容旧版MCSL2，每次修改后还会由缓存生成一份旧格式的MCSL2_ServerList.json，
+    并把它的(修改时间, 大小)记入索引。启动时它与记录不符(还没迁移过，或降级后被旧版修改过)，
+    就以它为准重新导入，两个方向都不会丢失修改。
+    """
+
+    # 服务器列表发生了变化(本进程修改或检测到文件被外部修改)
+    serversChanged = pyqtSignal()
+
+    def __init__(
+        self,
+        indexPath: str = SERVER_INDEX_FILE,
+        serversDir: str = "Servers",
+        legacyPath: str = LEGACY_SERVER_LIST_FILE,
+    ):
+        super().__init__()
+        self.indexPath = indexPath
+        self.serversDir = serversDir
+        self.legacyPath = legacyPath
+        self._lock = RLock()
+        self._names: List[str] = []
+        self._positions: Dict[str, int] = {}
+        self._records: Dict[str, ServerConfigRecord] = {}
+        self._shardStamps: Dict[str, Optional[Tuple[int, int]]] = {}
+        # 名称 -> (配置, 它在镜像中的JSON)，配置没变的服务器生成镜像时不必重新序列化
+        self._mirrorFragments: Dict[str, Tuple[ServerConfigRecord, str]] = {}
+        # 索引文件对应的(修改时间, 大小)，未读取过时为False
+        self._indexStamp = False
+
+    def configPath(self, serverName: str) -> str:
+        return osp.join(self.serversDir, serverName, SERVER_CONFIG_FILE)
+
+    # 读取缓存
+
+    def _readIndex(self, stamp) -> Tuple[List[str], Optional[Tuple[int, int]]]:
+        """索引中的(服务器名称, 镜像文件的(修改时间, 大小))"""
+        if stamp is None:
+            return [], None
+        try:
+            with open(self.indexPath, "r", encoding="utf-8") as f:
+                index = loads(f.read())
+            mirror = index.get("mirror")
+            return [str(name) for name in index["servers"]], mirror and tuple(mirror)
+        except (OSError, ValueError, KeyError, TypeError, AttributeError) as e:
+            MCSL2Logger.error(f"读取服务器索引失败：{e}")
+            return [], None
+
+    def _ensureIndex(self):
+        stamp = _fileStamp(self.indexPath)
+        if stamp is not None and stamp == self._indexStamp:
+            return
+        names, mirrorStamp = self._readIndex(stamp)
+        legacyStamp = _fileStamp(self.legacyPath)
+        if legacyStamp is not None and legacyStamp != mirrorStamp:
+            imported = self._importLegacy(legacyStamp)
+            if imported is not None:
+                names, stamp = imported, _fileStamp(self.indexPath)
+        changed = self._indexStamp is not False and names != self._names
+        self._setNames(names)
+        self._indexStamp = stamp
+        if changed:
+            self.serversChanged.emit()
+
+    def _setNames(self, names: List[str]):
+        self._names = names
+        self._positions = {name: i for i, name in enumerate(names)}
+        for name in list(self._records):
+            if name not in self._positions:
+                self._records.pop(name)
+                self._shardStamps.pop(name, None)
+                self._mirrorFragments.pop(name, None)
+
+    def _record(self, name: str) -> ServerConfigRecord:
+        """一个服务器的配置，配置文件变化时重新读取；文件缺失或损坏时只有名称"""
+        path = self.configPath(name)
+        stamp = _fileStamp(path)
+        if name in self._records and self._shardStamps.get(name) == stamp:
+            return self._records[name]
+        config = {"name": name}
+        if stamp is None:
+            MCSL2Logger.warning(f"服务器 {name} 的配置文件不存在：{path}")
+        else:
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    config = loads(f.read())
+                # 以索引中的名称为准，目录被手动改名时配置里的名称可能是旧的
+                config["name"] = name
+            except (OSError, ValueError, TypeError) as e:
+                MCSL2Logger.error(f"读取服务器 {name} 的配置失败：{e}")
+                config = {"name": name}
+        record = ServerConfigRecord.fromDict(config)
+        self._records[name] = record
+        self._shardStamps[name] = stamp
+        return record
+
+    def _importLegacy(self, legacyStamp: Tuple[int, int]) -> Optional[List[str]]:
+        """
+        把旧版的全局服务器列表拆分为每个服务器的配置文件和索引，返回导入后的服务器名称。\n
+        列表中没有的服务器会从索引中移除(旧版删除服务器时已删掉了服务器目录)。
+        """
+        try:
+            with open(self.legacyPath, "r", encoding="utf-8") as f:
+                configs = loads(f.read())["MCSLServerList"]
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            MCSL2Logger.error(f"读取旧版全局服务器配置失败，跳过导入：{e}")
+            return None
+        names = []
+        for config in configs:
+            record = ServerConfigRecord.fromDict(config)
+            if not record.name or record.name in names:
+                continue
+            names.append(record.name)
+            try:
+                self._writeRecord(record)
+            except OSError as e:
+                MCSL2Logger.warning(f"迁移服务器 {record.name} 的配置失败：{e}")
+        try:
+            self._writeIndex(names, legacyStamp)
+        except OSError as e:
+            MCSL2Logger.error(f"导入全局服务器配置失败：{e}")
+            return None
+        MCSL2Logger.info(f"已从 {self.legacyPath} 导入 {len(names)} 个服务器的配置")
+        return names
+
+    # 写入
+
+    def _writeRecord(self, record: ServerConfigRecord):
+        """写入一个服务器的配置文件，服务器目录必须已存在"""
+        path = self.configPath(record.name)
+        writeFileAtomic(path, dumps(record.toDict(), indent=4))
+        self._records[record.name] = record
+        self._shardStamps[record.name] = _fileStamp(path)
+
+    def _writeIndex(self, names: List[str], mirrorStamp: Optional[Tuple[int, int]]):
+        writeFileAtomic(
+            self.indexPath, dumps({"servers": names, "mirror": mirrorStamp}, separators=(",", ":"))
+        )
+        self._setNames(names)
+        self._indexStamp = _fileStamp(self.indexPath)
+
+    def _commit(self, names: List[str]):
+        """
+        修改后由缓存生成旧格式的镜像，再写入索引。\n
+        镜像写入失败时也记录它当前的状态，免得下次启动时把过时的镜像当作旧版的修改导入。
+        """
+        fragments = []
+        for name in names:
+            # 修改时已经读过索引，缓存中的配置即为最新，不必逐个检查配置文件
+            record = self._records.get(name) or self._record(name)
+            cached = self._mirrorFragments.get(name)
+            if cached is None or cached[0] is not record:
+                cached = (record, dumps(record.toDict(), separators=(",", ":")))
+                self._mirrorFragments[name] = cached
+            fragments.append(cached[1])
+        try:
+            writeFileAtomic(self.legacyPath, '{"MCSLServerList":[' + ",".join(fragments) + "]}")
+        except OSError as e:
+            MCSL2Logger.warning(f"生成旧版全局服务器配置失败：{e}")
+        self._writeIndex(names, _fileStamp(self.legacyPath))
+
+    def reload(self):
+        """强制重新读取，可在工作线程中预先调用，避免界面线程第一次访问时解析"""
+        with self._lock:
+            self._indexStamp = False
+            self._records.clear()
+            self._shardStamps.clear()
+            self._ensureIndex()
+            for name in self._names:
+                self._record(name)
+
+    # 读取
+
+    def records(self) -> List[ServerConfigRecord]:
+        with self._lock:
+            self._ensureIndex()
+            return [self._record(name) for name in self._names]
+
+    def __len__(self) -> int:
+        with self._lock:
+            self._ensureIndex()
+            return len(self._names)
+
+    def names(self) -> List[str]:
+        with self._lock:
+            self._ensureIndex()
+            return list(self._names)
+
+    def at(self, index: int) -> ServerConfigRecord:
+        with self._lock:
+            self._ensureIndex()
+            return self._record(self._names[index])
+
+    def get(self, name: str) -> Optional[ServerConfigRecord]:
+        with self._lock:
+            self._ensureIndex()
+            return self._record(name) if name in self._positions else None
+
+    def indexOf(self, name: str) -> int:
+        """服务器在列表中的位置，不存在时为-1"""
+        with self._lock:
+            self._ensureIndex()
+            return self._positions.get(name, -1)
+
+    def configs(self) -> List[dict]:
+        """整个列表的配置字典，兼容readGlobalServerConfig的返回值"""
+        return [record.toDict() for record in self.records()]
+
+    # 修改，立即写入文件
+
+    def insert(self, position: int, config: dict):
+        """添加一个服务器，服务器目录必须已存在"""
+        record = ServerConfigRecord.fromDict(config)
+        with self._lock:
+            self._ensureIndex()
+            if record.name in self._positions:
+                raise ValueError(f"已存在同名服务器：{record.name}")
+            self._writeRecord(record)
+            names = list(self._names)
+            names.insert(position, record.name)
+            self._commit(names)
+        self.serversChanged.emit()
+
+    def append(self, config: dict):
+        self.insert(len(self), config)
+
+    def update(self, name: str, config: dict, position: Optional[int] = None):
+        """
+        修改名为name的服务器的配置，配置中的名称不同时视为改名(服务器目录需已改名)。\n
+        position为None时位置不变，否则移动到该位置，-1为末尾。
+        """
+        record = ServerConfigRecord.fromDict(config)
+        with self._lock:
+            self._ensureIndex()
+            if name not in self._positions:
+                raise KeyError(name)
+            if record.name != name and record.name in self._positions:
+                raise ValueError(f"已存在同名服务器：{record.name}")
+            self._writeRecord(record)
+            names = list(self._names)
+            index = names.index(name)
+            if position is None:
+                names[index] = record.name
+            else:
+                names.pop(index)
+                if position < 0:
+                    names.append(record.name)
+                else:
+                    names.insert(position, record.name)
+            self._commit(names)
+        self.serversChanged.emit()
+
+    def remove(self, name: str) -> Optional[ServerConfigRecord]:
+        """从索引中移除服务器并删除它的配置文件，服务器目录由调用者处理"""
+        with self._lock:
+            self._ensureIndex()
+            if name not in self._positions:
+                return None
+            record = self._record(name)
+            self._commit([n for n in self._names if n != name])
+            try:
+                os.remove(self.configPath(name))
+            except OSError:
+                pass
+        self.serversChanged.emit()
+        return record
@@ -15,20 +15,61 @@
 Communicate with Minecraft servers.
 """
 
+import re
 from datetime import datetime
 from os import path as osp
-from typing import List, Optional
+from typing import Dict, List, Optional
 
 from PyQt5.QtCore import QProcess, QObject, pyqtSignal, QThread, QTimer, pyqtSlot
-from psutil import NoSuchProcess, Process, AccessDenied
 
+from MCSL2Lib.Controllers.appCdsController import AppCdsArchive
+from MCSL2Lib.Controllers.consoleLogBuffer import ConsoleLogBuffer
+from MCSL2Lib.Controllers.consoleLogClassifier import (
+    ClassifiedLine,
+    ConsoleLogClassifier,
+    ConsoleLogFlag,
+    ConsoleLogLevel,
+)
+from MCSL2Lib.Controllers.memoryBudgetController import (
+    MIB,
+    AdmissionDecision,
+    appendMemoryRecord,
+    evaluateLaunch,
+    unitBytes,
+)
+from MCSL2Lib.Controllers.processTuningController import (
+    CoreAllocator,
+    ProcessTuning,
+    applyProcessTuning,
+)
+from MCSL2Lib.Controllers.rconController import (
+    RconCallback,
+    RconClient,
+    RconEndpoint,
+    rconEndpoint,
+)
+from MCSL2Lib.Controllers.serverCommandController import CommandScheduler, ServerCommandQueue
+from MCSL2Lib.Controllers.serverErrorHandler import FORMATTING_PATTERN, ServerErrorHandler
+from MCSL2Lib.Controllers.serverResourceController import ServerResourceSampler
+from MCSL2Lib.Controllers.serverStatusController import ServerStatus, ServerStatusPoller
+from MCSL2Lib.Controllers.serverStopController import ServerStopper
+from MCSL2Lib.Controllers.serverSupervisor import ServerSupervisor
+from MCSL2Lib.Controllers.serverTickController import TickMetrics
+from MCSL2Lib.Controllers.serverOutputController import (
+    ServerLogBatcher,
+    StreamingLogDecoder,
+    resolveEncoding,
+)
 from MCSL2Lib.Controllers.settingsController import cfg
-from MCSL2Lib.utils import readGlobalServerConfig
+from MCSL2Lib.Controllers.startupProfiler import StartupProfiler
+from MCSL2Lib.Controllers.serverConfigRepository import ServerConfigRepository
+from MCSL2Lib.Controllers.ServerSettingController import ServerSettingController
 from MCSL2Lib.singleton import Singleton
-from MCSL2Lib.variables import ServerVariables
+from MCSL2Lib.variables import BaseServerVariables, ServerVariables
 from MCSL2Lib.utils import MCSL2Logger
 
 serverVariables = ServerVariables()
+PLAYER_COUNT_PATTERN = re.compile(r"There are (\d+)")
 
 
 @Singleton
@@ -57,10 +98,11 @@ class ServerHelper(QObject):
     def selectedServer(self, index):
         """选择了服务器"""
         self.loadServerConfig(index=index)
-        self.serverName.emit(readGlobalServerConfig()[index]["name"])
+        serverName = ServerConfigRepository().at(index).name
+        self.serverName.emit(serverName)
         self.startBtnStat.emit(True)
         # 防止和设置页冲突导致设置无效，得这样写，立刻保存变量以及文件
-        cfg.set(cfg.lastServer, readGlobalServerConfig()[index]["name"], save=True)
+        cfg.set(cfg.lastServer, serverName, save=True)
         self.backToHomePage.emit(0)
 
 
@@ -72,12 +114,23 @@ class Server:
         self.LastOutputSize = 0
 
 
-@Singleton
 class ServerHandler(QObject):
-    """服务器进程操控器"""
+    """服务器进程操控器，每个服务器实例各有一个，由ServerHandlerRegistry统一管理"""
+
+    # 当服务器输出日志时发出的信号(发送一批日志行，即字符串列表)
+    serverLogOutput = pyqtSignal(list)
+
+    # 日志分类并写入终端缓冲区后发出的信号(发送ClassifiedLine的列表，不含无需显示的行)
+    classifiedLogOutput = pyqtSignal(list)
+
+    # 服务器开始加载时发出的信号
+    serverStarting = pyqtSignal()
 
-    # 当服务器输出日志时发出的信号(发送一个字符串)
-    serverLogOutput = pyqtSignal(str)
+    # 服务器启动完毕时发出的信号(发送IP和端口)
+    serverStartupDone = pyqtSignal(str, str)
+
+    # 服务器输出了无法解码的字符时发出的信号
+    invalidOutputDetected = pyqtSignal()
 
     # 当服务器关闭时发出的信号(发送一个整数exit code)
     serverClosed = pyqtSignal(int)
@@ -85,18 +138,187 @@ class ServerHandler(QObject):
     # 当服务器重启时发出的信号
     serverRestarted = pyqtSignal()
 
-    def __init__(self):
+    # 当轮询到服务器状态时发出的信号(发送ServerStatus)
+    statusChanged = pyqtSignal(object)
+
+    def __init__(self, serverName: str, parent=None):
         """
-        初始化一个服务器处理器
+        初始化一个服务器处理器\n
+        serverName: 服务器名称，即注册表中的键
         """
-        super().__init__()
+        super().__init__(parent)
+        self.serverName: str = serverName
+        self.serverVariables: BaseServerVariables = BaseServerVariables()
         self.javaPath: str = ""
         self.processArgs = [""]
         self.workingDirectory: str = ""
-        self.partialData: str = b""
+        self.logDecoder = StreamingLogDecoder()
+        # 终端缓冲区，切换终端显示的服务器时用于回放
+        self.consoleBuffer = ConsoleLogBuffer()
+        self.configureConsoleBuffer()
+        self.playersList: List[str] = []
         self.AServer = None
-        self.serverLogOutput.connect(MCSL2Logger.info)
+        self.logBatcher = ServerLogBatcher(parent=self)
+        self.logBatcher.batchReady.connect(self.serverLogOutput)
+        self.serverLogOutput.connect(self.appendConsoleLines)
+        # 玩家列表和启动状态从本实例的日志中得出，不论终端页正在显示哪个服务器
+        self.classifiedLogOutput.connect(self.onClassifiedLines)
+        # 报错分析器扫描完整的日志流，诊断结果在服务器关闭时由终端页展示
+        self.serverErrorHandler = ServerErrorHandler()
+        self.serverLogOutput.connect(self.serverErrorHandler.detectLines)
+        self.serverLogOutput.connect(self.logServerOutput)
+        self.supervisor = ServerSupervisor(self, self)
+        self.supervisor.restartScheduled.connect(self.onRestartScheduled)
+        self.supervisor.crashLoopDetected.connect(self.onCrashLoopDetected)
+        self.stopper = ServerStopper(self, self)
+        self.stopper.stopProgress.connect(
+            lambda _, message: self.appendLog(self.tr("[MCSL2 | 提示]：") + message)
+        )
+        self.serverLogOutput.connect(self.stopper.onServerLogOutput)
+        self.commandQueue = ServerCommandQueue(self, self)
+        self.serverClosed.connect(self.commandQueue.clear)
+        # RCON连接在服务器开启了RCON时按需建立，服务器关闭时断开
+        self.rcon: Optional[RconClient] = None
+        # 认证失败的RCON设置，server.properties中的设置改变前不再连接
+        self.rconAuthFailedEndpoint: Optional[RconEndpoint] = None
+        self.serverClosed.connect(self.closeRcon)
+        self.playersPollTimer = QTimer(self)
+        self.playersPollTimer.setInterval(30000)
+        self.playersPollTimer.timeout.connect(self.pollPlayers)
+        self.serverClosed.connect(self.playersPollTimer.stop)
+        # 最近一次Server List Ping的结果，服务器未运行时为None
+        self.status: Optional[ServerStatus] = None
+        self.serverClosed.connect(self.clearStatus)
+        self.tickMetrics = TickMetrics(self, self)
+        self.serverLogOutput.connect(self.tickMetrics.onServerLogOutput)
+        self.serverClosed.connect(self.tickMetrics.stop)
+        self.startupProfiler = StartupProfiler(self, self)
+        self.serverClosed.connect(self.startupProfiler.abort)
+        # 本次启动使用的AppCDS归档，未开启时为None
+        self.appCds: Optional[AppCdsArchive] = None
+        self.serverClosed.connect(self.onAppCdsServerClosed)
+        # 进程调度设置，每次启动时从服务器目录读取
+        self.processTuning = ProcessTuning()
+        self.serverClosed.connect(lambda: CoreAllocator().rebalance())
         self.Server = self.getServerProcess()
+        self.resMonitor = ServerResourceSampler(self, self)
+        self.serverClosed.connect(self.resMonitor.onServerClosedHandler)
+        self.serverClosed.connect(self.recordMemoryUsage)
+
+    def configureConsoleBuffer(self):
+        """按设置调整终端缓冲区的行数上限和溢出文件"""
+        self.consoleBuffer.closeSpill()
+        self.consoleBuffer.setCapacity(cfg.get(cfg.consoleBufferLines))
+        self.consoleBuffer.spillPath = (
+            osp.join("MCSL2", "ConsoleLogs", f"{self.serverName}.log")
+            if cfg.get(cfg.spillConsoleToDisk)
+            else None
+        )
+
+    @pyqtSlot(list)
+    def appendConsoleLines(self, lines: List[str]):
+        """把一批日志分类后写入终端缓冲区，每行只分类一次，无需显示的行直接丢弃"""
+        classifier = ServerHandlerRegistry().logClassifier
+        classified = [
+            line
+            for line in map(classifier.classify, lines)
+            if ConsoleLogFlag.HIDDEN not in line.flags
+        ]
+        self.consoleBuffer.extend((line.text, int(line.level)) for line in classified)
+        self.classifiedLogOutput.emit(classified)
+
+    def appendConsoleNotice(self, text: str, level: ConsoleLogLevel):
+        """在终端缓冲区中追加MCSL2自己的提示"""
+        for line in text.split("\n"):
+            self.consoleBuffer.append(line, int(level))
+
+    @pyqtSlot(list)
+    def onClassifiedLines(self, lines: List[ClassifiedLine]):
+        """从日志中更新玩家列表和启动状态，并追加相应的提示"""
+        for line in lines:
+            if ConsoleLogFlag.LOADING_LIBRARIES in line.flags:
+                self.playersList.clear()
+                self.appendConsoleNotice(
+                    self.tr("[MCSL2 | 提示]：服务器正在启动，请稍后..."), ConsoleLogLevel.INFO
+                )
+                self.serverStarting.emit()
+            if line.isDone:
+                # 服务器刚写完server.properties，强制检查一次
+                properties = self.serverVariables.serverProperties
+                properties.refresh(force=True)
+                ip = properties.get("server-ip", "") or "127.0.0.1"
+                port = properties.get("server-port", "25565")
+                self.appendConsoleNotice(
+                    self.tr(
+                        "[MCSL2 | 提示]：服务器启动完毕！\n[MCSL2 | 提示]：如果本机开服，IP 地址为"
+                    )
+                    + ip
+                    + self.tr("，端口为")
+                    + port
+                    + self.tr(
+                        "。\n[MCSL2 | 提示]：如果外网开服,或使用了内网穿透等服务，"
+                        "连接地址为你的相关服务地址。"
+                    ),
+                    ConsoleLogLevel.DEBUG,
+                )
+                self.serverStartupDone.emit(ip, port)
+            if ConsoleLogFlag.INVALID_CHAR in line.flags:
+                self.appendConsoleNotice(
+                    self.tr(
+                        "[MCSL2 | 警告]：服务器疑似输出非法字符，"
+                        "也有可能是无法被当前编码解析的字符。请尝试更换编码。"
+                    ),
+                    ConsoleLogLevel.WARN,
+                )
+                self.invalidOutputDetected.emit()
+            if "logged in with entity id" in line.text or " left the game" in line.text:
+                self.recordPlayers(line.text)
+
+    def recordPlayers(self, serverOutput: str):
+        """从玩家进出服务器的日志中更新玩家列表"""
+        if "logged in with entity id" in serverOutput:
+            try:
+                self.playersList.append(
+                    str(str(serverOutput).split("INFO]: ")[1].split("[/")[0])
+                )
+                return
+            except Exception:
+                pass
+
+            try:
+                # 若不成功，尝试提取玩家名字
+                # [11:49:05] [Server thread/INFO] [minecraft/PlayerList]:
+                # Ares_Connor[/127.0.0.1:63854] logged in with entity id 229 at (7.25, 65.0, 11.09)
+                # 提取玩家名字
+                name = serverOutput
+                name = name.split("]: ")[1].split("[/")[0]
+                self.playersList.append(name)
+            except Exception as e:
+                MCSL2Logger.error(
+                    msg=f"extract player name failed\nonRecordPlayers::login {serverOutput}",
+                    exc=e,
+                )
+
+        elif " left the game" in serverOutput:
+            try:
+                self.playersList.remove(
+                    str(str(serverOutput).split("INFO]: ")[1].split(" left the game")[0])
+                )
+                return
+            except Exception:
+                pass
+
+            try:  # 若不成功，尝试提取玩家名字
+                # [11:53:52] [Server thread/INFO] [minecraft/DedicatedServer]:
+                # Ares_Connor left the game
+                name = serverOutput
+                name = name.split("]: ")[1].split(" left the game")[0].strip()
+                self.playersList.remove(name)
+            except Exception as e:
+                MCSL2Logger.error(
+                    msg=f"extract player name failed\nonRecordPlayers::logout {serverOutput}",
+                    exc=e,
+                )
 
     def getServerProcess(self) -> Server:
         """
@@ -108,46 +330,163 @@ class ServerHandler(QObject):
         self.AServer.serverProcess.setArguments(self.processArgs)
         self.AServer.serverProcess.setWorkingDirectory(self.workingDirectory)
         self.AServer.serverProcess.started.connect(
-            lambda: self.serverLogOutput.emit(self.tr("[MCSL2 | 提示]：服务器正在启动，请稍后..."))
+            lambda: self.appendLog(self.tr("[MCSL2 | 提示]：服务器正在启动，请稍后..."))
         )
+        self.AServer.serverProcess.started.connect(self.supervisor.onProcessStarted)
+        # 崩溃后重启的是同一个QProcess，同样会在这里重新应用
+        self.AServer.serverProcess.started.connect(self.onProcessStartedTuning)
         self.AServer.serverProcess.readyReadStandardOutput.connect(self.serverLogOutputHandler)
+        # 先把剩余的日志发出去，再通知服务器关闭
+        self.AServer.serverProcess.finished.connect(self.flushServerLogOutput)
+        self.AServer.serverProcess.finished.connect(self.logThroughputStatistics)
         self.AServer.serverProcess.finished.connect(
             lambda: self.serverClosed.emit(self.AServer.serverProcess.exitCode())
         )
         self.AServer.serverProcess.finished.connect(
             lambda: self.serverCrashed(self.AServer.serverProcess.exitCode())
         )
+        # 最后处理，关闭流程要求重启时其他退出处理都已完成
+        self.AServer.serverProcess.finished.connect(self.stopper.onProcessFinished)
         return self.AServer
 
     def serverCrashed(self, exitCode):
+        if self.stopper.isStopping():
+            # 由关闭流程终止的进程退出码非0，但不是崩溃
+            self.appendLog(self.tr("[MCSL2 | 提示]：服务器已关闭！"))
+            self.supervisor.onProcessExited(exitCode, crashed=False)
+            return
         if exitCode:
             if exitCode != 62097:
-                self.serverLogOutput.emit(self.tr("[MCSL2 | 提示]：服务器崩溃！"))
-                if cfg.get(cfg.restartServerWhenCrashed):
-                    self.Server.serverProcess.waitForFinished()
-                    self.serverLogOutput.emit(self.tr("[MCSL2 | 提示]：正在重新启动服务器..."))
-                    self.Server.serverProcess.start()
+                self.appendLog(self.tr("[MCSL2 | 提示]：服务器崩溃！"))
+                self.supervisor.onProcessExited(exitCode, crashed=True)
             else:
-                self.serverLogOutput.emit(
+                self.appendLog(
                     self.tr("[MCSL2 | 提示]：服务器崩溃，但可能是被强制结束进程。")
                 )
+                self.supervisor.onProcessExited(exitCode, crashed=False)
         else:
-            self.serverLogOutput.emit(self.tr("[MCSL2 | 提示]：服务器已关闭！"))
+            self.appendLog(self.tr("[MCSL2 | 提示]：服务器已关闭！"))
+            self.supervisor.onProcessExited(exitCode, crashed=False)
+
+    def onAppCdsServerClosed(self, exitCode: int):
+        if self.appCds is None:
+            return
+        created = self.appCds.onServerExited(exitCode)
+        if created:
+            self.appendLog(self.tr("[MCSL2 | 提示]：AppCDS归档已生成，下次启动将使用它加速。"))
+        elif created is False:
+            self.appendLog(self.tr("[MCSL2 | 提示]：服务器未正常关闭，AppCDS归档未生成。"))
+
+    # JVM的GC、JIT等线程在启动后陆续创建，Linux下按线程设置，过一会再应用一次
+    tuningReapplyDelay: int = 10000
+
+    def onProcessStartedTuning(self):
+        if self.processTuning.isDefault():
+            # 新进程继承MCSL2的调度属性，默认设置无需应用，但可能影响其他自动模式的服务器
+            CoreAllocator().rebalance()
+            return
+        pid = self.processId()
+        self.applyProcessTuning()
+        QTimer.singleShot(
+            self.tuningReapplyDelay,
+            lambda: self.processId() == pid and self.applyProcessTuning(quiet=True),
+        )
+
+    def applyProcessTuning(self, quiet: bool = False):
+        """把进程调度设置应用到正在运行的服务器进程"""
+        pid = self.processId()
+        if not pid:
+            return
+        allocator = CoreAllocator()
+        # 自动模式的服务器启动或切换模式时，所有自动模式的服务器都要重新分配
+        allocator.rebalance()
+        if self.processTuning.affinityMode == "auto":
+            cpus = allocator.assigned(self.serverName)
+        elif self.processTuning.affinityMode == "manual" and self.processTuning.cpus:
+            cpus = self.processTuning.cpus
+        else:
+            cpus = allocator.allCpus()
+        errors = applyProcessTuning(pid, self.processTuning, cpus)
+        for error in errors:
+            MCSL2Logger.warning(f"服务器 {self.serverName} 应用进程调度设置失败：{error}")
+        if errors and not quiet:
+            self.appendLog(
+                self.tr("[MCSL2 | 警告]：部分进程调度设置未能应用：") + "；".join(errors)
+            )
+
+    # 采样少于此数(约2分钟)的运行还没到内存占用的稳定阶段，不作为估算依据
+    minMemorySamples: int = 120
+
+    def recordMemoryUsage(self):
+        """
+        记录本次运行的RSS峰值，供下次启动前估算内存占用。\n
+        使用采样线程单独记录的RSS，终端显示USS时也不受影响。
+        """
+        if self.resMonitor.rssSamples < self.minMemorySamples:
+            return
+        unit = unitBytes(self.serverVariables.memUnit)
+        try:
+            appendMemoryRecord(
+                self.serverName, self.serverVariables.maxMem * unit, self.resMonitor.peakRss
+            )
+        except OSError as e:
+            MCSL2Logger.warning(f"保存服务器 {self.serverName} 的内存记录失败：{e}")
+
+    def onRestartScheduled(self, delay: float):
+        self.appendLog(
+            self.tr("[MCSL2 | 提示]：将在{delay}秒后重新启动服务器...").format(delay=f"{delay:.0f}")
+        )
+
+    def onCrashLoopDetected(self, count: int):
+        self.appendLog(
+            self.tr(
+                "[MCSL2 | 提示]：服务器短时间内已崩溃{count}次，已停止自动重启。"
+                "请检查报错后手动启动。"
+            ).format(count=count)
+        )
+
+    def relaunchServer(self):
+        """崩溃后按原参数重新启动进程，保留终端内容"""
+        self.appendLog(self.tr("[MCSL2 | 提示]：正在重新启动服务器..."))
+        self.logDecoder.reset(self.serverVariables.outputDecoding)
+        if self.appCds is not None:
+            self.processArgs = self.appCds.relaunchArgs(self.processArgs)
+            self.Server.serverProcess.setArguments(self.processArgs)
+        self.startupProfiler.begin(self.processArgs)
+        self.Server.serverProcess.start()
+        self.resMonitor.start()
+        self.tickMetrics.start(reset=False)
+        self.playersPollTimer.start()
 
     def serverLogOutputHandler(self):
         """
         When the server outputs change, emit a signal with the updated output.
         """
         newData = self.Server.serverProcess.readAllStandardOutput().data()
-        self.partialData += newData  # Append the incoming data to the buffer
-        lines = self.partialData.split(b"\n")  # Split the buffer into lines
-        self.partialData = (
-            lines.pop()
-        )  # The last element might be incomplete, so keep it in the buffer
-
-        for line in lines:
-            newOutput = line.decode(serverVariables.outputDecoding, errors="replace")
-            self.serverLogOutput.emit(newOutput[:-1])
+        lines = self.logDecoder.feed(newData)
+        # 在分批之前计时，启动阶段的时间戳不受分批延迟影响
+        self.startupProfiler.onLines(lines)
+        self.logBatcher.pushLines(lines)
+
+    def flushServerLogOutput(self):
+        """进程结束时，把最后不完整的一行和所有待发送的日志立即发出"""
+        self.serverLogOutputHandler()
+        self.logBatcher.pushLines(self.logDecoder.flush())
+        self.logBatcher.flush()
+
+    def appendLog(self, line: str):
+        """向终端追加一行MCSL2自己的提示"""
+        self.logBatcher.push(line)
+
+    def logServerOutput(self, lines: List[str]):
+        MCSL2Logger.info("\n".join(lines))
+
+    def logThroughputStatistics(self):
+        MCSL2Logger.info(
+            f"服务器 {self.serverName} 日志吞吐：共 {self.logBatcher.totalLines} 行，"
+            f"{self.logBatcher.totalBatches} 批，"
+            f"峰值 {self.logBatcher.peakLinesPerSecond:.0f} 行/秒"
+        )
 
     def startServer(self, javaPath: str, processArgs: List[str], workingDirectory: str):
         """
@@ -158,59 +497,253 @@ class ServerHandler(QObject):
         self.javaPath = javaPath
         self.processArgs = processArgs
         self.workingDirectory = workingDirectory
+        self.logDecoder.reset(self.serverVariables.outputDecoding)
+        self.logBatcher.resetStatistics()
+        self.consoleBuffer.clear()
+        self.configureConsoleBuffer()
+        # 上一次运行的终端日志保留为.1，本次写入新文件
+        self.consoleBuffer.rotateSpill()
+        self.serverErrorHandler.reset()
+        self.supervisor.onManualStart()
+        # 重新读取计划任务，修改MCSL2Schedule.json后重启服务器即可生效
+        CommandScheduler().loadServer(self.serverName)
+        self.playersList.clear()
+        self.processTuning = ProcessTuning.load(self.serverName)
         self.Server = self.getServerProcess()
+        self.startupProfiler.begin(processArgs)
         self.Server.serverProcess.start()
+        self.resMonitor.start(clearHistory=True)
+        self.tickMetrics.start()
+        self.playersPollTimer.start()
 
     def stopServer(self):
         """
-        停止服务器
+        停止服务器，不等待进程退出
         """
+        self.supervisor.expectExit()
         if self.isServerRunning():
             if cfg.get(cfg.sendStopInsteadOfKill):
-                self.Server.serverProcess.write(b"stop\n")
-                # self.Server.serverProcess.waitForFinished()
+                self.stopper.stop()
             else:
                 self.haltServer()
 
     def restartServer(self):
         """
-        重启服务器
+        重启服务器，安全关闭后按原参数重新启动，不等待进程退出
         """
-        self.Server.serverProcess.write(b"stop\n")
-        self.Server.serverProcess.waitForFinished()
-        self.Server.serverProcess.start()
-        self.serverRestarted.emit()
+        self.supervisor.expectExit()
+        self.stopper.stop(restart=True)
 
     def haltServer(self):
         """
         强制停止服务器
         """
-        if self.isServerRunning():
-            self.Server.serverProcess.kill()
-            self.Server.serverProcess.waitForFinished()
+        self.supervisor.expectExit()
+        self.stopper.kill()
+
+    def sendCommand(self, command: str, dedupe: bool = True) -> bool:
+        """
+        向服务器发送命令，经指令队列限速，返回是否入队。\n
+        服务器未运行时不入队；dedupe为True时与待发送的指令重复也不入队，用户手动输入的指令应传False。
+        """
+        return self.commandQueue.enqueue(command, dedupe)
 
-    def sendCommand(self, command: str):
+    def writeCommand(self, command: str):
         """
-        用户向服务器发送命令
+        立即把命令写入服务器的标准输入
         """
-        self.Server.serverProcess.write(f"{command}\n".encode(serverVariables.inputEncoding))
+        self.Server.serverProcess.write(
+            f"{command}\n".encode(self.inputEncoding(), errors="replace")
+        )
+
+    def rconClient(self) -> Optional[RconClient]:
+        """
+        按server.properties获取RCON连接，未开启RCON或认证失败时返回None；设置改变后重新连接
+        """
+        properties = self.serverVariables.serverProperties
+        properties.refresh()
+        endpoint = rconEndpoint(properties)
+        if endpoint is not None and endpoint == self.rconAuthFailedEndpoint:
+            endpoint = None
+        if self.rcon is not None and self.rcon.endpoint != endpoint:
+            self.closeRcon()
+        if endpoint is not None and self.rcon is None:
+            self.rcon = RconClient(endpoint, self)
+            self.rcon.authFailed.connect(self.onRconAuthFailed)
+        return self.rcon
+
+    def onRconAuthFailed(self):
+        """密码错误时不再重试，改用标准输入，直到server.properties中的RCON设置改变"""
+        self.rconAuthFailedEndpoint = self.rcon.endpoint
+
+    def closeRcon(self):
+        if self.rcon is not None:
+            self.rcon.close()
+            self.rcon.deleteLater()
+            self.rcon = None
+
+    def runCommand(self, command: str, callback: Optional[RconCallback] = None) -> bool:
+        """
+        MCSL2发出的指令(快捷菜单、玩家列表等)，返回是否已发送或入队。\n
+        RCON已连接时经RCON发送，响应显示在终端并交给callback；
+        否则写入标准输入(callback收到None)，同时在后台建立RCON连接供下次使用。
+        """
+        client = self.rconClient() if self.isServerRunning() else None
+        if client is not None and client.ready:
+            client.request(command, lambda response: self.onRconResponse(response, callback))
+            return True
+        if client is not None:
+            client.ensureConnected()
+        queued = self.sendCommand(command)
+        if callback is not None:
+            callback(None)
+        return queued
+
+    def onRconResponse(self, response: Optional[str], callback: Optional[RconCallback]):
+        if response:
+            for line in response.splitlines():
+                self.appendLog(f"[RCON]：{line}")
+        if callback is not None:
+            callback(response)
+
+    def pollPlayers(self):
+        """经RCON执行list，校正从日志中记录的玩家列表；没有RCON时不轮询"""
+        client = self.rconClient() if self.isServerRunning() else None
+        if client is None:
+            return
+        if not client.ready:
+            client.ensureConnected()
+            return
+        client.request("list", self.onPlayersListed)
+
+    def onPlayersListed(self, response: Optional[str]):
+        players = parsePlayerList(response) if response else None
+        if players is not None:
+            self.playersList[:] = players
+
+    def onStatusPolled(self, status: ServerStatus):
+        """收到状态轮询结果；玩家样本完整时据此校正玩家列表"""
+        self.status = status
+        if status.hasFullSample():
+            self.playersList[:] = status.sample
+        self.statusChanged.emit(status)
+
+    def clearStatus(self):
+        self.status = None
+        self.statusChanged.emit(None)
+
+    def inputEncoding(self) -> str:
+        """发送指令用的编码，自动检测时跟随检测出的输出编码"""
+        encoding = self.serverVariables.inputEncoding
+        if encoding == StreamingLogDecoder.AUTO:
+            return self.logDecoder.encoding or "utf-8"
+        return resolveEncoding(encoding)
 
     def isServerRunning(self):
         if self.Server.serverProcess is None:
             return False
         return self.Server.serverProcess.state() == QProcess.Running
 
+    def processId(self) -> int:
+        """服务器进程的PID，未运行时为0"""
+        if self.Server.serverProcess is None:
+            return 0
+        return self.Server.serverProcess.processId()
+
+
+def parsePlayerList(response: str) -> Optional[List[str]]:
+    """
+    解析list指令的输出，数量对不上时返回None。\n
+    原版：There are 2 of a max of 20 players online: Steve, Alex\n
+    Paper等：There are 2 out of maximum 20 players online.\\ndefault: Steve, Alex
+    """
+    match = PLAYER_COUNT_PATTERN.search(response)
+    if match is None:
+        return None
+    count = int(match.group(1))
+    rest = response[match.end() :]
+    names = []
+    for line in rest.splitlines():
+        # 名字在冒号之后；没有冒号的是"players online."这样的句尾
+        if ": " not in line:
+            continue
+        for name in line.split(": ", 1)[1].split(","):
+            name = FORMATTING_PATTERN.sub("", name).strip()
+            if name:
+                names.append(name)
+    return names if len(names) == count else None
+
 
 @Singleton
+class ServerHandlerRegistry(QObject):
+    """
+    服务器实例注册表，以服务器名称为键。\n
+    每个实例拥有独立的进程、解码状态、资源监视器和终端缓冲区，使一个MCSL2可以同时运行多个服务器。
+    """
+
+    # 当新的服务器实例被创建时发出的信号(发送服务器名称)
+    handlerCreated = pyqtSignal(str)
+
+    def __init__(self):
+        super().__init__()
+        self._handlers: Dict[str, ServerHandler] = {}
+        # 所有实例共用的日志分类器，终端页创建后换成带翻译的
+        self.logClassifier = ConsoleLogClassifier()
+
+    def get(self, serverName: str) -> Optional[ServerHandler]:
+        """获取一个已存在的服务器实例"""
+        return self._handlers.get(serverName, None)
+
+    def getOrCreate(self, serverName: str) -> ServerHandler:
+        """获取一个服务器实例，不存在时创建"""
+        handler = self._handlers.get(serverName, None)
+        if handler is None:
+            handler = ServerHandler(serverName, self)
+            self._handlers[serverName] = handler
+            CommandScheduler().attach(handler)
+            ServerStatusPoller().attach(handler)
+            CoreAllocator().attach(handler)
+            self.handlerCreated.emit(serverName)
+        return handler
+
+    def current(self) -> ServerHandler:
+        """获取当前选中的服务器的实例"""
+        return self.getOrCreate(serverVariables.serverName)
+
+    def handlers(self) -> List[ServerHandler]:
+        return list(self._handlers.values())
+
+    def runningHandlers(self) -> List[ServerHandler]:
+        return [h for h in self._handlers.values() if h.isServerRunning()]
+
+    def isAnyServerRunning(self) -> bool:
+        return any(h.isServerRunning() for h in self._handlers.values())
+
+    def remove(self, serverName: str) -> bool:
+        """移除一个未在运行的服务器实例"""
+        handler = self._handlers.get(serverName, None)
+        if handler is None or handler.isServerRunning():
+            return False
+        self._handlers.pop(serverName)
+        CommandScheduler().detach(serverName)
+        ServerStatusPoller().detach(serverName)
+        CoreAllocator().detach(serverName)
+        handler.deleteLater()
+        return True
+
+
 class MojangEula:
     """有关Mojang Eula的部分。"""
 
-    def __init__(self):
-        self.serverDir = f".//Servers//{serverVariables.serverName}"
+    def __init__(self, serverName: str = ""):
+        self.serverName = serverName
+
+    @property
+    def serverDir(self) -> str:
+        return f".//Servers//{self.serverName or serverVariables.serverName}"
 
     def checkEula(self) -> bool:
         """检查Eula"""
-        self.__init__()
         try:
             with open(f"{self.serverDir}/eula.txt", "r", encoding="utf-8") as Eula:
                 EulaText = Eula.readlines()
@@ -234,15 +767,17 @@ class MojangEula:
             )
 
 
-@Singleton
 class ServerLauncher:
     """
     启动服务器的调用部分。
     """
 
-    def __init__(self):
+    def __init__(self, handler: ServerHandler):
+        self.handler = handler
         self.jvmArg: List[str] = [""]
         self.javaPath: str = ""
+        # 内存检查后降低的最大内存(字节)，为None时按服务器设置
+        self.maxMemOverride: Optional[int] = None
 
     def startServer(self) -> bool:
         """
@@ -251,47 +786,90 @@ class ServerLauncher:
         2.生成开服命令参数\n
         3.启动进程
         """
-        if not MojangEula().checkEula():
+        if not MojangEula(self.handler.serverName).checkEula():
             return False
         else:
+            # 启动时复制一份当前选中的服务器变量，之后修改选中的服务器不会影响已运行的实例
+            self.handler.serverVariables = serverVariables.copy()
+            self.applyMaxMemOverride()
             self.reGetNewJava()
             self.setjvmArg()
             self.launch()
             return True
 
+    def checkMemoryBudget(self) -> AdmissionDecision:
+        """按当前选中的服务器设置和运行中的服务器，检查启动后内存是否够用"""
+        heap = serverVariables.maxMem * unitBytes(serverVariables.memUnit)
+        return evaluateLaunch(
+            self.handler.serverName, heap, ServerHandlerRegistry().runningHandlers()
+        )
+
+    def applyMaxMemOverride(self):
+        """只改本次启动使用的变量，不修改服务器设置"""
+        if self.maxMemOverride is None:
+            return
+        variables = self.handler.serverVariables
+        unit = unitBytes(variables.memUnit)
+        if self.maxMemOverride % unit:
+            # 换算不成整数G时改用M
+            variables.minMem = variables.minMem * unit // MIB
+            variables.memUnit = "M"
+            unit = MIB
+        variables.maxMem = self.maxMemOverride // unit
+        variables.minMem = min(variables.minMem, variables.maxMem)
+        MCSL2Logger.info(
+            f"服务器 {self.handler.serverName} 本次以 {variables.maxMem}{variables.memUnit} "
+            "最大内存启动"
+        )
+
     def reGetNewJava(self):
-        self.javaPath = serverVariables.javaPath
+        self.javaPath = self.handler.serverVariables.javaPath
 
     def setjvmArg(self):
         """生成开服命令参数"""
+        variables = self.handler.serverVariables
         self.jvmArg = [
-            f"-Xms{serverVariables.minMem}{serverVariables.memUnit}",
-            f"-Xmx{serverVariables.maxMem}{serverVariables.memUnit}",
+            f"-Xms{variables.minMem}{variables.memUnit}",
+            f"-Xmx{variables.maxMem}{variables.memUnit}",
         ]
         # add jvm args
-        if isinstance(serverVariables.jvmArg, list):
-            self.jvmArg.extend(serverVariables.jvmArg)
+        if isinstance(variables.jvmArg, list):
+            self.jvmArg.extend(variables.jvmArg)
         else:
-            if serverVariables.jvmArg:
-                self.jvmArg.append(serverVariables.jvmArg)
+            if variables.jvmArg:
+                self.jvmArg.append(variables.jvmArg)
 
         # adjust to different server type
-        if serverVariables.serverType == "forge":
+        if variables.serverType == "forge":
             pass
         else:
             self.jvmArg.append("-jar")
-            self.jvmArg.append(f"{serverVariables.coreFileName}")
+            self.jvmArg.append(f"{variables.coreFileName}")
 
         # add "nogui" arg
         self.jvmArg.append("nogui")
+        self.applyAppCds()
         MCSL2Logger.info(f"生成JVM参数：\n{self.jvmArg}")
 
+    def applyAppCds(self):
+        """开启了AppCDS时，按服务器和Java加入创建或使用归档的参数"""
+        self.handler.appCds = None
+        if not cfg.get(cfg.enableAppCDS):
+            return
+        appCds = AppCdsArchive(self.serverDir(), self.javaPath, self.jvmArg)
+        self.jvmArg = appCds.apply(self.jvmArg)
+        if appCds.isSupported():
+            self.handler.appCds = appCds
+
+    def serverDir(self) -> str:
+        return str(osp.realpath(f"Servers//{self.handler.serverName}"))
+
     def launch(self):
         """启动进程"""
-        ServerHandler().startServer(
+        self.handler.startServer(
             javaPath=self.javaPath,
             processArgs=self.jvmArg,
-            workingDirectory=str(osp.realpath(f"Servers//{serverVariables.serverName}")),
+            workingDirectory=self.serverDir(),
         )
 
 
@@ -304,93 +882,21 @@ class readLastServerConfigThread(QThread):
     def run(self):
         # 不应该在这里直接启用启动服务器按钮，应先获取index补全服务器配置。
         lastServerName = cfg.get(cfg.lastServer)
+        # 在这里先解析全局配置，之后界面线程直接使用缓存
+        repository = ServerConfigRepository()
+        repository.reload()
         if lastServerName != "":
             # 不加try小心服务器删了又得boom
             try:
-                globalServerList = readGlobalServerConfig()
-                serverNameList: list = []
-                for i in range(len(globalServerList)):
-                    serverNameList.append(globalServerList[i]["name"])
-                ServerHelper().loadServerConfig(index=serverNameList.index(lastServerName))
+                index = repository.indexOf(lastServerName)
+                if index < 0:
+                    raise KeyError(lastServerName)
+                ServerHelper().loadServerConfig(index=index)
                 ServerHelper().startBtnStat.emit(True)
                 ServerHelper().serverName.emit(lastServerName)
             except Exception:
                 ServerHelper().startBtnStat.emit(False)
         else:
             ServerHelper().startBtnStat.emit(False)
-
-
-class MinecraftServerResMonitorUtil(QObject):
-    """
-    获取服务器资源占用的线程
-    """
-
-    memPercent = pyqtSignal(float)
-    cpuPercent = pyqtSignal(float)
-
-    def __init__(self, parent=None):
-        super().__init__(parent)
-        self.setObjectName("MinecraftServerResMonitorThread")
-        self.timer = QTimer(self)
-        self.timer.timeout.connect(self.getServerMem)
-        self.timer.timeout.connect(self.getServerCPU)
-        self.timer.start(1000)  # 每隔1秒获取一次
-
-    def getServerMem(self):
-        divisionNumList = {"G": 1073741824, "M": 1048576}
-        divisionNum = divisionNumList[serverVariables.memUnit]
-        try:
-            if ServerHandler().isServerRunning():
-                serverMem = (
-                    Process(ServerHandler().AServer.serverProcess.processId())
-                    .memory_full_info()
-                    .uss
-                    / divisionNum
-                )
-                self.memPercent.emit(float("{:.4f}".format(serverMem)))
-            else:
-                self.memPercent.emit(0.0000)
-        except NoSuchProcess:
-            pass
-        except PermissionError:
-            pass
-        except AccessDenied:
-            pass
-
-    def getServerCPU(self):
-        try:
-            if ServerHandler().isServerRunning():
-                serverCPU = Process(ServerHandler().AServer.serverProcess.processId()).cpu_percent(
-                    interval=0.01
-                )
-                self.cpuPercent.emit(float("{:.4f}".format(serverCPU / 10)))
-            else:
-                self.cpuPercent.emit(0.0000)
-        except NoSuchProcess:
-            pass
-        except PermissionError:
-            pass
-        except AccessDenied:
-            pass
-
-    @pyqtSlot(int)
-    def onServerClosedHandler(self, _):
-        self.cpuPercent.emit(0.0)
-        self.memPercent.emit(0.0)
-        self.timer.stop()
-
-
-def readServerProperties():
-    serverVariables.serverProperties.clear()
-    try:
-        with open(
-            f"./Servers/{serverVariables.serverName}/server.properties", "r"
-        ) as serverPropertiesFile:
-            lines = serverPropertiesFile.readlines()
-            for line in lines:
-                line = line.strip()
-                if line and not line.startswith("#"):
-                    key, value = line.split("=", 1)
-                    serverVariables.serverProperties[key.strip()] = value.strip()
-    except FileNotFoundError:
-        serverVariables.serverProperties.update({"msg": "File not found"})
+        # 按钮状态已经更新，再检查所有服务器的配置和核心文件，结果通过信号报告
+        ServerSettingController().load()
@@ -4,158 +4,271 @@
 #
 ################################################################################
 """
-Minecraft Forge Servers Installer.
+Server error analyzer, matches server log lines against a table of known errors.
 """
 
 import re
+from functools import lru_cache
+from typing import Callable, Dict, Iterable, List, Match, NamedTuple, Pattern, Tuple, Union
+
+
+class ErrorRule(NamedTuple):
+    """
+    一条报错分析规则。\n
+    keywords: 行中必须出现的任一关键词，用于合并预筛\n
+    pattern: 预筛命中后再匹配的正则，用命名分组提取信息\n
+    message: 诊断结果，可以是用分组名格式化的模板(额外可用{line}表示整行)，也可以是接收Match的函数
+    """
+
+    keywords: Tuple[str, ...]
+    pattern: str
+    message: Union[str, Callable[[Match], str]]
+    stripFormatting: bool = False
+
+
+def _classVersionMessage(match: Match) -> str:
+    msg = "Java版本不正确，请更换Java。"
+    if match.group("version"):
+        # class file version 52对应Java 8，之后每个大版本加1
+        version = int(match.group("version"))
+        if version >= 52:
+            msg += f"\n根据错误报告，推荐使用Java {version - 44}。"
+    return msg
+
+
+def _modRequiresMessage(match: Match) -> str:
+    if match.group("above"):
+        return (
+            f"*{match.group('mod')} 模组出现问题！该模组需要前置 {match.group('dep')} 或以上版本！"
+        )
+    return f"*{match.group('mod')} 模组出现问题！该模组需要前置 {match.group('dep')}！"
+
+
+# fmt: off
+ERROR_RULES: Tuple[ErrorRule, ...] = (
+    ErrorRule(
+        ("UnsupportedClassVersionError",),
+        r"UnsupportedClassVersionError(?:.*?class file version (?P<version>\d+))?",
+        _classVersionMessage,
+    ),
+    ErrorRule(
+        ("Unsupported Java detected",),
+        r"Unsupported Java detected.*?Only up to (?P<java>Java \d+)",
+        "该服务器正在使用的Java与服务器不兼容。\n请使用{java}",
+    ),
+    ErrorRule(
+        ("requires running the server with",),
+        r"requires running the server with (?P<java>Java \d+(?: or above)?)",
+        "该服务器正在使用的Java与服务器不匹配。\n请使用{java}！",
+    ),
+    ErrorRule(
+        ("OutOfMemoryError",),
+        r"OutOfMemoryError",
+        "服务器内存溢出。请检查服务器内存设置，不要超出可用内存，也不要太小。",
+    ),
+    ErrorRule(
+        ("Invalid maximum heap size",),
+        r"Invalid maximum heap size",
+        "服务器最大内存分配有误：\n{line}",
+    ),
+    ErrorRule(
+        ("Unrecognized VM option",),
+        r"Unrecognized VM option '(?P<option>[^']*)'",
+        "服务器JVM参数有误，请前往服务器管理页修改或删除以下参数：\n{option}",
+    ),
+    ErrorRule(
+        ("There is insufficient memory for the Java Runtime Environment to continue",),
+        r"There is insufficient memory for the Java Runtime Environment to continue",
+        "JVM内存分配不足，请尝试增加系统的虚拟内存。",
+    ),
+    ErrorRule(
+        ("进程无法访问",),
+        r"进程无法访问",
+        "文件被占用，您的服务器可能多开，请检查任务管理器等。",
+    ),
+    ErrorRule(
+        ("FAILED TO BIND TO PORT",),
+        r"FAILED TO BIND TO PORT",
+        "端口被占用，您的服务器可能多开，请检查任务管理器等。",
+    ),
+    ErrorRule(
+        ("Unable to access jarfile", "加载 Java 代理时出错"),
+        r"Unable to access jarfile|加载 Java 代理时出错",
+        "无法访问Jar可执行文件，请检查文件是否存在，或更换服务器核心或名称。",
+    ),
+    ErrorRule(
+        ("ndexOutOfBoundsException",),
+        r"Array[Il]ndexOutOfBoundsException",
+        "服务器发生数组越界错误，请尝试更换服务端。",
+    ),
+    ErrorRule(
+        ("ClassCastException",),
+        r"ClassCastException",
+        "服务器发生类转换异常，请检查Java版本是否匹配。",
+    ),
+    ErrorRule(
+        ("could not open",),
+        r"could not open.*jvm\.cfg",
+        "Java环境异常，请检查Java的安装是否完整，若无法确定原因，请尝试重装Java。",
+    ),
+    ErrorRule(
+        ("Failed to download vanilla jar",),
+        r"Failed to download vanilla jar",
+        "服务器下载原版核心文件失败，请检查网络，必要的情况下请使用代理。",
+    ),
+    ErrorRule(
+        ('Exception in thread "main"',),
+        r'Exception in thread "main"',
+        '服务端给出了如下报错：\nException in thread "main"\n请尝试更换Java版本或服务端。',
+    ),
+    ErrorRule(
+        ("Could not load",),
+        r"^(?=.*plugin).*?Could not load '(?P<plugin>[^']+)'",
+        "无法加载下列插件：\n{plugin}",
+    ),
+    ErrorRule(
+        ("Error loading plugin",),
+        r"Error loading plugin.*? '(?P<plugin>[^']+)'",
+        "无法加载下列插件：\n{plugin}",
+    ),
+    ErrorRule(
+        ("Error occurred while enabling ",),
+        r"Error occurred while enabling (?P<plugin>.+?) \(",
+        "在启用 {plugin} 时发生了错误",
+    ),
+    ErrorRule(
+        ("Encountered an unexpected exception",),
+        r"Encountered an unexpected exception",
+        "服务器出现意外崩溃，可能是由于模组冲突，请检查您的模组列表。\n如果使用的是整合包，请使用整合包制作方提供的服务器专用包开服。",
+    ),
+    ErrorRule(
+        ("requires",),
+        r"Mod (?P<mod>\w+) requires (?P<dep>\w+ \d+\.\d+\.\d+)(?P<above>.*or above)?",
+        _modRequiresMessage,
+        stripFormatting=True,
+    ),
+)
+# fmt: on
+
+# Minecraft格式代码(&a、§a)和ANSI颜色控制码
+FORMATTING_PATTERN = re.compile(r"[&§][0-9a-fk-orA-FK-OR]|\x1b\[[\d;]*m")
+
+# 服务器日志中常见的字符，大致按出现频率从高到低排列，不在其中的字符视为最少见
+_COMMON_LOG_CHARS = " ernai:tos0.1mdl[c]g2vpfhuONI/F45Sk8L3Py7RbA-;C,j'METD()6VwU"
+# 预筛片段的最大、最小长度
+_ANCHOR_LENGTH = 6
+_MIN_ANCHOR_LENGTH = 3
+
+
+def _keywordAnchor(keyword: str) -> str:
+    """
+    关键词中以最少见的字符开头的一段。\n
+    预筛正则只在片段的首字符处尝试匹配，首字符越少见，扫描时需要尝试的位置就越少；
+    含有关键词的行一定含有这一段，命中后再逐个确认完整的关键词。
+    """
+
+    def rarity(char: str) -> int:
+        index = _COMMON_LOG_CHARS.find(char)
+        return len(_COMMON_LOG_CHARS) if index == -1 else index
+
+    start = max(
+        range(max(len(keyword) - _MIN_ANCHOR_LENGTH + 1, 1)),
+        key=lambda i: (rarity(keyword[i]), -i),
+    )
+    return keyword[start : start + _ANCHOR_LENGTH]
+
+
+@lru_cache(maxsize=None)
+def _compileRules(
+    rules: Tuple[ErrorRule, ...]
+) -> Tuple[List[Pattern], Pattern, List[Tuple[str, int]]]:
+    """
+    编译规则表：各规则的正则、预筛正则、按规则表顺序排列的(关键词, 规则序号)。\n
+    构建要花上几百微秒，同一规则表只构建一次，各服务器的分析器共用。
+    """
+    rulePatterns = [re.compile(rule.pattern) for rule in rules]
+    keywordIndexes = [
+        (keyword, index) for index, rule in enumerate(rules) for keyword in rule.keywords
+    ]
+    # 所有关键词的片段合并成一个预筛正则，re按各片段的首字符跳过不可能命中的位置
+    anchors = {_keywordAnchor(keyword) for keyword, _ in keywordIndexes}
+    # 包含其他片段的片段是多余的
+    anchors = {a for a in anchors if not any(b != a and b in a for b in anchors)}
+    prefilter = re.compile("|".join(re.escape(anchor) for anchor in sorted(anchors)))
+    return rulePatterns, prefilter, keywordIndexes
 
 
 class ServerErrorHandler:
-    lineCount: int = 0
-    msg: str = ""
-
-    @classmethod
-    def detect(cls, errMsg):
-        if cls.lineCount <= 50:
-            cls.lineCount += 1
-
-            if "UnsupportedClassVersionError" in errMsg:
-                cls.msg += "Java版本不正确，请更换Java。\n"
-                a = int(
-                    errMsg[
-                        errMsg.index("(class file version ") + 20 : errMsg.index(
-                            "(class file version "
-                        )
-                        + 22
-                    ]
-                )
-
-                versionMapping = {
-                    52: "Java 8",
-                    53: "Java 9",
-                    54: "Java 10",
-                    55: "Java 11",
-                    56: "Java 12",
-                    57: "Java 13",
-                    58: "Java 14",
-                    59: "Java 15",
-                    60: "Java 16",
-                    61: "Java 17",
-                    62: "Java 18",
-                    63: "Java 19",
-                    64: "Java 20",
-                }
-
-                if a in versionMapping:
-                    cls.msg += f"根据错误报告，推荐使用{versionMapping[a]}。\n"
-
-            elif "Unsupported Java detected" in errMsg:
-                cls.msg += "该服务器正在使用的Java与服务器不兼容。\n"
-                cls.msg += f"请使用{errMsg[errMsg.index('Only up to ') + 11: errMsg.index('Only up to ') + 18]}\n"
-
-            elif "requires running the server with" in errMsg:
-                cls.msg += "该服务器正在使用的Java与服务器不匹配。\n"
-                cls.msg += (
-                    f"请使用{errMsg[errMsg.index('Java') + 4: errMsg.index('Java') + 11]}！\n"
-                )
-
-            elif "OutOfMemoryError" in errMsg:
-                cls.msg += "服务器内存溢出。请检查服务器内存设置，不要超出可用内存，也不要太小。\n"
-
-            elif "Invalid maximum heap size" in errMsg:
-                cls.msg += "服务器最大内存分配有误：\n" + errMsg + "\n"
-
-            elif "Unrecognized VM option" in errMsg:
-                cls.msg += (
-                    "服务器JVM参数有误，请前往服务器管理页修改或删除以下参数：\n"
-                    + errMsg[errMsg.index("'") + 1 : errMsg.rindex(" '")]
-                    + "\n"
-                )
-
-            elif (
-                "There is insufficient memory for the Java Runtime Environment to continue"
-                in errMsg
-            ):
-                cls.msg += "JVM内存分配不足，请尝试增加系统的虚拟内存。\n"
-
-            elif "进程无法访问" in errMsg:
-                if (
-                    not cls.msg
-                    or "文件被占用，您的服务器可能多开，请检查任务管理器等。\n" not in cls.msg
-                ):
-                    cls.msg += "文件被占用，您的服务器可能多开，请检查任务管理器等。\n"
-
-            elif "FAILED TO BIND TO PORT" in errMsg:
-                cls.msg += "端口被占用，您的服务器可能多开，请检查任务管理器等。\n"
-
-            elif "Unable to access jarfile" in errMsg:
-                cls.msg += "无法访问Jar可执行文件，请检查文件是否存在，或更换服务器核心或名称。\n"
-
-            elif "加载 Java 代理时出错" in errMsg:
-                cls.msg += "无法访问Jar可执行文件，请检查文件是否存在，或更换服务器核心或名称。\n"
-
-            elif "ArraylndexOutOfBoundsException" in errMsg:
-                cls.msg += "服务器发生数组越界错误，请尝试更换服务端。\n"
-
-            elif "ClassCastException" in errMsg:
-                cls.msg += "服务器发生类转换异常，请检查Java版本是否匹配。\n"
-
-            elif "could not open" in errMsg and "jvm.cfg" in errMsg:
-                cls.msg += (
-                    "Java环境异常，请检查Java的安装是否完整，若无法确定原因，请尝试重装Java。\n"
-                )
-
-            elif "Failed to download vanilla jar" in errMsg:
-                cls.msg += "服务器下载原版核心文件失败，请检查网络，必要的情况下请使用代理。\n"
-
-            elif 'Exception in thread "main"' in errMsg:
-                cls.msg += '服务端给出了如下报错：\nException in thread "main"\n请尝试更换Java版本或服务端。'
-
-        if "Could not load" in errMsg and "plugin" in errMsg:
-            cls.msg += "无法加载下列插件：\n"
-            startIdx = errMsg.index("Could not load '") + 16
-            endIdx = errMsg.index("' ", startIdx)
-            cls.msg += "{}\n".format(errMsg[startIdx:endIdx])
-        elif "Error loading plugin" in errMsg:
-            cls.msg += "无法加载下列插件：\n"
-            startIdx = errMsg.index(" '") + 2
-            endIdx = errMsg.index("' ", startIdx)
-            cls.msg += "{}\n".format(errMsg[startIdx:endIdx])
-
-        elif "Error occurred while enabling " in errMsg:
-            cls.msg += (
-                f"在启用 {errMsg[errMsg.index('enabling ') + 9: errMsg.index(' (')]} 时发生了错误\n"
-            )
-
-        elif "Encountered an unexpected exception" in errMsg:
-            cls.msg += "服务器出现意外崩溃，可能是由于模组冲突，请检查您的模组列表。\n如果使用的是整合包，请使用整合包制作方提供的服务器专用包开服。\n"
-
-        elif "Mod" in errMsg and "requires" in errMsg:
-            if "&" in errMsg:
-                errMsg = "".join(everyMsg[1:] for everyMsg in errMsg.split("&") if everyMsg)
-
-            elif "§" in errMsg:
-                errMsg = "".join(every_msg[1:] for every_msg in errMsg.split("§") if every_msg)
-
-            elif "\x1B" in errMsg:
-                errMsg = "".join(
-                    every_msg[every_msg.index("m") + 1:]
-                    for every_msg in errMsg.split("\x1B")
-                    if every_msg
-                )
-
-            modNamePattern = r"Mod (\w+) requires"
-            preModPattern = r"requires (\w+ \d+\.\d+\.\d+)"
-
-            modNameMatch = re.search(modNamePattern, errMsg)
-            preModMatch = re.search(preModPattern, errMsg)
-
-            if modNameMatch and preModMatch:
-                modName = modNameMatch.group(1)
-                preMod = preModMatch.group(1)
-
-                if "or above" in errMsg:
-                    cls.msg += f"*{modName} 模组出现问题！该模组需要前置 {preMod} 或以上版本！\n"
-                else:
-                    cls.msg += f"*{modName} 模组出现问题！该模组需要前置 {preMod}！\n"
-        return cls.msg
+    """
+    服务器报错分析器，每个服务器实例各持有一个。\n
+    所有规则的关键词合并为一个预筛正则，每行(或每批日志)只扫描一次，绝大多数行直接跳过；
+    只有命中的行才确定涉及哪些规则并逐条匹配。诊断结果按出现顺序去重保存。
+    """
+
+    def __init__(self, rules: Tuple[ErrorRule, ...] = ERROR_RULES):
+        self.rules = rules
+        self._rulePatterns, self._prefilter, self._keywordIndexes = _compileRules(rules)
+        # detect对每一行都要调用，预先取出方法省去属性查找
+        self._prefilterSearch = self._prefilter.search
+        # 用dict当作有序集合
+        self.diagnoses: Dict[str, None] = {}
+
+    def reset(self):
+        self.diagnoses.clear()
+
+    def _analyseLine(self, line: str, ruleIndexes: Iterable[int]) -> List[str]:
+        newDiagnoses = []
+        stripped = None
+        for index in ruleIndexes:
+            rule = self.rules[index]
+            text = line
+            if rule.stripFormatting:
+                if stripped is None:
+                    stripped = FORMATTING_PATTERN.sub("", line)
+                text = stripped
+            match = self._rulePatterns[index].search(text)
+            if match is None:
+                continue
+            if callable(rule.message):
+                diagnosis = rule.message(match)
+            elif "{" in rule.message:
+                diagnosis = rule.message.format(line=line, **match.groupdict(default=""))
+            else:
+                diagnosis = rule.message
+            if diagnosis not in self.diagnoses:
+                self.diagnoses[diagnosis] = None
+                newDiagnoses.append(diagnosis)
+        return newDiagnoses
+
+    def detect(self, line: str) -> List[str]:
+        """
+        分析一行，返回新得到的诊断。\n
+        预筛命中后按规则表的顺序逐个确认完整的关键词；同一规则的多个关键词都出现时
+        序号会重复，诊断本身已去重，只多匹配一次。
+        """
+        if self._prefilterSearch(line) is None:
+            return []
+        return self._analyseLine(
+            line, [index for keyword, index in self._keywordIndexes if keyword in line]
+        )
+
+    def detectLines(self, lines: List[str]) -> List[str]:
+        """
+        分析一批日志，返回新得到的诊断。\n
+        整批拼接后用预筛正则扫描一遍，通常一处都不会命中；命中时跳到下一行继续扫描。
+        """
+        text = "\n".join(lines)
+        search = self._prefilter.search
+        newDiagnoses = []
+        match = search(text)
+        while match is not None:
+            lineStart = text.rfind("\n", 0, match.start()) + 1
+            lineEnd = text.find("\n", match.end())
+            line = text[lineStart:] if lineEnd == -1 else text[lineStart:lineEnd]
+            newDiagnoses += self.detect(line)
+            match = None if lineEnd == -1 else search(text, lineEnd)
+        return newDiagnoses
+
+    def report(self) -> str:
+        """所有诊断结果，每条一段"""
+        return "\n".join(self.diagnoses)
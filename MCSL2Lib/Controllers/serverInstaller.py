@@ -17,7 +17,7 @@ Minecraft Forge Servers Installer.
 import json
 import shutil
 from enum import Enum
-from json import loads, dumps
+from json import loads
 from os import path as osp, name as osname, remove, makedirs
 from typing import Optional, Tuple, Any
 from zipfile import BadZipFile, ZipFile
@@ -32,7 +32,7 @@ from PyQt5.QtCore import (
 )
 from PyQt5.QtNetwork import QNetworkRequest, QNetworkAccessManager
 
-from MCSL2Lib.Controllers.settingsController import cfg
+from MCSL2Lib.Controllers.serverConfigRepository import ServerConfigRepository
 from MCSL2Lib.utils import MCSL2Logger
 from MCSL2Lib.utils import ServerUrl
 from MCSL2Lib.variables import ConfigureServerVariables, EditServerVariables
@@ -449,44 +449,20 @@ class ForgeInstaller(Installer):
                         configureServerVariables.jvmArg.extend(forgeArgs)
                     else:
                         editServerVariables.jvmArg.extend(forgeArgs)
-                # 写入全局配置
+                # 写入服务器配置
                 try:
-                    with open(
-                        r"MCSL2/MCSL2_ServerList.json", "r", encoding="utf-8"
-                    ) as globalServerListFile:
-                        # old
-                        globalServerList = loads(globalServerListFile.read())
-                    d = globalServerList["MCSLServerList"][
-                        len(globalServerList["MCSLServerList"]) - 1
-                        if self.isEditing is None
-                        else self.isEditing
-                    ]
+                    repository = ServerConfigRepository()
+                    serverName = (
+                        configureServerVariables if self.isEditing is None else editServerVariables
+                    ).serverName
+                    d = repository.get(serverName).toDict()
                     d["jvm_arg"].extend(forgeArgs)
                     d.update(
                         {
                             "server_type": "forge",
                         }
                     )
-                    globalServerList["MCSLServerList"].pop(
-                        -1 if self.isEditing is None else self.isEditing
-                    )
-                    globalServerList["MCSLServerList"].append(d)
-                    with open(
-                        r"MCSL2/MCSL2_ServerList.json", "w+", encoding="utf-8"
-                    ) as newGlobalServerListFile:
-                        newGlobalServerListFile.write(dumps(globalServerList, indent=4))
-                except Exception as e:
-                    raise e
-
-                # 写入单独配置
-                try:
-                    if not cfg.get(cfg.onlySaveGlobalServerConfig):
-                        with open(
-                            osp.join(self.cwd, "MCSL2ServerConfig.json"),
-                            mode="w+",
-                            encoding="utf-8",
-                        ) as f:
-                            f.write(dumps(d, indent=4))
+                    repository.update(d["name"], d)
                 except Exception as e:
                     raise e
 
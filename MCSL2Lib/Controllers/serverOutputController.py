@@ -0,0 +1,224 @@
+#     Copyright 2023, MCSL Team, mailto:lxhtt@vip.qq.com
+#
+#     Part of "MCSL2", a simple and multifunctional Minecraft server launcher.
+#
+#     Licensed under the GNU General Public License, Version 3.0, with our
+#     additional agreements. (the "License");
+#     you may not use this file except in compliance with the License.
+#     You may obtain a copy of the License at
+#
+#        https://github.com/MCSLTeam/MCSL2/raw/master/LICENSE
+#
+################################################################################
+"""
+Server output pipeline, between the server process and the console.
+"""
+
+import codecs
+import locale
+import re
+from time import monotonic
+from typing import Iterable, List, Optional
+
+from PyQt5.QtCore import QObject, QTimer, pyqtSignal
+
+_CRLF_PATTERN = re.compile(r"\r+\n")
+# 除LF、CR以外，str.splitlines也会在这些字符处换行
+_OTHER_LINE_BREAKS = "\v\f\x1c\x1d\x1e\x85\u2028\u2029"
+
+
+def resolveEncoding(encoding: str) -> str:
+    """
+    把设置中的编码名转换为Python可用的编码名。\n
+    "ansi"即系统的本地编码(Windows下为mbcs)，其他平台上没有这个编码，改用locale的首选编码
+    """
+    if encoding.lower() == "ansi":
+        try:
+            return codecs.lookup("mbcs").name
+        except LookupError:
+            return locale.getpreferredencoding(False)
+    try:
+        return codecs.lookup(encoding).name
+    except LookupError:
+        return "utf-8"
+
+
+class StreamingLogDecoder:
+    """
+    服务器输出的流式解码器。\n
+    每次读到的整块字节一次性交给增量解码器，被截断在两次读取之间的多字节字符会留到下次拼好再解码；
+    随后整块用一次splitlines切分(LF、CRLF、单独的CR都算换行)，最后不完整的一行留到下次。\n
+    encoding为"auto"时，在服务器输出第一个非ASCII字符时取样检测：
+    能按UTF-8解码就用UTF-8，否则依次尝试GB18030和系统本地编码。
+    """
+
+    AUTO = "auto"
+    # 自动检测时最少的取样字节数(或取样已包含换行)
+    sampleSize = 64
+
+    def __init__(self, encoding: str = AUTO):
+        self.reset(encoding)
+
+    def reset(self, encoding: Optional[str] = None):
+        """
+        清空未解码的数据\n
+        encoding: 新的编码，不传则沿用之前的(包括已检测出的编码)
+        """
+        if encoding is not None:
+            self.requestedEncoding = encoding
+            self.encoding: Optional[str] = (
+                None if encoding == self.AUTO else resolveEncoding(encoding)
+            )
+        self._decoder = None if self.encoding is None else self._newDecoder(self.encoding)
+        self._undetected = b""  # 检测出编码前，未解码的非ASCII数据
+        self._pendingText = ""  # 不完整的一行
+
+    @staticmethod
+    def _newDecoder(encoding: str):
+        return codecs.getincrementaldecoder(encoding)(errors="replace")
+
+    @staticmethod
+    def detectEncoding(sample: bytes) -> str:
+        """根据一段取样检测编码，取样末尾可以是被截断的字符"""
+        for encoding in ("utf-8", "gb18030"):
+            try:
+                codecs.getincrementaldecoder(encoding)().decode(sample, final=False)
+                return encoding
+            except UnicodeDecodeError:
+                continue
+        return resolveEncoding("ansi")
+
+    def _decode(self, data: bytes, final: bool = False) -> str:
+        if self._decoder is not None:
+            return self._decoder.decode(data, final)
+        data = self._undetected + data
+        if data.isascii():
+            # 还没有出现非ASCII字符，此时任何编码的结果都一样
+            self._undetected = b""
+            return data.decode("ascii")
+        firstNonASCII = next((i for i, b in enumerate(data) if b >= 0x80), len(data))
+        sample = data[firstNonASCII:]
+        if b"\n" not in sample and len(sample) < self.sampleSize and not final:
+            # 这一行还没输出完，反正要等到换行才能显示，不如攒够一行再检测，结果更可靠
+            self._undetected = sample
+            return data[:firstNonASCII].decode("ascii")
+        self._undetected = b""
+        self.encoding = self.detectEncoding(sample)
+        self._decoder = self._newDecoder(self.encoding)
+        return data[:firstNonASCII].decode("ascii") + self._decoder.decode(sample, final)
+
+    def _split(self, text: str) -> List[str]:
+        """
+        整块文本用一次splitlines切分，LF、CRLF和单独的CR都算换行。\n
+        Windows下偶尔出现的CRCRLF先合并，免得多出空行；
+        末尾的CR可能和下一块开头的LF是一对，会随不完整的一行留到下次。
+        """
+        if self._pendingText:
+            text = self._pendingText + text
+        if "\r\r" in text:
+            text = _CRLF_PATTERN.sub("\n", text)
+        tail = ""
+        if text[-1] == "\r":
+            body = text.rstrip("\r")
+            text, tail = body, text[len(body) :]
+        lines = text.splitlines()
+        if text and text[-1] != "\n" and text[-1] not in _OTHER_LINE_BREAKS:
+            self._pendingText = lines.pop() + tail
+        else:
+            self._pendingText = tail
+        return lines
+
+    def feed(self, data: bytes) -> List[str]:
+        """解码一块数据，返回其中完整的行"""
+        text = self._decode(data)
+        return self._split(text) if text else []
+
+    def flush(self) -> List[str]:
+        """进程结束时调用，返回剩余的不完整的一行(若有)，并清空状态"""
+        text = self._decode(b"", final=True)
+        lines = self._split(text) if text else []
+        rest = self._pendingText.rstrip("\r")
+        if rest:
+            lines.append(rest)
+        self.reset()
+        return lines
+
+
+class ServerLogBatcher(QObject):
+    """
+    服务器日志批处理器。\n
+    把解码后的日志行攒成批，按固定间隔(或攒够一定行数时)一次性发出，
+    避免服务器刷屏时每行都触发一次槽函数调用导致界面卡死。
+    """
+
+    # 一批日志行(发送一个字符串列表)
+    batchReady = pyqtSignal(list)
+
+    def __init__(self, interval: int = 33, maxBatchLines: int = 2000, parent=None):
+        """
+        interval: 刷新间隔，单位毫秒\n
+        maxBatchLines: 攒够多少行时不等间隔立即刷新
+        """
+        super().__init__(parent)
+        self.maxBatchLines = maxBatchLines
+        self.pendingLines: List[str] = []
+        self.timer = QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.setInterval(interval)
+        self.timer.timeout.connect(self.flush)
+
+        # 吞吐量统计
+        self.totalLines = 0
+        self.totalBatches = 0
+        self.linesPerSecond = 0.0
+        self.peakLinesPerSecond = 0.0
+        self._rateWindowStart = monotonic()
+        self._rateWindowLines = 0
+
+    def setInterval(self, interval: int):
+        self.timer.setInterval(interval)
+
+    def push(self, line: str):
+        """加入一行"""
+        self.pendingLines.append(line)
+        self._schedule()
+
+    def pushLines(self, lines: Iterable[str]):
+        """加入多行"""
+        self.pendingLines.extend(lines)
+        self._schedule()
+
+    def _schedule(self):
+        if len(self.pendingLines) >= self.maxBatchLines:
+            self.flush()
+        elif not self.timer.isActive():
+            self.timer.start()
+
+    def flush(self):
+        """立即发出所有待发送的行"""
+        self.timer.stop()
+        if not self.pendingLines:
+            return
+        batch, self.pendingLines = self.pendingLines, []
+        self._updateRate(len(batch))
+        self.batchReady.emit(batch)
+
+    def _updateRate(self, count: int):
+        self.totalLines += count
+        self.totalBatches += 1
+        self._rateWindowLines += count
+        now = monotonic()
+        elapsed = now - self._rateWindowStart
+        if elapsed >= 1.0:
+            self.linesPerSecond = self._rateWindowLines / elapsed
+            self.peakLinesPerSecond = max(self.peakLinesPerSecond, self.linesPerSecond)
+            self._rateWindowStart = now
+            self._rateWindowLines = 0
+
+    def resetStatistics(self):
+        self.totalLines = 0
+        self.totalBatches = 0
+        self.linesPerSecond = 0.0
+        self.peakLinesPerSecond = 0.0
+        self._rateWindowStart = monotonic()
+        self._rateWindowLines = 0
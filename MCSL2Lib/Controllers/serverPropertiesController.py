@@ -0,0 +1,215 @@
+#     Copyright 2023, MCSL Team, mailto:lxhtt@vip.qq.com
+#
+#     Part of "MCSL2", a simple and multifunctional Minecraft server launcher.
+#
+#     Licensed under the GNU General Public License, Version 3.0, with our
+#     additional agreements. (the "License");
+#     you may not use this file except in compliance with the License.
+#     You may obtain a copy of the License at
+#
+#        https://github.com/MCSLTeam/MCSL2/raw/master/LICENSE
+#
+################################################################################
+"""
+Cached server.properties store, reloads only when the file changes.
+"""
+
+import os
+import re
+from os import path as osp
+from threading import RLock
+from time import monotonic
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from MCSL2Lib.utils import writeFileAtomic
+
+
+def _unescape(text: str) -> str:
+    """反转义Java properties中的值"""
+    if "\\" not in text:
+        return text
+
+    def repl(match):
+        escaped = match.group(1)
+        if escaped.startswith("u"):
+            return chr(int(escaped[1:], 16))
+        return {"t": "\t", "n": "\n", "r": "\r", "f": "\f"}.get(escaped, escaped)
+
+    return re.sub(r"\\(u[0-9a-fA-F]{4}|.)", repl, text)
+
+
+def _escape(text: str, isKey: bool = False) -> str:
+    """按Java properties的规则转义，非ASCII字符写为\\uXXXX"""
+    result = []
+    for i, char in enumerate(text):
+        if char == "\\":
+            result.append("\\\\")
+        elif char == "\n":
+            result.append("\\n")
+        elif char == "\r":
+            result.append("\\r")
+        elif char == "\t":
+            result.append("\\t")
+        elif isKey and char in "=: ":
+            result.append("\\" + char)
+        elif char == " " and i == 0:
+            # 值开头的空格在读取时会被当作分隔符跳过
+            result.append("\\ ")
+        elif ord(char) > 0x7E:
+            result.append(f"\\u{ord(char):04x}" if ord(char) <= 0xFFFF else char)
+        else:
+            result.append(char)
+    return "".join(result)
+
+
+class ServerProperties:
+    """
+    单个服务器的server.properties缓存。\n
+    只有文件的mtime或大小变化时才重新读取，且两次检查之间至少间隔checkInterval秒；
+    修改后保存时保留原有的注释和顺序。
+    """
+
+    # 两次stat检查之间的最短间隔，单位秒
+    checkInterval: float = 1.0
+
+    _instances: Dict[str, "ServerProperties"] = {}
+    _instancesLock = RLock()
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = RLock()
+        self._lines: List[str] = []
+        self._index: Dict[str, int] = {}  # 键 -> 所在行号
+        self._values: Dict[str, str] = {}
+        self._stamp: Optional[Tuple[int, int]] = None  # (mtime_ns, size)
+        self._lastCheck: float = -self.checkInterval
+        self._dirty = False
+        self.exists: bool = False
+
+    @classmethod
+    def forServer(cls, serverName: str) -> "ServerProperties":
+        """获取某个服务器共享的缓存实例"""
+        path = osp.join("Servers", serverName, "server.properties")
+        with cls._instancesLock:
+            instance = cls._instances.get(path, None)
+            if instance is None:
+                instance = cls(path)
+                cls._instances[path] = instance
+            return instance
+
+    def refresh(self, force: bool = False) -> bool:
+        """
+        检查文件是否变化，变化了则重新读取。\n
+        force: 忽略检查间隔立即检查\n
+        有未保存的修改时不会重新读取。返回是否重新读取了
+        """
+        with self._lock:
+            if self._dirty:
+                return False
+            now = monotonic()
+            if not force and now - self._lastCheck < self.checkInterval:
+                return False
+            self._lastCheck = now
+            try:
+                stat = os.stat(self.path)
+            except OSError:
+                changed = self.exists or self._stamp is not None
+                self._clear()
+                return changed
+            stamp = (stat.st_mtime_ns, stat.st_size)
+            if stamp == self._stamp:
+                return False
+            self._load(stamp)
+            return True
+
+    def _clear(self):
+        self._lines = []
+        self._index = {}
+        self._values = {}
+        self._stamp = None
+        self.exists = False
+
+    def _load(self, stamp: Tuple[int, int]):
+        try:
+            with open(self.path, "r", encoding="utf-8", errors="surrogateescape") as f:
+                lines = f.read().splitlines()
+        except OSError:
+            self._clear()
+            return
+        self._lines = lines
+        self._index = {}
+        self._values = {}
+        for lineNo, line in enumerate(lines):
+            parsed = self._parseLine(line)
+            if parsed is not None:
+                key, value = parsed
+                self._index[key] = lineNo
+                self._values[key] = value
+        self._stamp = stamp
+        self.exists = True
+
+    @staticmethod
+    def _parseLine(line: str) -> Optional[Tuple[str, str]]:
+        # 只去掉行首的空白，值末尾的空白按Java properties的规则是值的一部分
+        stripped = line.lstrip()
+        if not stripped or stripped[0] in "#!":
+            return None
+        match = re.match(r"((?:\\.|[^=:\s\\])*)\s*[=:]?\s*(.*)$", stripped)
+        key, value = match.group(1), match.group(2)
+        return _unescape(key), _unescape(value)
+
+    def get(self, key: str, default: Optional[str] = None) -> Optional[str]:
+        self.refresh()
+        return self._values.get(key, default)
+
+    def __getitem__(self, key: str) -> str:
+        self.refresh()
+        return self._values[key]
+
+    def __contains__(self, key: str) -> bool:
+        self.refresh()
+        return key in self._values
+
+    def __iter__(self) -> Iterator[str]:
+        self.refresh()
+        return iter(list(self._values))
+
+    def asDict(self) -> Dict[str, str]:
+        self.refresh()
+        return dict(self._values)
+
+    def set(self, key: str, value: str):
+        """修改一个键，需要调用save()才会写入文件"""
+        with self._lock:
+            self.refresh(force=True)
+            line = f"{_escape(key, isKey=True)}={_escape(str(value))}"
+            if key in self._index:
+                self._lines[self._index[key]] = line
+            else:
+                self._index[key] = len(self._lines)
+                self._lines.append(line)
+            self._values[key] = str(value)
+            self._dirty = True
+
+    def remove(self, key: str):
+        """删除一个键，需要调用save()才会写入文件"""
+        with self._lock:
+            self.refresh(force=True)
+            if key not in self._index:
+                return
+            lineNo = self._index.pop(key)
+            self._lines.pop(lineNo)
+            self._values.pop(key)
+            self._index = {k: i if i < lineNo else i - 1 for k, i in self._index.items()}
+            self._dirty = True
+
+    def save(self):
+        """写入文件，注释和原有顺序保持不变"""
+        with self._lock:
+            # 读取时无法解码的字节按surrogateescape保留，写回时原样还原
+            writeFileAtomic(self.path, "\n".join(self._lines) + "\n", errors="surrogateescape")
+            stat = os.stat(self.path)
+            self._stamp = (stat.st_mtime_ns, stat.st_size)
+            self._lastCheck = monotonic()
+            self._dirty = False
+            self.exists = True
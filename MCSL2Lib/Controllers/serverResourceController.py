@@ -0,0 +1,272 @@
+#     Copyright 2023, MCSL Team, mailto:lxhtt@vip.qq.com
+#
+#     Part of "MCSL2", a simple and multifunctional Minecraft server launcher.
+#
+#     Licensed under the GNU General Public License, Version 3.0, with our
+#     additional agreements. (the "License");
+#     you may not use this file except in compliance with the License.
+#     You may obtain a copy of the License at
+#
+#        https://github.com/MCSLTeam/MCSL2/raw/master/LICENSE
+#
+################################################################################
+"""
+Server resource sampler, samples CPU and memory of a server process in a worker thread.
+"""
+
+import csv
+from array import array
+from datetime import datetime
+from math import isnan
+from threading import Lock
+from time import monotonic, time
+from typing import Dict, List, Optional, Tuple
+
+from PyQt5.QtCore import QThread, pyqtSignal, pyqtSlot
+from psutil import AccessDenied, NoSuchProcess, Process, cpu_count
+
+from MCSL2Lib.Controllers.jvmPerfDataController import HotSpotPerfData, JvmStats
+from MCSL2Lib.Controllers.settingsController import cfg
+from MCSL2Lib.Controllers.threadCpuController import ThreadCpuSampler
+
+
+class ResourceHistory:
+    """
+    定长的数值环形缓冲区，每列是一个array("d")，写满后覆盖最旧的采样。\n
+    采样线程写入，界面线程读取，读写都加锁。
+    """
+
+    def __init__(self, columns: Tuple[str, ...], capacity: int):
+        self.columns = columns
+        self.capacity = capacity
+        self._lock = Lock()
+        self._data: Dict[str, array] = {c: array("d", [0.0]) * capacity for c in columns}
+        self._next = 0
+        self._count = 0
+
+    def __len__(self) -> int:
+        return self._count
+
+    def append(self, **values: float):
+        """追加一次采样，没有给出的列记为NaN"""
+        with self._lock:
+            for column, data in self._data.items():
+                data[self._next] = values.get(column, float("nan"))
+            self._next = (self._next + 1) % self.capacity
+            self._count = min(self._count + 1, self.capacity)
+
+    def column(self, name: str, last: Optional[int] = None) -> List[float]:
+        """按时间顺序取出一列，last为只取最近的多少个采样"""
+        with self._lock:
+            count = self._count if last is None else min(last, self._count)
+            data = self._data[name]
+            start = (self._next - count) % self.capacity
+            if start + count <= self.capacity:
+                return data[start : start + count].tolist()
+            return data[start:].tolist() + data[: self._next].tolist()
+
+    def latest(self, name: str) -> float:
+        with self._lock:
+            if not self._count:
+                return float("nan")
+            return self._data[name][(self._next - 1) % self.capacity]
+
+    def clear(self):
+        with self._lock:
+            self._next = 0
+            self._count = 0
+
+    def exportCSV(self, path: str):
+        """导出为CSV，第一列为本地时间"""
+        columns = {name: self.column(name) for name in self.columns}
+        with open(path, "w", encoding="utf-8", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(self.columns)
+            for row in zip(*columns.values()):
+                writer.writerow(
+                    [datetime.fromtimestamp(row[0]).strftime("%Y-%m-%d %H:%M:%S")]
+                    + ["" if isnan(value) else round(value, 4) for value in row[1:]]
+                )
+
+
+class ServerResourceSampler(QThread):
+    """
+    服务器资源采样线程，每个服务器实例一个。\n
+    复用同一个psutil.Process对象，CPU占用取两次采样之间的差值，不会阻塞；
+    内存可选开销小的RSS，或需要解析smaps、更准确的USS。\n
+    同时读取JVM的hsperfdata计数器，得到堆的已用/已提交大小和GC耗时占比，
+    用来区分是堆在增长还是堆外内存在增长。\n
+    另外按Java线程名分组统计CPU，单独给出主线程(tick线程)的占用。
+    """
+
+    # 内存占用，单位为服务器设置的内存单位
+    memPercent = pyqtSignal(float)
+    # CPU占用，相对于整台机器的百分比
+    cpuPercent = pyqtSignal(float)
+    # JVM堆已用、已提交，单位同内存；JVM关闭了性能计数器(-XX:-UsePerfData)时不会发出
+    heapUsage = pyqtSignal(float, float)
+    # 上一个采样间隔内GC耗时占墙钟时间的百分比
+    gcPercent = pyqtSignal(float)
+    # 主线程占用，以单核为100%
+    mainThreadPercent = pyqtSignal(float)
+    # {线程分组: 占用}，以单核为100%
+    threadGroupPercent = pyqtSignal(dict)
+    # 每次采样完成后发出，供图表刷新
+    sampled = pyqtSignal()
+
+    interval: float = 1.0
+    # 保留4小时的采样
+    historyCapacity: int = 4 * 3600
+    historyColumns: Tuple[str, ...] = (
+        "time",
+        "cpu",
+        "mainThread",
+        "mem",
+        "heapUsed",
+        "heapCommitted",
+        "gc",
+    )
+    # 找不到hsperfdata文件时(JVM刚启动还没创建)，隔多久再找一次
+    perfDataRetryInterval: float = 5.0
+
+    def __init__(self, handler, parent=None):
+        super().__init__(parent)
+        self.setObjectName("MinecraftServerResMonitorThread")
+        self.handler = handler
+        self.history = ResourceHistory(self.historyColumns, self.historyCapacity)
+        self._running = False
+        self._pid = 0
+        self._process: Optional[Process] = None
+        self._cpuCount = cpu_count() or 1
+        self._divisionNum = 1048576
+        self._memMode = "rss"
+        self._perfData: Optional[HotSpotPerfData] = None
+        self._perfDataPid = 0
+        self._perfDataRetryAt = 0.0
+        self._lastJvmStats: Optional[JvmStats] = None
+        self._lastJvmSampleTime = 0.0
+        self.threadSampler = ThreadCpuSampler()
+        # 本次运行的RSS峰值(字节)和采样次数，与显示的内存模式无关，供内存估算使用
+        self.peakRss = 0
+        self.rssSamples = 0
+
+    def start(self, clearHistory: bool = False):
+        """开始采样，进程(重新)启动后调用；clearHistory为True时清空之前的记录"""
+        # 只在界面线程读取QProcess和设置，采样线程只使用这里记下的值
+        self._pid = self.handler.processId()
+        self._divisionNum = {"G": 1073741824, "M": 1048576}.get(
+            self.handler.serverVariables.memUnit, 1048576
+        )
+        self._memMode = cfg.get(cfg.resourceMonitorMemMode)
+        if self.isRunning() and not self._running:
+            # 上一轮采样还没退出，等它结束再重新开始
+            self.wait()
+        if clearHistory:
+            self.history.clear()
+        self.peakRss = 0
+        self.rssSamples = 0
+        self._running = True
+        if not self.isRunning():
+            super().start()
+
+    def stop(self):
+        self._running = False
+
+    def run(self):
+        while self._running:
+            started = monotonic()
+            self.sample()
+            # 分段睡眠，停止时能及时退出
+            while self._running and monotonic() - started < self.interval:
+                self.msleep(50)
+        self._process = None
+        self._closePerfData()
+        self.threadSampler.reset()
+
+    def _closePerfData(self):
+        if self._perfData is not None:
+            self._perfData.close()
+        self._perfData = None
+        self._perfDataPid = 0
+        self._lastJvmStats = None
+
+    def sampleJvm(self, pid: int) -> Tuple[float, float, float]:
+        """读取JVM堆和GC统计，返回(堆已用, 堆已提交, GC耗时百分比)，不可用的项为NaN"""
+        nan = float("nan")
+        if self._perfDataPid != pid:
+            self._closePerfData()
+            self._perfDataPid = pid
+            self._perfDataRetryAt = 0.0
+        if self._perfData is None:
+            now = monotonic()
+            if now < self._perfDataRetryAt:
+                return nan, nan, nan
+            self._perfData = HotSpotPerfData.forPid(pid)
+            if self._perfData is None:
+                self._perfDataRetryAt = now + self.perfDataRetryInterval
+                return nan, nan, nan
+        stats = self._perfData.sample()
+        if stats is None:
+            return nan, nan, nan
+        now = monotonic()
+        gc = nan
+        last = self._lastJvmStats
+        if last is not None and now > self._lastJvmSampleTime:
+            gc = max(stats.gcTime - last.gcTime, 0.0) / (now - self._lastJvmSampleTime) * 100
+        self._lastJvmStats = stats
+        self._lastJvmSampleTime = now
+        return stats.heapUsed / self._divisionNum, stats.heapCommitted / self._divisionNum, gc
+
+    def sample(self):
+        pid = self._pid
+        if not pid:
+            return
+        try:
+            if self._process is None or self._process.pid != pid:
+                self._process = Process(pid)
+                # 第一次调用只记录基准，返回0
+                self._process.cpu_percent(None)
+            with self._process.oneshot():
+                cpu = self._process.cpu_percent(None) / self._cpuCount
+                if self._memMode == "uss":
+                    memory = self._process.memory_full_info()
+                    mem, rss = memory.uss, memory.rss
+                else:
+                    mem = rss = self._process.memory_info().rss
+        except (NoSuchProcess, AccessDenied, PermissionError):
+            self._process = None
+            return
+        self.peakRss = max(self.peakRss, rss)
+        self.rssSamples += 1
+        heapUsed, heapCommitted, gc = self.sampleJvm(pid)
+        threads = self.threadSampler.sample(pid)
+        mainThread = threads[0] if threads is not None else float("nan")
+        self.history.append(
+            time=time(),
+            cpu=cpu,
+            mainThread=mainThread,
+            mem=mem / self._divisionNum,
+            heapUsed=heapUsed,
+            heapCommitted=heapCommitted,
+            gc=gc,
+        )
+        self.memPercent.emit(round(mem / self._divisionNum, 4))
+        self.cpuPercent.emit(round(cpu, 4))
+        if not isnan(heapCommitted):
+            self.heapUsage.emit(round(heapUsed, 4), round(heapCommitted, 4))
+        if not isnan(gc):
+            self.gcPercent.emit(round(gc, 4))
+        if threads is not None:
+            self.mainThreadPercent.emit(round(mainThread, 4))
+            self.threadGroupPercent.emit(threads[1])
+        self.sampled.emit()
+
+    @pyqtSlot(int)
+    def onServerClosedHandler(self, _):
+        self.stop()
+        self.cpuPercent.emit(0.0)
+        self.memPercent.emit(0.0)
+        self.heapUsage.emit(0.0, 0.0)
+        self.gcPercent.emit(0.0)
+        self.mainThreadPercent.emit(0.0)
+        self.threadGroupPercent.emit({})
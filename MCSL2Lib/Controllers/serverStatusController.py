@@ -0,0 +1,269 @@
+#     Copyright 2023, MCSL Team, mailto:lxhtt@vip.qq.com
+#
+#     Part of "MCSL2", a simple and multifunctional Minecraft server launcher.
+#
+#     Licensed under the GNU General Public License, Version 3.0, with our
+#     additional agreements. (the "License");
+#     you may not use this file except in compliance with the License.
+#     You may obtain a copy of the License at
+#
+#        https://github.com/MCSLTeam/MCSL2/raw/master/LICENSE
+#
+################################################################################
+"""
+Server List Ping status poller for all managed servers, on one asyncio loop.
+"""
+
+import asyncio
+import json
+import struct
+from time import perf_counter
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from PyQt5.QtCore import QObject, QThread, QTimer, pyqtSignal
+
+from MCSL2Lib.Controllers.serverErrorHandler import FORMATTING_PATTERN
+from MCSL2Lib.Controllers.settingsController import cfg
+from MCSL2Lib.singleton import Singleton
+from MCSL2Lib.utils import MCSL2Logger
+
+# 握手时的协议版本，-1表示只查询状态，服务器按自己的版本回应
+STATUS_PROTOCOL_VERSION = -1
+# 状态JSON的长度上限，防止异常的服务器让客户端读取过多数据
+MAX_STATUS_LENGTH = 1 << 20
+
+
+class ServerStatus(NamedTuple):
+    """一次Server List Ping的结果，online为False时只有error有意义"""
+
+    online: bool
+    # 往返延迟(毫秒)
+    latency: float = 0.0
+    playersOnline: int = 0
+    playersMax: int = 0
+    # 服务器给出的部分玩家名(原版最多12个)
+    sample: Tuple[str, ...] = ()
+    motd: str = ""
+    version: str = ""
+    error: str = ""
+
+    def hasFullSample(self) -> bool:
+        """玩家样本是否就是完整的在线玩家列表"""
+        return self.online and len(self.sample) == self.playersOnline
+
+
+def encodeVarInt(value: int) -> bytes:
+    value &= 0xFFFFFFFF
+    out = bytearray()
+    while True:
+        byte = value & 0x7F
+        value >>= 7
+        if value:
+            out.append(byte | 0x80)
+        else:
+            out.append(byte)
+            return bytes(out)
+
+
+async def readVarInt(reader: asyncio.StreamReader) -> int:
+    result = 0
+    for shift in range(0, 35, 7):
+        byte = (await reader.readexactly(1))[0]
+        result |= (byte & 0x7F) << shift
+        if not byte & 0x80:
+            return result - (1 << 32) if result & 0x80000000 else result
+    raise ValueError("VarInt过长")
+
+
+def encodeString(text: str) -> bytes:
+    data = text.encode("utf-8")
+    return encodeVarInt(len(data)) + data
+
+
+def packet(packetId: int, payload: bytes = b"") -> bytes:
+    body = encodeVarInt(packetId) + payload
+    return encodeVarInt(len(body)) + body
+
+
+def flattenChat(component) -> str:
+    """把MOTD的聊天组件(字符串、字典或列表)拼成纯文本，去掉格式代码"""
+    if isinstance(component, str):
+        return FORMATTING_PATTERN.sub("", component)
+    if isinstance(component, list):
+        return "".join(flattenChat(c) for c in component)
+    if isinstance(component, dict):
+        return flattenChat(component.get("text", "")) + flattenChat(component.get("extra", []))
+    return ""
+
+
+def parseStatus(data, latency: float) -> ServerStatus:
+    """解析状态JSON，格式不正确时抛出ValueError或TypeError"""
+    if not isinstance(data, dict):
+        raise ValueError("状态不是JSON对象")
+    players = data.get("players", {}) or {}
+    version = data.get("version", {}) or {}
+    if not isinstance(players, dict) or not isinstance(version, dict):
+        raise ValueError("状态格式异常")
+    sample = players.get("sample", None) or []
+    if not isinstance(sample, list):
+        raise ValueError("玩家样本格式异常")
+    return ServerStatus(
+        online=True,
+        latency=latency,
+        playersOnline=int(players.get("online", 0)),
+        playersMax=int(players.get("max", 0)),
+        sample=tuple(
+            FORMATTING_PATTERN.sub("", p["name"])
+            for p in sample
+            if isinstance(p, dict) and isinstance(p.get("name", None), str) and p["name"]
+        ),
+        motd=flattenChat(data.get("description", "")).strip(),
+        version=str(version.get("name", "")),
+    )
+
+
+async def ping(host: str, port: int, timeout: float) -> ServerStatus:
+    """对一个服务器做一次Server List Ping，整个过程(含连接)不超过timeout秒"""
+
+    async def exchange() -> ServerStatus:
+        reader, writer = await asyncio.open_connection(host, port)
+        try:
+            handshake = (
+                encodeVarInt(STATUS_PROTOCOL_VERSION)
+                + encodeString(host)
+                + struct.pack(">H", port)
+                + encodeVarInt(1)
+            )
+            writer.write(packet(0x00, handshake) + packet(0x00))
+            await writer.drain()
+            await readVarInt(reader)
+            if await readVarInt(reader) != 0x00:
+                raise ValueError("不是状态响应")
+            length = await readVarInt(reader)
+            if not 0 <= length <= MAX_STATUS_LENGTH:
+                raise ValueError(f"状态长度异常：{length}")
+            data = json.loads((await reader.readexactly(length)).decode("utf-8"))
+
+            start = perf_counter()
+            writer.write(packet(0x01, struct.pack(">q", 0)))
+            await writer.drain()
+            await readVarInt(reader)
+            await readVarInt(reader)
+            await reader.readexactly(8)
+            return parseStatus(data, (perf_counter() - start) * 1000)
+        finally:
+            writer.close()
+
+    try:
+        return await asyncio.wait_for(exchange(), timeout)
+    except asyncio.TimeoutError:
+        return ServerStatus(online=False, error="超时")
+    except (OSError, ValueError, TypeError, asyncio.IncompleteReadError) as e:
+        return ServerStatus(online=False, error=str(e) or type(e).__name__)
+
+
+class AsyncLoopThread(QThread):
+    """在后台线程中运行一个asyncio事件循环"""
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.loop = asyncio.new_event_loop()
+
+    def run(self):
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+
+    def submit(self, coroutine) -> "asyncio.Future":
+        return asyncio.run_coroutine_threadsafe(coroutine, self.loop)
+
+    def shutdown(self):
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.wait(2000)
+
+
+@Singleton
+class ServerStatusPoller(QObject):
+    """
+    所有服务器共用的状态轮询器。\n
+    每隔serverStatusPollInterval秒，对所有运行中的服务器并发做一次Server List Ping，
+    全部在同一个后台asyncio事件循环里完成，每个服务器每轮只占一个连接，且有超时；
+    上一轮还没结束时跳过本轮。结果通过handler.onStatusPolled交回界面线程。
+    """
+
+    # (服务器名称, ServerStatus)，在事件循环线程中发出，排队交给界面线程
+    statusUpdated = pyqtSignal(str, object)
+
+    timeout: float = 3.0
+
+    def __init__(self):
+        super().__init__()
+        self._handlers: Dict[str, QObject] = {}
+        self._loopThread: Optional[AsyncLoopThread] = None
+        self._round = None
+        self._timer = QTimer(self)
+        self._timer.timeout.connect(self.pollAll)
+        self.statusUpdated.connect(self._dispatch)
+        cfg.serverStatusPollInterval.valueChanged.connect(self._applyInterval)
+
+    def attach(self, handler):
+        self._handlers[handler.serverName] = handler
+        if not self._timer.isActive():
+            self._applyInterval()
+
+    def detach(self, serverName: str):
+        self._handlers.pop(serverName, None)
+        if not self._handlers:
+            self._timer.stop()
+
+    def _applyInterval(self, *_):
+        self._timer.start(cfg.get(cfg.serverStatusPollInterval) * 1000)
+
+    def targets(self) -> List[Tuple[str, str, int]]:
+        """运行中的服务器的(名称, 地址, 端口)"""
+        targets = []
+        for name, handler in self._handlers.items():
+            if not handler.isServerRunning():
+                continue
+            properties = handler.serverVariables.serverProperties
+            properties.refresh()
+            try:
+                port = int(properties.get("server-port", "25565"))
+            except ValueError:
+                continue
+            targets.append((name, properties.get("server-ip", "") or "127.0.0.1", port))
+        return targets
+
+    def pollAll(self):
+        if self._round is not None and not self._round.done():
+            return
+        targets = self.targets()
+        if not targets:
+            return
+        if self._loopThread is None:
+            self._loopThread = AsyncLoopThread()
+            self._loopThread.start()
+        self._round = self._loopThread.submit(self._pollRound(targets))
+
+    async def _pollRound(self, targets: List[Tuple[str, str, int]]):
+        results = await asyncio.gather(
+            *(ping(host, port, self.timeout) for _, host, port in targets),
+            return_exceptions=True,
+        )
+        for (name, _, _), status in zip(targets, results):
+            # 一个服务器出现意外的异常时只把它视为离线，不影响其他服务器
+            if isinstance(status, Exception):
+                MCSL2Logger.warning(f"服务器 {name} 的状态轮询出错：{status!r}")
+                status = ServerStatus(online=False, error=str(status) or type(status).__name__)
+            self.statusUpdated.emit(name, status)
+
+    def _dispatch(self, serverName: str, status: ServerStatus):
+        handler = self._handlers.get(serverName, None)
+        if handler is not None and handler.isServerRunning():
+            handler.onStatusPolled(status)
+
+    def shutdown(self):
+        self._timer.stop()
+        if self._loopThread is not None:
+            self._loopThread.shutdown()
+            self._loopThread = None
+            MCSL2Logger.info("服务器状态轮询已停止")
@@ -0,0 +1,129 @@
+#     Copyright 2023, MCSL Team, mailto:lxhtt@vip.qq.com
+#
+#     Part of "MCSL2", a simple and multifunctional Minecraft server launcher.
+#
+#     Licensed under the GNU General Public License, Version 3.0, with our
+#     additional agreements. (the "License");
+#     you may not use this file except in compliance with the License.
+#     You may obtain a copy of the License at
+#
+#        https://github.com/MCSLTeam/MCSL2/raw/master/LICENSE
+#
+################################################################################
+"""
+Graceful server stop pipeline: stop command, save detection, terminate, kill.
+"""
+
+from enum import IntEnum
+from typing import List
+
+from PyQt5.QtCore import QObject, QTimer, pyqtSignal, pyqtSlot
+
+from MCSL2Lib.Controllers.settingsController import cfg
+from MCSL2Lib.utils import MCSL2Logger
+
+# 服务器保存完存档时输出的日志，原版、Spigot系和Forge/Fabric都至少会输出其中之一
+SAVED_KEYWORDS = ("All dimensions are saved", "Saved the game")
+
+
+class StopStage(IntEnum):
+    IDLE = 0
+    # 已发送stop，等待服务器保存存档
+    STOPPING = 1
+    # 存档已保存，等待进程退出
+    SAVED = 2
+    # 超时，已请求终止进程
+    TERMINATING = 3
+    # 已强制结束进程
+    KILLING = 4
+
+
+class ServerStopper(QObject):
+    """
+    服务器关闭流程，每个服务器实例一个。\n
+    发送stop后监听日志中的保存完成提示，进程在超时时间内没有退出则先terminate，
+    再等待terminateGrace秒后kill。全程只用QTimer和信号，不会阻塞界面线程，
+    多个服务器可以同时关闭。
+    """
+
+    # (阶段, 提示)
+    stopProgress = pyqtSignal(int, str)
+    # 进程已退出，参数为是否是正常关闭(没有被terminate或kill)
+    stopFinished = pyqtSignal(bool)
+
+    terminateGrace: float = 10.0
+
+    def __init__(self, handler, parent=None):
+        super().__init__(parent)
+        self.handler = handler
+        self.stage = StopStage.IDLE
+        self.restartAfterStop = False
+        self._timer = QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.timeout.connect(self._escalate)
+
+    def isStopping(self) -> bool:
+        return self.stage != StopStage.IDLE
+
+    def _setStage(self, stage: StopStage, message: str):
+        self.stage = stage
+        MCSL2Logger.info(f"服务器 {self.handler.serverName} 关闭流程：{message}")
+        self.stopProgress.emit(int(stage), message)
+
+    def stop(self, restart: bool = False):
+        """发送stop并开始计时，restart为True时进程退出后按原参数重新启动"""
+        self.restartAfterStop = restart
+        if not self.handler.isServerRunning():
+            self._finish(True)
+            return
+        if self.isStopping():
+            return
+        self.handler.Server.serverProcess.write(b"stop\n")
+        self._setStage(StopStage.STOPPING, self.tr("已发送stop，正在等待服务器保存存档..."))
+        self._timer.start(cfg.get(cfg.stopTimeoutSeconds) * 1000)
+
+    def kill(self):
+        """立即强制结束进程，不等待"""
+        if not self.handler.isServerRunning():
+            return
+        self._timer.stop()
+        self._setStage(StopStage.KILLING, self.tr("正在强制结束服务器进程..."))
+        self.handler.Server.serverProcess.kill()
+
+    @pyqtSlot(list)
+    def onServerLogOutput(self, lines: List[str]):
+        if self.stage != StopStage.STOPPING:
+            return
+        for line in lines:
+            if any(keyword in line for keyword in SAVED_KEYWORDS):
+                self._setStage(StopStage.SAVED, self.tr("存档已保存，正在等待服务器退出..."))
+                # 存档已经保存，之后的等待不需要太久
+                self._timer.start(int(self.terminateGrace * 1000))
+                return
+
+    def _escalate(self):
+        if not self.handler.isServerRunning():
+            return
+        if self.stage in (StopStage.STOPPING, StopStage.SAVED):
+            self._setStage(
+                StopStage.TERMINATING, self.tr("服务器未在规定时间内关闭，正在请求终止进程...")
+            )
+            self.handler.Server.serverProcess.terminate()
+            self._timer.start(int(self.terminateGrace * 1000))
+        elif self.stage == StopStage.TERMINATING:
+            self.kill()
+
+    def onProcessFinished(self):
+        """进程退出后调用(在其他退出处理之后)"""
+        if not self.isStopping():
+            return
+        self._finish(self.stage in (StopStage.STOPPING, StopStage.SAVED))
+
+    def _finish(self, graceful: bool):
+        self._timer.stop()
+        self.stage = StopStage.IDLE
+        self.stopFinished.emit(graceful)
+        if self.restartAfterStop:
+            self.restartAfterStop = False
+            self.handler.relaunchServer()
+            self.handler.serverRestarted.emit()
@@ -0,0 +1,150 @@
+#     Copyright 2023, MCSL Team, mailto:lxhtt@vip.qq.com
+#
+#     Part of "MCSL2", a simple and multifunctional Minecraft server launcher.
+#
+#     Licensed under the GNU General Public License, Version 3.0, with our
+#     additional agreements. (the "License");
+#     you may not use this file except in compliance with the License.
+#     You may obtain a copy of the License at
+#
+#        https://github.com/MCSLTeam/MCSL2/raw/master/LICENSE
+#
+################################################################################
+"""
+Crash supervisor, restarts crashed servers with backoff and stops crash loops.
+"""
+
+from collections import deque
+from datetime import datetime
+from enum import IntEnum
+from time import monotonic
+from typing import Deque, List, NamedTuple
+
+from PyQt5.QtCore import QObject, QTimer, pyqtSignal
+
+from MCSL2Lib.Controllers.settingsController import cfg
+from MCSL2Lib.utils import MCSL2Logger
+
+
+class SupervisorState(IntEnum):
+    STOPPED = 0
+    RUNNING = 1
+    # 已崩溃，等待退避时间后重启
+    BACKOFF = 2
+    # 短时间内崩溃次数过多，不再自动重启
+    CRASH_LOOP = 3
+
+
+class CrashRecord(NamedTuple):
+    """一次崩溃的记录"""
+
+    time: datetime
+    exitCode: int
+    # 本次运行了多少秒
+    uptime: float
+    # 崩溃后是否安排了自动重启
+    restarted: bool
+
+
+class ServerSupervisor(QObject):
+    """
+    服务器崩溃监管，每个服务器实例一个。\n
+    崩溃后按指数退避(5秒、10秒、20秒……最多5分钟)安排重启，全程只用QTimer，不阻塞界面线程；
+    设定时间窗口内崩溃次数达到上限时判定为崩溃循环，停止自动重启并提示用户。\n
+    用户主动关闭、强制结束的退出不算崩溃。
+    """
+
+    stateChanged = pyqtSignal(int)
+    # 已安排重启，参数为多少秒后重启
+    restartScheduled = pyqtSignal(float)
+    # 判定为崩溃循环，参数为时间窗口内的崩溃次数
+    crashLoopDetected = pyqtSignal(int)
+
+    backoffBase: float = 5.0
+    backoffMax: float = 300.0
+    historySize: int = 50
+
+    def __init__(self, handler, parent=None):
+        super().__init__(parent)
+        self.handler = handler
+        self.state = SupervisorState.STOPPED
+        self.crashHistory: Deque[CrashRecord] = deque(maxlen=self.historySize)
+        self._startedAt = 0.0
+        # 时间窗口内的崩溃时刻(monotonic)
+        self._recentCrashes: Deque[float] = deque()
+        self._exitRequested = False
+        self._restartTimer = QTimer(self)
+        self._restartTimer.setSingleShot(True)
+        self._restartTimer.timeout.connect(self._restart)
+
+    def _setState(self, state: SupervisorState):
+        if state != self.state:
+            self.state = state
+            self.stateChanged.emit(int(state))
+
+    def crashes(self) -> List[CrashRecord]:
+        return list(self.crashHistory)
+
+    def onManualStart(self):
+        """用户手动启动服务器，取消待执行的重启并清除崩溃循环状态"""
+        self._restartTimer.stop()
+        self._recentCrashes.clear()
+        self._exitRequested = False
+
+    def onProcessStarted(self):
+        self._startedAt = monotonic()
+        self._exitRequested = False
+        self._setState(SupervisorState.RUNNING)
+
+    def expectExit(self):
+        """用户要关闭服务器，之后的退出不算崩溃；同时取消待执行的重启"""
+        self._exitRequested = True
+        if self._restartTimer.isActive():
+            self._restartTimer.stop()
+            self._setState(SupervisorState.STOPPED)
+
+    def isRestartPending(self) -> bool:
+        return self._restartTimer.isActive()
+
+    def onProcessExited(self, exitCode: int, crashed: bool) -> bool:
+        """
+        进程退出后调用，crashed为服务器是否非正常退出。\n
+        返回是否安排了自动重启。
+        """
+        if self._exitRequested or not crashed:
+            self._exitRequested = False
+            self._setState(SupervisorState.STOPPED)
+            return False
+        now = monotonic()
+        uptime = now - self._startedAt if self._startedAt else 0.0
+        window = cfg.get(cfg.crashLoopWindowMinutes) * 60
+        while self._recentCrashes and now - self._recentCrashes[0] > window:
+            self._recentCrashes.popleft()
+        self._recentCrashes.append(now)
+        count = len(self._recentCrashes)
+
+        restart = cfg.get(cfg.restartServerWhenCrashed) and count < cfg.get(
+            cfg.crashLoopMaxCrashes
+        )
+        self.crashHistory.append(CrashRecord(datetime.now(), exitCode, uptime, restart))
+        MCSL2Logger.warning(
+            f"服务器 {self.handler.serverName} 崩溃，退出码 {exitCode}，运行了 {uptime:.0f} 秒，"
+            f"{window // 60:.0f} 分钟内第 {count} 次"
+        )
+        if not cfg.get(cfg.restartServerWhenCrashed):
+            self._setState(SupervisorState.STOPPED)
+            return False
+        if not restart:
+            self._setState(SupervisorState.CRASH_LOOP)
+            self.crashLoopDetected.emit(count)
+            return False
+        delay = min(self.backoffBase * 2 ** (count - 1), self.backoffMax)
+        self._setState(SupervisorState.BACKOFF)
+        self._restartTimer.start(int(delay * 1000))
+        self.restartScheduled.emit(delay)
+        return True
+
+    def _restart(self):
+        if self.handler.isServerRunning():
+            return
+        self.handler.relaunchServer()
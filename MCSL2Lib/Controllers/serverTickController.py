@@ -0,0 +1,212 @@
+#     Copyright 2023, MCSL Team, mailto:lxhtt@vip.qq.com
+#
+#     Part of "MCSL2", a simple and multifunctional Minecraft server launcher.
+#
+#     Licensed under the GNU General Public License, Version 3.0, with our
+#     additional agreements. (the "License");
+#     you may not use this file except in compliance with the License.
+#     You may obtain a copy of the License at
+#
+#        https://github.com/MCSLTeam/MCSL2/raw/master/LICENSE
+#
+################################################################################
+"""
+Game loop metrics (TPS, MSPT, lag spikes, startup time) parsed from server output.
+"""
+
+import re
+from math import isnan, nan
+from time import time
+from typing import List, Optional, Set
+
+from PyQt5.QtCore import QObject, QTimer, pyqtSignal, pyqtSlot
+
+from MCSL2Lib.Controllers.serverErrorHandler import FORMATTING_PATTERN
+from MCSL2Lib.Controllers.serverResourceController import ResourceHistory
+
+TARGET_TPS = 20.0
+_NUMBER = r"(\d+(?:[.,]\d+)?)"
+
+# [Server thread/WARN]: Can't keep up! Is the server overloaded? Running 5123ms or 102 ticks behind
+CANT_KEEP_UP_PATTERN = re.compile(r"Can't keep up!.*?Running (\d+)ms or (\d+) ticks? behind")
+# Done (12.345s)! For help, type "help"
+DONE_PATTERN = re.compile(r"Done \(" + _NUMBER + r"s\)!")
+# Spigot/Paper tps：TPS from last 1m, 5m, 15m: *20.0, 19.97, 19.99
+SPIGOT_TPS_PATTERN = re.compile(r"TPS from last 1m, 5m, 15m: \*?" + _NUMBER)
+# Paper mspt，数值在下一行：◴ 1.2/0.8/3.4, 1.1/0.7/5.0, 1.3/0.6/10.2
+PAPER_MSPT_HEADER = "Server tick times (avg/min/max)"
+PAPER_MSPT_PATTERN = re.compile(_NUMBER + "/" + _NUMBER + "/" + _NUMBER)
+# Forge 1.19+：Overall: 20.000 TPS (1.234 ms/tick)
+FORGE_TPS_PATTERN = re.compile(r"Overall\s*:\s*" + _NUMBER + r" TPS \(" + _NUMBER + r" ms/tick\)")
+# 旧版Forge：Overall : Mean tick time: 1.234 ms. Mean TPS: 20.000
+FORGE_LEGACY_TPS_PATTERN = re.compile(
+    r"Overall\s*:\s*Mean tick time: " + _NUMBER + r" ms\. Mean TPS: " + _NUMBER
+)
+# 原版1.20.3+ tick query：Average time per tick: 1.2ms (Target: 50.0ms)
+VANILLA_MSPT_PATTERN = re.compile(r"Average time per tick: " + _NUMBER + r"\s*ms")
+
+# 经RCON轮询时依次尝试的指令，第一次轮询后只保留服务器认识的
+TICK_COMMANDS = ("tps", "mspt", "forge tps", "tick query")
+
+
+def _float(text: str) -> float:
+    return float(text.replace(",", "."))
+
+
+class TickMetrics(QObject):
+    """
+    服务器游戏循环指标，每个服务器实例一个。\n
+    从日志中解析"Can't keep up!"卡顿警告、tps/mspt/forge tps/tick query的输出和启动用时，
+    记入时间序列。服务器开启了RCON时定时经RCON静默执行这些指令，不会刷屏；
+    否则只解析用户或计划任务执行的指令输出。
+    """
+
+    # (TPS, MSPT)，还不知道的一项为NaN
+    tickUpdated = pyqtSignal(float, float)
+    # (落后的毫秒数, 跳过的tick数)
+    lagSpike = pyqtSignal(int, int)
+    # 启动用时(秒)
+    startupFinished = pyqtSignal(float)
+
+    historyCapacity: int = 4096
+    historyColumns = ("time", "tps", "mspt", "lagMs")
+    pollInterval: int = 15000
+
+    def __init__(self, handler, parent=None):
+        super().__init__(parent)
+        self.handler = handler
+        self.history = ResourceHistory(self.historyColumns, self.historyCapacity)
+        self.tps = nan
+        self.mspt = nan
+        self.lagSpikes = 0
+        self.lagMsTotal = 0
+        # 最近一次卡顿的(落后的毫秒数, 跳过的tick数)
+        self.lastLag = (0, 0)
+        self.startupSeconds = nan
+        # Paper的mspt输出分两行，收到表头后等待下一行
+        self._expectMsptLine = False
+        # None表示还没探测过服务器支持哪些指令
+        self._commands: Optional[Set[str]] = None
+        self._probeResults: Set[str] = set()
+        self._pollTimer = QTimer(self)
+        self._pollTimer.setInterval(self.pollInterval)
+        self._pollTimer.timeout.connect(self.poll)
+
+    def start(self, reset: bool = True):
+        if reset:
+            self.history.clear()
+            self.tps = self.mspt = self.startupSeconds = nan
+            self.lagSpikes = self.lagMsTotal = 0
+            self.lastLag = (0, 0)
+            self._commands = None
+        self._expectMsptLine = False
+        self._pollTimer.start()
+
+    def stop(self):
+        self._pollTimer.stop()
+
+    @pyqtSlot(list)
+    def onServerLogOutput(self, lines: List[str]):
+        for line in lines:
+            self.parseLine(line)
+
+    def parseText(self, text: str) -> bool:
+        """解析一段(可能多行的)指令输出，返回是否解析出了TPS或MSPT"""
+        parsed = False
+        for line in text.splitlines():
+            parsed = self.parseLine(line) or parsed
+        return parsed
+
+    def parseLine(self, line: str) -> bool:
+        """解析一行，返回是否解析出了TPS或MSPT"""
+        if self._expectMsptLine:
+            self._expectMsptLine = False
+            match = PAPER_MSPT_PATTERN.search(FORMATTING_PATTERN.sub("", line))
+            if match is not None:
+                return self._record(mspt=_float(match.group(1)))
+        # 先用便宜的子串判断过滤掉绝大多数日志行
+        if "Can't keep up!" in line:
+            match = CANT_KEEP_UP_PATTERN.search(line)
+            if match is not None:
+                self._recordLag(int(match.group(1)), int(match.group(2)))
+            return False
+        if "Done (" in line:
+            match = DONE_PATTERN.search(line)
+            if match is not None:
+                self.startupSeconds = _float(match.group(1))
+                self.startupFinished.emit(self.startupSeconds)
+            return False
+        if "TPS" not in line and "tick" not in line:
+            return False
+        line = FORMATTING_PATTERN.sub("", line)
+        if PAPER_MSPT_HEADER in line:
+            self._expectMsptLine = True
+            return False
+        match = SPIGOT_TPS_PATTERN.search(line)
+        if match is not None:
+            return self._record(tps=_float(match.group(1)))
+        match = FORGE_TPS_PATTERN.search(line)
+        if match is not None:
+            return self._record(tps=_float(match.group(1)), mspt=_float(match.group(2)))
+        match = FORGE_LEGACY_TPS_PATTERN.search(line)
+        if match is not None:
+            return self._record(tps=_float(match.group(2)), mspt=_float(match.group(1)))
+        match = VANILLA_MSPT_PATTERN.search(line)
+        if match is not None:
+            return self._record(mspt=_float(match.group(1)))
+        return False
+
+    def _record(self, tps: float = nan, mspt: float = nan) -> bool:
+        if isnan(tps) and mspt > 0:
+            # 只有MSPT时，TPS受20的上限约束
+            tps = min(TARGET_TPS, 1000.0 / mspt)
+        self.tps = tps
+        if not isnan(mspt):
+            self.mspt = mspt
+        self.history.append(time=time(), tps=tps, mspt=mspt)
+        self.tickUpdated.emit(self.tps, self.mspt)
+        return True
+
+    def _recordLag(self, ms: int, ticks: int):
+        self.lagSpikes += 1
+        self.lagMsTotal += ms
+        self.lastLag = (ms, ticks)
+        self.history.append(time=time(), lagMs=float(ms))
+        self.lagSpike.emit(ms, ticks)
+
+    def poll(self):
+        """经RCON静默执行TPS相关指令，没有RCON时不轮询"""
+        if not self.handler.isServerRunning():
+            return
+        client = self.handler.rconClient()
+        if client is None:
+            return
+        if not client.ready:
+            client.ensureConnected()
+            return
+        if self._commands is None:
+            # 第一次轮询：全部尝试一遍，最后一条的响应到达后确定支持的指令
+            self._probeResults = set()
+            for command in TICK_COMMANDS:
+                client.request(
+                    command,
+                    lambda response, command=command: self._onProbeResponse(command, response),
+                )
+            self._commands = set()
+            return
+        for command in self._commands:
+            client.request(command, self._onPollResponse)
+
+    def _onProbeResponse(self, command: str, response: Optional[str]):
+        if response and self.parseText(response):
+            self._probeResults.add(command)
+        if command == TICK_COMMANDS[-1]:
+            if response is None and not self._probeResults:
+                # 连接断开，下次重新探测
+                self._commands = None
+                return
+            self._commands = self._probeResults
+
+    def _onPollResponse(self, response: Optional[str]):
+        if response:
+            self.parseText(response)
@@ -40,9 +40,28 @@ class Config(QConfig):
     autoRunLastServer = ConfigItem("Server", "autoRunLastServer", False, BoolValidator())
     acceptAllMojangEula = ConfigItem("Server", "acceptAllMojangEula", False, BoolValidator())
     sendStopInsteadOfKill = ConfigItem("Server", "sendStopInsteadOfKill", True, BoolValidator())
+    stopTimeoutSeconds = RangeConfigItem(
+        "Server", "stopTimeoutSeconds", 120, RangeValidator(min=10, max=1800)
+    )
+    commandsPerTick = RangeConfigItem(
+        "Server", "commandsPerTick", 5, RangeValidator(min=1, max=100)
+    )
+    enableAppCDS = ConfigItem("Server", "enableAppCDS", False, BoolValidator())
+    checkMemoryBeforeLaunch = ConfigItem(
+        "Server", "checkMemoryBeforeLaunch", True, BoolValidator()
+    )
+    serverStatusPollInterval = RangeConfigItem(
+        "Server", "serverStatusPollInterval", 15, RangeValidator(min=5, max=300)
+    )
     restartServerWhenCrashed = ConfigItem(
         "Server", "restartServerWhenCrashed", False, BoolValidator()
     )
+    crashLoopMaxCrashes = RangeConfigItem(
+        "Server", "crashLoopMaxCrashes", 3, RangeValidator(min=1, max=20)
+    )
+    crashLoopWindowMinutes = RangeConfigItem(
+        "Server", "crashLoopWindowMinutes", 10, RangeValidator(min=1, max=120)
+    )
     # Configure server
 
     newServerType = OptionsConfigItem(
@@ -51,9 +70,6 @@ class Config(QConfig):
         "Default",
         OptionsValidator(["Default", "Noob", "Extended", "Import"]),
     )
-    onlySaveGlobalServerConfig = ConfigItem(
-        "ConfigureServer", "onlySaveGlobalServerConfig", False, BoolValidator()
-    )
     clearAllNewServerConfigInProgram = ConfigItem(
         "ConfigureServer", "clearAllNewServerConfigInProgram", False, BoolValidator()
     )
@@ -85,8 +101,8 @@ class Config(QConfig):
     outputDeEncoding = OptionsConfigItem(
         "Console",
         "outputDeEncoding",
-        "ansi",
-        OptionsValidator(["utf-8", "GB18030", "ansi"]),
+        "auto",
+        OptionsValidator(["auto", "utf-8", "GB18030", "ansi"]),
     )
     inputDeEncoding = OptionsConfigItem(
         "Console",
@@ -98,6 +114,13 @@ class Config(QConfig):
     clearConsoleWhenStopServer = ConfigItem(
         "Console", "clearConsoleWhenStopServer", False, BoolValidator()
     )
+    consoleBufferLines = RangeConfigItem(
+        "Console", "consoleBufferLines", 5000, RangeValidator(min=500, max=100000)
+    )
+    spillConsoleToDisk = ConfigItem("Console", "spillConsoleToDisk", True, BoolValidator())
+    resourceMonitorMemMode = OptionsConfigItem(
+        "Console", "resourceMonitorMemMode", "rss", OptionsValidator(["rss", "uss"])
+    )
     # Software
     # themeMode = OptionsConfigItem(
     # "QFluentWidgets", "ThemeMode", Theme.LIGHT, OptionsValidator(Theme), EnumSerializer(Theme))
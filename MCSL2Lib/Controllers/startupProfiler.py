@@ -0,0 +1,213 @@
+#     Copyright 2023, MCSL Team, mailto:lxhtt@vip.qq.com
+#
+#     Part of "MCSL2", a simple and multifunctional Minecraft server launcher.
+#
+#     Licensed under the GNU General Public License, Version 3.0, with our
+#     additional agreements. (the "License");
+#     you may not use this file except in compliance with the License.
+#     You may obtain a copy of the License at
+#
+#        https://github.com/MCSLTeam/MCSL2/raw/master/LICENSE
+#
+################################################################################
+"""
+Startup-phase profiler, timestamps each launch phase and keeps a per-server history.
+"""
+
+import json
+import re
+from os import path as osp
+from statistics import median
+from time import monotonic, time
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from PyQt5.QtCore import QObject, pyqtSignal
+
+from MCSL2Lib.Controllers.serverTickController import DONE_PATTERN
+from MCSL2Lib.utils import MCSL2Logger
+
+# 启动阶段，按出现顺序排列；spawn为调用QProcess.start的时刻，其余为对应日志首次出现的时刻
+STARTUP_PHASES = (
+    "spawn",
+    "firstOutput",
+    "loadingLibraries",
+    "preparingLevel",
+    "preparingSpawn",
+    "done",
+)
+# 识别各阶段的日志子串，firstOutput和done另行判断
+PHASE_KEYWORDS = (
+    ("loadingLibraries", "Loading libraries"),
+    ("preparingLevel", "Preparing level"),
+    ("preparingSpawn", "Preparing spawn area"),
+)
+SPAWN_PROGRESS_PATTERN = re.compile(r"Preparing spawn area: (\d+)%")
+
+STARTUP_HISTORY_FILE = "MCSL2StartupHistory.jsonl"
+
+
+class StartupRecord(NamedTuple):
+    """一次完整启动的记录，phases为各阶段相对spawn的毫秒数，没出现的阶段不记录"""
+
+    time: float
+    args: str
+    phases: Dict[str, int]
+    # 准备出生点的进度，[(百分比, 毫秒)]
+    spawnProgress: List[Tuple[int, int]]
+
+    @property
+    def total(self) -> int:
+        return self.phases.get("done", 0)
+
+    def segments(self) -> List[Tuple[str, int]]:
+        """
+        按阶段切分的耗时，[(阶段, 毫秒)]。\n
+        每段从该阶段开始到下一个出现过的阶段为止，没出现的阶段并入前一段。
+        """
+        marks = [(p, self.phases[p]) for p in STARTUP_PHASES if p in self.phases]
+        return [(p, max(end - start, 0)) for (p, start), (_, end) in zip(marks, marks[1:])]
+
+    def toJson(self) -> str:
+        return json.dumps(
+            {
+                "time": int(self.time),
+                "args": self.args,
+                "phases": self.phases,
+                "spawnProgress": self.spawnProgress,
+            },
+            ensure_ascii=False,
+            separators=(",", ":"),
+        )
+
+    @classmethod
+    def fromJson(cls, line: str) -> "StartupRecord":
+        data = json.loads(line)
+        return cls(
+            float(data["time"]),
+            data.get("args", ""),
+            {k: int(v) for k, v in data["phases"].items()},
+            [(int(p), int(ms)) for p, ms in data.get("spawnProgress", [])],
+        )
+
+
+def startupHistoryFile(serverName: str) -> str:
+    return osp.join("Servers", serverName, STARTUP_HISTORY_FILE)
+
+
+def loadStartupHistory(serverName: str) -> List[StartupRecord]:
+    """读取服务器的启动记录，按时间从旧到新，损坏的行跳过"""
+    records = []
+    try:
+        with open(startupHistoryFile(serverName), "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    records.append(StartupRecord.fromJson(line))
+                except (ValueError, KeyError, TypeError):
+                    continue
+    except OSError:
+        pass
+    return records
+
+
+def medianSegments(records: List[StartupRecord]) -> List[Tuple[str, int]]:
+    """多次启动各阶段耗时的中位数，用于服务器之间对比"""
+    durations: Dict[str, List[int]] = {}
+    for record in records:
+        for phase, ms in record.segments():
+            durations.setdefault(phase, []).append(ms)
+    return [
+        (phase, int(median(durations[phase]))) for phase in STARTUP_PHASES if phase in durations
+    ]
+
+
+class StartupProfiler(QObject):
+    """
+    服务器启动阶段计时器，每个服务器实例一个。\n
+    在解码后、分批发送前检查日志，时间戳不受分批延迟影响；启动完成(Done)后把一条记录
+    追加到服务器目录的启动记录文件，每次启动一行JSON，只保留最近historyLimit条。
+    """
+
+    # 进入了新的阶段，(阶段, 相对spawn的毫秒数)
+    phaseReached = pyqtSignal(str, int)
+    # 启动完成，发送StartupRecord
+    profileFinished = pyqtSignal(object)
+
+    historyLimit: int = 100
+
+    def __init__(self, handler, parent=None):
+        super().__init__(parent)
+        self.handler = handler
+        self.active = False
+        self.lastRecord: Optional[StartupRecord] = None
+        self._start = 0.0
+        self._startTime = 0.0
+        self._args = ""
+        self._phases: Dict[str, int] = {}
+        self._spawnProgress: List[Tuple[int, int]] = []
+
+    def begin(self, args: List[str]):
+        """进程即将启动时调用"""
+        self.active = True
+        self._start = monotonic()
+        self._startTime = time()
+        self._args = " ".join(args)
+        self._phases = {"spawn": 0}
+        self._spawnProgress = []
+
+    def abort(self):
+        """进程在启动完成前退出，本次不记录"""
+        self.active = False
+
+    def _mark(self, phase: str) -> int:
+        ms = int((monotonic() - self._start) * 1000)
+        self._phases[phase] = ms
+        self.phaseReached.emit(phase, ms)
+        return ms
+
+    def onLines(self, lines: List[str]):
+        if not self.active or not lines:
+            return
+        if "firstOutput" not in self._phases:
+            self._mark("firstOutput")
+        for line in lines:
+            for phase, keyword in PHASE_KEYWORDS:
+                if phase not in self._phases and keyword in line:
+                    self._mark(phase)
+            if "Preparing spawn area" in line:
+                match = SPAWN_PROGRESS_PATTERN.search(line)
+                if match is not None:
+                    percent = int(match.group(1))
+                    if not self._spawnProgress or self._spawnProgress[-1][0] != percent:
+                        self._spawnProgress.append(
+                            (percent, int((monotonic() - self._start) * 1000))
+                        )
+            if "Done (" in line and DONE_PATTERN.search(line) is not None:
+                self._mark("done")
+                self._finish()
+                return
+
+    def _finish(self):
+        self.active = False
+        record = StartupRecord(self._startTime, self._args, self._phases, self._spawnProgress)
+        self.lastRecord = record
+        try:
+            self.appendRecord(record)
+        except OSError as e:
+            MCSL2Logger.warning(f"保存服务器 {self.handler.serverName} 的启动记录失败：{e}")
+        MCSL2Logger.info(
+            f"服务器 {self.handler.serverName} 启动用时 {record.total} 毫秒："
+            + "，".join(f"{phase} {ms}" for phase, ms in record.segments())
+        )
+        self.profileFinished.emit(record)
+
+    def appendRecord(self, record: StartupRecord):
+        """追加一行；超过上限两倍时才重写文件，只保留最近historyLimit条"""
+        path = startupHistoryFile(self.handler.serverName)
+        with open(path, "a", encoding="utf-8") as f:
+            f.write(record.toJson() + "\n")
+        with open(path, "r", encoding="utf-8") as f:
+            count = sum(1 for _ in f)
+        if count > self.historyLimit * 2:
+            records = loadStartupHistory(self.handler.serverName)[-self.historyLimit :]
+            with open(path, "w", encoding="utf-8") as f:
+                f.writelines(r.toJson() + "\n" for r in records)
@@ -0,0 +1,139 @@
+#     Copyright 2023, MCSL Team, mailto:lxhtt@vip.qq.com
+#
+#     Part of "MCSL2", a simple and multifunctional Minecraft server launcher.
+#
+#     Licensed under the GNU General Public License, Version 3.0, with our
+#     additional agreements. (the "License");
+#     you may not use this file except in compliance with the License.
+#     You may obtain a copy of the License at
+#
+#        https://github.com/MCSLTeam/MCSL2/raw/master/LICENSE
+#
+################################################################################
+"""
+Per-thread CPU usage of a server process, grouped by Java thread name.
+"""
+
+import os
+import re
+from os import path as osp
+from time import monotonic
+from typing import Dict, Optional, Tuple
+
+from psutil import AccessDenied, NoSuchProcess, Process
+
+# 服务器主线程(tick线程)的名字，原版、Spigot系、Forge/Fabric都一样
+MAIN_THREAD_NAME = "Server thread"
+# 线程名前缀 -> 分组名，按顺序匹配
+THREAD_GROUPS: Tuple[Tuple[str, str], ...] = (
+    (MAIN_THREAD_NAME, MAIN_THREAD_NAME),
+    ("Netty", "Netty"),
+    ("Worker-Main", "Worker-Main"),
+    ("GC Thread", "GC"),
+    ("G1 ", "GC"),
+    ("ZGC", "GC"),
+    ("Shenandoah", "GC"),
+    ("VM Periodic", "JVM"),
+    ("VM Thread", "JVM"),
+    ("C1 Compiler", "JIT"),
+    ("C2 Compiler", "JIT"),
+    ("Chunk", "Chunk"),
+    ("Async Chat", "Chat"),
+)
+# 线程名末尾的编号，如"Worker-Main-12"、"GC Thread#3"
+_THREAD_NUMBER_PATTERN = re.compile(r"[\s#\-_]*\d+$")
+
+
+def threadGroup(name: str) -> str:
+    """把线程名归入分组，未知的线程去掉末尾编号后自成一组"""
+    for prefix, group in THREAD_GROUPS:
+        if name.startswith(prefix):
+            return group
+    return _THREAD_NUMBER_PATTERN.sub("", name) or name
+
+
+class ThreadCpuSampler:
+    """
+    按线程统计进程的CPU占用。\n
+    Linux下直接读/proc/<pid>/task/*/stat，JVM会把Java线程名设置为内核线程名，
+    因此能按"Server thread"、Netty、Worker-Main、GC等分组；
+    其他系统退回psutil的线程列表，拿不到线程名，只能以最忙的线程近似主线程。\n
+    占用以单核为100%：主线程接近100%说明tick线程已经跑满，即使整机CPU占用很低，服务器也会卡顿。
+    """
+
+    def __init__(self):
+        self._procfs = osp.isdir("/proc/self/task")
+        self._clockTicks = os.sysconf("SC_CLK_TCK") if hasattr(os, "sysconf") else 100
+        # 线程id -> 累计CPU秒数
+        self._lastTimes: Dict[int, float] = {}
+        self._lastSampleTime = 0.0
+        self._pid = 0
+        self._process: Optional[Process] = None
+
+    def reset(self):
+        self._lastTimes = {}
+        self._lastSampleTime = 0.0
+        self._pid = 0
+        self._process = None
+
+    def _readProcfs(self, pid: int) -> Dict[int, Tuple[str, float]]:
+        """线程id -> (线程名, 累计CPU秒数)"""
+        threads = {}
+        taskDir = f"/proc/{pid}/task"
+        for entry in os.scandir(taskDir):
+            try:
+                with open(f"{taskDir}/{entry.name}/stat", "rb") as f:
+                    stat = f.read()
+            except OSError:
+                # 线程在列目录之后退出了
+                continue
+            # 第二个字段是括号里的线程名(即comm)，名字里可能有括号，所以找最后一个右括号
+            nameStart = stat.find(b"(") + 1
+            nameEnd = stat.rfind(b")")
+            fields = stat[nameEnd + 2 :].split()
+            # 去掉pid和comm后，utime和stime是第12、13个字段
+            ticks = int(fields[11]) + int(fields[12])
+            threads[int(entry.name)] = (
+                stat[nameStart:nameEnd].decode("utf-8", errors="replace"),
+                ticks / self._clockTicks,
+            )
+        return threads
+
+    def _readPsutil(self, pid: int) -> Dict[int, Tuple[str, float]]:
+        if self._process is None or self._process.pid != pid:
+            self._process = Process(pid)
+        return {t.id: ("", t.user_time + t.system_time) for t in self._process.threads()}
+
+    def sample(self, pid: int) -> Optional[Tuple[float, Dict[str, float]]]:
+        """
+        返回(主线程占用, {分组: 占用})，单位为单核的百分比。\n
+        第一次调用只记录基准，返回None；进程不存在或无权限时也返回None。
+        """
+        if pid != self._pid:
+            self.reset()
+            self._pid = pid
+        try:
+            threads = self._readProcfs(pid) if self._procfs else self._readPsutil(pid)
+        except (OSError, NoSuchProcess, AccessDenied, ValueError, IndexError):
+            self._process = None
+            return None
+        now = monotonic()
+        lastTimes, elapsed = self._lastTimes, now - self._lastSampleTime
+        self._lastTimes = {tid: cpuTime for tid, (_, cpuTime) in threads.items()}
+        self._lastSampleTime = now
+        if not lastTimes or elapsed <= 0:
+            return None
+        groups: Dict[str, float] = {}
+        mainThread = None
+        busiest = 0.0
+        for tid, (name, cpuTime) in threads.items():
+            percent = max(cpuTime - lastTimes.get(tid, cpuTime), 0.0) / elapsed * 100
+            busiest = max(busiest, percent)
+            if not name:
+                continue
+            group = threadGroup(name)
+            groups[group] = groups.get(group, 0.0) + percent
+            if group == MAIN_THREAD_NAME:
+                mainThread = max(mainThread or 0.0, percent)
+        # 拿不到线程名，或服务端给主线程改了名字时，以最忙的线程近似
+        return busiest if mainThread is None else mainThread, groups
@@ -14,7 +14,6 @@
 Configure new server page.
 """
 
-from json import loads, dumps
 from os import getcwd, mkdir, remove, path as osp
 from shutil import copy, rmtree
 
@@ -52,6 +51,7 @@ from qfluentwidgets import (
 from MCSL2Lib.Controllers import javaDetector
 
 # from MCSL2Lib.Controllers.interfaceController import ChildStackedWidget
+from MCSL2Lib.Controllers.serverConfigRepository import ServerConfigRepository
 from MCSL2Lib.Controllers.serverController import MojangEula
 from MCSL2Lib.Controllers.serverImporter import NoShellArchivesImporter
 from MCSL2Lib.Controllers.serverInstaller import ForgeInstaller
@@ -72,14 +72,12 @@ from MCSL2Lib.Controllers.interfaceController import MySmoothScrollArea
 from MCSL2Lib.singleton import Singleton
 from MCSL2Lib.variables import (
     ConfigureServerVariables,
-    ServerVariables,
     SettingsVariables,
 )
 from MCSL2Lib.utils import MCSL2Logger
 
 configureServerVariables = ConfigureServerVariables()
 settingsVariables = SettingsVariables()
-serverVariables = ServerVariables()
 
 
 @Singleton
@@ -1961,47 +1959,9 @@ class ConfigurePage(QWidget):
             )
             return
 
-        # 写入全局配置
+        # 写入服务器配置
         try:
-            with open(
-                r"MCSL2/MCSL2_ServerList.json", "r", encoding="utf-8"
-            ) as globalServerListFile:
-                # old
-                globalServerList = loads(globalServerListFile.read())
-                globalServerListFile.close()
-
-            with open(
-                r"MCSL2/MCSL2_ServerList.json", "w+", encoding="utf-8"
-            ) as newGlobalServerListFile:
-                # 添加新的
-                globalServerList["MCSLServerList"].append(serverConfig)
-                newGlobalServerListFile.write(dumps(globalServerList, indent=4))
-            exitCode = 0
-        except Exception as e:
-            exitCode = 1
-            exit1Msg += f"\n{e}"
-
-        # 写入单独配置
-        try:
-            if not cfg.get(cfg.onlySaveGlobalServerConfig):
-                with open(
-                    f"Servers//{configureServerVariables.serverName}//MCSL2ServerConfig.json",
-                    "w+",
-                    encoding="utf-8",
-                ) as serverListFile:
-                    serverListFile.write(dumps(serverConfig, indent=4))
-            else:
-                InfoBar.info(
-                    title=self.tr("功能提醒"),
-                    content=self.tr(
-                        "您在设置中开启了“只保存全局服务器设置”。\n将不会保存单独服务器设置。\n这有可能导致服务器迁移较为繁琐。"
-                    ),
-                    orient=Qt.Horizontal,
-                    isClosable=True,
-                    position=InfoBarPosition.TOP,
-                    duration=3000,
-                    parent=self,
-                )
+            ServerConfigRepository().append(serverConfig)
             exitCode = 0
         except Exception as e:
             exitCode = 1
@@ -2019,8 +1979,6 @@ class ConfigurePage(QWidget):
 
         # 自动同意Mojang Eula
         if cfg.get(cfg.acceptAllMojangEula):
-            tmpServerName = serverVariables.serverName
-            serverVariables.serverName = configureServerVariables.serverName
             MinecraftEulaInfoBar = InfoBar(
                 icon=FIF.INFO,
                 title=self.tr("功能提醒"),
@@ -2043,8 +2001,7 @@ class ConfigurePage(QWidget):
                 )
             )
             MinecraftEulaInfoBar.show()
-            MojangEula().acceptEula()
-            serverVariables.serverName = tmpServerName
+            MojangEula(configureServerVariables.serverName).acceptEula()
 
         if exitCode == 0:
             self.postNewServerDispatcher(
@@ -2096,20 +2053,8 @@ class ConfigurePage(QWidget):
         ):  # 防止出现重复回滚的操作
             # 删除文件夹
             rmtree(serverDir)
-            # 删除全局配置
-            with open(
-                r"MCSL2/MCSL2_ServerList.json", "r", encoding="utf-8"
-            ) as globalServerListFile:
-                # old
-                globalServerList = loads(globalServerListFile.read())
-                globalServerListFile.close()
-
-            with open(
-                r"MCSL2/MCSL2_ServerList.json", "w+", encoding="utf-8"
-            ) as newGlobalServerListFile:
-                # 删除新的
-                globalServerList["MCSLServerList"].pop()
-                newGlobalServerListFile.write(dumps(globalServerList, indent=4))
+            # 删除配置
+            ServerConfigRepository().remove(configureServerVariables.serverName)
 
     @pyqtSlot(bool)
     def afterInstallingForge(self, installFinished, args=...):
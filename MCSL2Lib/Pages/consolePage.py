@@ -16,7 +16,7 @@ Minecraft server console page.
 """
 
 from PyQt5.QtCore import QSize, Qt, pyqtSlot, pyqtSignal, QObject, QEvent
-from PyQt5.QtGui import QTextCharFormat, QColor, QBrush, QCursor
+from PyQt5.QtGui import QColor, QBrush, QCursor
 from PyQt5.QtWidgets import (
     QSpacerItem,
     QGridLayout,
@@ -25,13 +25,15 @@ from PyQt5.QtWidgets import (
     QSizePolicy,
     QFrame,
     QCompleter,
+    QFileDialog,
 )
 from qfluentwidgets import (
+    CaptionLabel,
     CardWidget,
     ComboBox,
     LineEdit,
-    PlainTextEdit,
     PrimaryToolButton,
+    ProgressBar,
     ProgressRing,
     StrongBodyLabel,
     TitleLabel,
@@ -43,16 +45,21 @@ from qfluentwidgets import (
     ToggleButton,
     ToolTip,
 )
-from re import search
-from MCSL2Lib.Controllers.serverController import ServerHandler, readServerProperties
-from MCSL2Lib.Controllers.serverErrorHandler import ServerErrorHandler
+from math import isnan
+from typing import Optional
+from MCSL2Lib.Controllers.consoleLogClassifier import (
+    ConsoleLogClassifier,
+    ConsoleLogLevel,
+)
+from MCSL2Lib.Controllers.serverConfigRepository import ServerConfigRepository
+from MCSL2Lib.Controllers.serverController import ServerHandler, ServerHandlerRegistry
+from MCSL2Lib.Widgets.consoleLogView import ConsoleLogModel, ConsoleLogView
 from MCSL2Lib.Widgets.playersControllerMainWidget import playersController
+from MCSL2Lib.Widgets.processTuningWidgets import ProcessTuningBox
+from MCSL2Lib.Widgets.resourceHistoryChart import ResourceHistoryChart
+from MCSL2Lib.Widgets.startupProfileWidgets import StartupProfileBox
 from MCSL2Lib.singleton import Singleton
-from MCSL2Lib.variables import ServerVariables, GlobalMCSL2Variables
-from MCSL2Lib.utils import MCSL2Logger
-
-
-serverVariables = ServerVariables()
+from MCSL2Lib.variables import GlobalMCSL2Variables
 
 
 class ErrorHandlerToggleButton(ToggleButton):
@@ -87,8 +94,7 @@ class ConsolePage(QWidget):
 
     def __init__(self, parent=None):
         super().__init__(parent)
-        self.errMsg = ""
-        self.playersList = []
+        self.serverHandler: Optional[ServerHandler] = None
         self.playersControllerBtnEnabled.emit(False)
         self.gridLayout = QGridLayout(self)
         self.gridLayout.setObjectName("gridLayout")
@@ -99,8 +105,8 @@ class ConsolePage(QWidget):
         sizePolicy.setVerticalStretch(0)
         sizePolicy.setHeightForWidth(self.serverMemCardWidget.sizePolicy().hasHeightForWidth())
         self.serverMemCardWidget.setSizePolicy(sizePolicy)
-        self.serverMemCardWidget.setMinimumSize(QSize(130, 120))
-        self.serverMemCardWidget.setMaximumSize(QSize(130, 120))
+        self.serverMemCardWidget.setMinimumSize(QSize(130, 150))
+        self.serverMemCardWidget.setMaximumSize(QSize(130, 150))
         self.serverMemCardWidget.setObjectName("serverMemCardWidget")
 
         self.gridLayout_3 = QGridLayout(self.serverMemCardWidget)
@@ -125,6 +131,14 @@ class ConsolePage(QWidget):
         self.serverMemLabel.setObjectName("serverMemLabel")
 
         self.gridLayout_3.addWidget(self.serverMemLabel, 0, 0, 1, 3)
+        self.serverHeapLabel = CaptionLabel(self.serverMemCardWidget)
+        self.serverHeapLabel.setObjectName("serverHeapLabel")
+
+        self.gridLayout_3.addWidget(self.serverHeapLabel, 2, 0, 1, 3)
+        self.serverHeapProgressBar = ProgressBar(self.serverMemCardWidget)
+        self.serverHeapProgressBar.setObjectName("serverHeapProgressBar")
+
+        self.gridLayout_3.addWidget(self.serverHeapProgressBar, 3, 0, 1, 3)
         self.gridLayout.addWidget(self.serverMemCardWidget, 1, 4, 1, 1)
         spacerItem2 = QSpacerItem(20, 10, QSizePolicy.Minimum, QSizePolicy.Fixed)
         self.gridLayout.addItem(spacerItem2, 0, 2, 1, 1)
@@ -136,8 +150,8 @@ class ConsolePage(QWidget):
         sizePolicy.setVerticalStretch(0)
         sizePolicy.setHeightForWidth(self.serverCPUCardWidget.sizePolicy().hasHeightForWidth())
         self.serverCPUCardWidget.setSizePolicy(sizePolicy)
-        self.serverCPUCardWidget.setMinimumSize(QSize(130, 120))
-        self.serverCPUCardWidget.setMaximumSize(QSize(130, 120))
+        self.serverCPUCardWidget.setMinimumSize(QSize(130, 160))
+        self.serverCPUCardWidget.setMaximumSize(QSize(130, 160))
         self.serverCPUCardWidget.setObjectName("serverCPUCardWidget")
 
         self.gridLayout_4 = QGridLayout(self.serverCPUCardWidget)
@@ -162,9 +176,67 @@ class ConsolePage(QWidget):
         self.serverCPULabel.setObjectName("serverCPULabel")
 
         self.gridLayout_4.addWidget(self.serverCPULabel, 0, 0, 1, 3)
+        self.serverGCLabel = CaptionLabel(self.serverCPUCardWidget)
+        self.serverGCLabel.setObjectName("serverGCLabel")
+
+        self.gridLayout_4.addWidget(self.serverGCLabel, 3, 0, 1, 3)
+        self.serverMainThreadLabel = CaptionLabel(self.serverCPUCardWidget)
+        self.serverMainThreadLabel.setObjectName("serverMainThreadLabel")
+
+        self.gridLayout_4.addWidget(self.serverMainThreadLabel, 2, 0, 1, 3)
         self.gridLayout.addWidget(self.serverCPUCardWidget, 2, 4, 1, 1)
+        self.serverTickCardWidget = CardWidget(self)
+        self.serverTickCardWidget.setMinimumSize(QSize(130, 140))
+        self.serverTickCardWidget.setMaximumSize(QSize(130, 140))
+        self.serverTickCardWidget.setObjectName("serverTickCardWidget")
+
+        self.serverTickLayout = QVBoxLayout(self.serverTickCardWidget)
+        self.serverTickLayout.setObjectName("serverTickLayout")
+
+        self.serverTPSLabel = StrongBodyLabel(self.serverTickCardWidget)
+        self.serverTPSLabel.setObjectName("serverTPSLabel")
+
+        self.serverTickLayout.addWidget(self.serverTPSLabel)
+        self.serverTPSProgressBar = ProgressBar(self.serverTickCardWidget)
+        self.serverTPSProgressBar.setObjectName("serverTPSProgressBar")
+
+        self.serverTickLayout.addWidget(self.serverTPSProgressBar)
+        self.serverMSPTLabel = CaptionLabel(self.serverTickCardWidget)
+        self.serverMSPTLabel.setObjectName("serverMSPTLabel")
+
+        self.serverTickLayout.addWidget(self.serverMSPTLabel)
+        self.serverLagLabel = CaptionLabel(self.serverTickCardWidget)
+        self.serverLagLabel.setObjectName("serverLagLabel")
+
+        self.serverTickLayout.addWidget(self.serverLagLabel)
+        self.startupProfileButton = TransparentPushButton(self.serverTickCardWidget)
+        self.startupProfileButton.setObjectName("startupProfileButton")
+
+        self.serverTickLayout.addWidget(self.startupProfileButton)
+        self.gridLayout.addWidget(self.serverTickCardWidget, 3, 4, 1, 1)
+        self.resourceHistoryCardWidget = CardWidget(self)
+        self.resourceHistoryCardWidget.setMinimumSize(QSize(130, 110))
+        self.resourceHistoryCardWidget.setMaximumSize(QSize(130, 110))
+        self.resourceHistoryCardWidget.setObjectName("resourceHistoryCardWidget")
+
+        self.resourceHistoryLayout = QVBoxLayout(self.resourceHistoryCardWidget)
+        self.resourceHistoryLayout.setObjectName("resourceHistoryLayout")
+
+        self.resourceHistoryLabel = StrongBodyLabel(self.resourceHistoryCardWidget)
+        self.resourceHistoryLabel.setObjectName("resourceHistoryLabel")
+
+        self.resourceHistoryLayout.addWidget(self.resourceHistoryLabel)
+        self.resourceHistoryChart = ResourceHistoryChart(self.resourceHistoryCardWidget)
+        self.resourceHistoryChart.setObjectName("resourceHistoryChart")
+
+        self.resourceHistoryLayout.addWidget(self.resourceHistoryChart)
+        self.exportResourceHistoryButton = TransparentPushButton(self.resourceHistoryCardWidget)
+        self.exportResourceHistoryButton.setObjectName("exportResourceHistoryButton")
+
+        self.resourceHistoryLayout.addWidget(self.exportResourceHistoryButton)
+        self.gridLayout.addWidget(self.resourceHistoryCardWidget, 5, 4, 1, 1)
         spacerItem6 = QSpacerItem(20, 40, QSizePolicy.Minimum, QSizePolicy.Expanding)
-        self.gridLayout.addItem(spacerItem6, 4, 4, 1, 1)
+        self.gridLayout.addItem(spacerItem6, 6, 4, 1, 1)
         self.titleLimitWidget = QWidget(self)
         self.titleLimitWidget.setObjectName("titleLimitWidget")
 
@@ -191,7 +263,7 @@ class ConsolePage(QWidget):
         self.commandLineEdit.setObjectName("commandLineEdit")
 
         self.gridLayout_2.addWidget(self.commandLineEdit, 4, 0, 1, 1)
-        self.serverOutput = PlainTextEdit(self.titleLimitWidget)
+        self.serverOutput = ConsoleLogView(self.titleLimitWidget)
         self.serverOutput.setFrameShape(QFrame.NoFrame)
         self.serverOutput.setVerticalScrollBarPolicy(Qt.ScrollBarAsNeeded)
         self.serverOutput.setHorizontalScrollBarPolicy(Qt.ScrollBarAsNeeded)
@@ -207,14 +279,14 @@ class ConsolePage(QWidget):
         self.titleLabel.setObjectName("titleLabel")
 
         self.gridLayout_2.addWidget(self.titleLabel, 0, 0, 1, 1)
-        self.gridLayout.addWidget(self.titleLimitWidget, 1, 2, 4, 2)
+        self.gridLayout.addWidget(self.titleLimitWidget, 1, 2, 5, 2)
         self.quickMenu = CardWidget(self)
         sizePolicy = QSizePolicy(QSizePolicy.Fixed, QSizePolicy.Fixed)
         sizePolicy.setHorizontalStretch(0)
         sizePolicy.setVerticalStretch(0)
         sizePolicy.setHeightForWidth(self.quickMenu.sizePolicy().hasHeightForWidth())
         self.quickMenu.setSizePolicy(sizePolicy)
-        self.quickMenu.setMinimumSize(QSize(100, 340))
+        self.quickMenu.setMinimumSize(QSize(100, 375))
         self.quickMenu.setMaximumSize(QSize(130, 16777215))
         self.quickMenu.setObjectName("quickMenu")
 
@@ -270,17 +342,31 @@ class ConsolePage(QWidget):
         self.killServer.setObjectName("killServer")
 
         self.verticalLayout.addWidget(self.killServer)
+        self.processTuningButton = TransparentPushButton(self.quickMenu)
+        self.processTuningButton.setMinimumSize(QSize(0, 30))
+        self.processTuningButton.setObjectName("processTuningButton")
+
+        self.verticalLayout.addWidget(self.processTuningButton)
         self.errorHandler = ErrorHandlerToggleButton(self.quickMenu)
         self.errorHandler.setMinimumSize(QSize(0, 30))
         self.errorHandler.setObjectName("errorHandler")
 
         self.verticalLayout.addWidget(self.errorHandler)
-        self.gridLayout.addWidget(self.quickMenu, 3, 4, 1, 1)
+        self.gridLayout.addWidget(self.quickMenu, 4, 4, 1, 1)
 
         self.setObjectName("ConsoleInterface")
 
         self.serverMemLabel.setText(self.tr("内存： NaN"))
         self.serverCPULabel.setText(self.tr("CPU占用："))
+        self.serverHeapLabel.setText(self.tr("堆：NaN"))
+        self.serverGCLabel.setText(self.tr("GC耗时：NaN"))
+        self.serverMainThreadLabel.setText(self.tr("主线程：NaN"))
+        self.serverTPSLabel.setText(self.tr("TPS：NaN"))
+        self.serverMSPTLabel.setText(self.tr("MSPT：NaN"))
+        self.serverLagLabel.setText(self.tr("卡顿：0次"))
+        self.startupProfileButton.setText(self.tr("启动分析"))
+        self.resourceHistoryLabel.setText(self.tr("资源记录："))
+        self.exportResourceHistoryButton.setText(self.tr("导出CSV"))
         self.subTitleLabel.setText(self.tr("直观地观察你的服务器的输出，资源占用等。"))
         self.titleLabel.setText(self.tr("终端"))
         self.quickMenuTitleLabel.setText(self.tr("快捷菜单："))
@@ -295,6 +381,7 @@ class ConsolePage(QWidget):
         self.saveServer.setText(self.tr("保存存档"))
         self.exitServer.setText(self.tr("关闭服务器"))
         self.killServer.setText(self.tr("强制关闭"))
+        self.processTuningButton.setText(self.tr("进程调度"))
         self.errorHandler.setText(self.tr("报错分析"))
         self.commandLineEdit.setPlaceholderText(
             self.tr("在此输入指令，回车或点击右边按钮发送，不需要加/")
@@ -304,7 +391,6 @@ class ConsolePage(QWidget):
         self.commandLineEdit.textChanged.connect(
             lambda: self.sendCommandButton.setEnabled(self.commandLineEdit.text() != "")
         )
-        self.serverOutput.setReadOnly(True)
         self.sendCommandButton.clicked.connect(
             lambda: self.sendCommand(command=self.commandLineEdit.text())
         )
@@ -317,8 +403,11 @@ class ConsolePage(QWidget):
         self.op.clicked.connect(self.initQuickMenu_Operator)
         self.kickPlayers.clicked.connect(self.initQuickMenu_Kick)
         self.banPlayers.clicked.connect(self.initQuickMenu_BanOrPardon)
-        self.saveServer.clicked.connect(lambda: self.sendCommand("save-all"))
+        self.saveServer.clicked.connect(lambda: self.runQuickCommand("save-all"))
         self.killServer.clicked.connect(self.runQuickMenu_KillServer)
+        self.processTuningButton.clicked.connect(self.showProcessTuning)
+        self.exportResourceHistoryButton.clicked.connect(self.exportResourceHistory)
+        self.startupProfileButton.clicked.connect(self.showStartupProfile)
         intellisense = QCompleter(
             GlobalMCSL2Variables.MinecraftBuiltInCommand, self.commandLineEdit
         )
@@ -328,141 +417,237 @@ class ConsolePage(QWidget):
         self.serverMemProgressRing.setTextVisible(True)
         self.serverCPUProgressRing.setTextVisible(True)
         self.errorHandler.setChecked(False)
+        # CPU为整台机器的百分比，主线程为单核的百分比，内存以服务器最大内存为满刻度
+        self.resourceHistoryChart.addSeries("cpu", QColor(0, 159, 170), lambda _: 100.0)
+        self.resourceHistoryChart.addSeries("mainThread", QColor(214, 39, 21), lambda _: 100.0)
+        self.resourceHistoryChart.addSeries("mem", QColor(196, 139, 33), self.memChartScale)
+        self.resourceHistoryChart.addSeries("heapUsed", QColor(52, 185, 96), self.memChartScale)
+        self.initLogClassifier()
+
+    def initLogClassifier(self):
+        """预先构建日志分类器，翻译只做一次"""
+        self.levelBrushes = {
+            ConsoleLogLevel.INFO: QBrush(QColor(52, 185, 96)),
+            ConsoleLogLevel.WARN: QBrush(QColor(196, 139, 33)),
+            ConsoleLogLevel.ERROR: QBrush(QColor(214, 39, 21)),
+            ConsoleLogLevel.DEBUG: QBrush(QColor(22, 122, 232)),
+        }
+        self.logClassifier = ConsoleLogClassifier(
+            {
+                "Preparing spawn area": self.tr("准备生成点区域中"),
+                "main/INFO": self.tr("主类/信息"),
+                "main/WARN": self.tr("主类/警告"),
+                "main/ERROR": self.tr("主类/错误"),
+                "main/FATAL": self.tr("主类/致命错误"),
+                "main/DEBUG": self.tr("主类/调试信息"),
+                "INFO": self.tr("信息"),
+                "WARN": self.tr("警告"),
+                "ERROR": self.tr("错误"),
+                "FATAL": self.tr("致命错误"),
+                "DEBUG": self.tr("调试信息"),
+                "Server thread": self.tr("服务器线程"),
+                "Server-Worker": self.tr("服务器工作进程"),
+                "Forge Version Check": self.tr("Forge版本检查"),
+                "ModLauncher running: args": self.tr("ModLauncher运行中: 参数"),
+                "All chunks are saved": self.tr("所有区块已保存"),
+                "Saving the game (this may take a moment!)": self.tr(
+                    "保存游戏存档中（可能需要一些时间）"
+                ),
+                "Saved the game": self.tr("已保存游戏存档"),
+            }
+        )
+        ServerHandlerRegistry().logClassifier = self.logClassifier
+        self.consoleModel = ConsoleLogModel(self.levelBrushes, self)
+        self.serverOutput.setModel(self.consoleModel)
+
+    def bindServerHandler(self, handler: ServerHandler):
+        """切换终端显示的服务器实例，并回放该实例的终端缓冲区"""
+        if self.serverHandler is handler:
+            return
+        if self.serverHandler is not None:
+            self.serverHandler.classifiedLogOutput.disconnect(self.syncConsoleView)
+            self.serverHandler.serverStarting.disconnect(self.showServerStartingInfo)
+            self.serverHandler.serverStartupDone.disconnect(self.showServerStartupDone)
+            self.serverHandler.invalidOutputDetected.disconnect(self.showInvalidOutputWarning)
+            self.serverHandler.serverClosed.disconnect(self.showErrorHandlerReport)
+            self.serverHandler.commandQueue.pendingChanged.disconnect(self.setPendingCommandsView)
+            self.serverHandler.resMonitor.memPercent.disconnect(self.setMemView)
+            self.serverHandler.resMonitor.cpuPercent.disconnect(self.setCPUView)
+            self.serverHandler.resMonitor.heapUsage.disconnect(self.setHeapView)
+            self.serverHandler.resMonitor.gcPercent.disconnect(self.setGCView)
+            self.serverHandler.resMonitor.mainThreadPercent.disconnect(self.setMainThreadView)
+            self.serverHandler.resMonitor.threadGroupPercent.disconnect(self.setThreadGroupView)
+            self.serverHandler.resMonitor.sampled.disconnect(self.resourceHistoryChart.update)
+            self.serverHandler.tickMetrics.tickUpdated.disconnect(self.setTickView)
+            self.serverHandler.tickMetrics.lagSpike.disconnect(self.setLagView)
+            self.serverHandler.tickMetrics.startupFinished.disconnect(self.setStartupView)
+        self.serverHandler = handler
+        handler.classifiedLogOutput.connect(self.syncConsoleView)
+        handler.serverStarting.connect(self.showServerStartingInfo)
+        handler.serverStartupDone.connect(self.showServerStartupDone)
+        handler.invalidOutputDetected.connect(self.showInvalidOutputWarning)
+        handler.serverClosed.connect(self.showErrorHandlerReport)
+        handler.commandQueue.pendingChanged.connect(self.setPendingCommandsView)
+        handler.resMonitor.memPercent.connect(self.setMemView)
+        handler.resMonitor.cpuPercent.connect(self.setCPUView)
+        handler.resMonitor.heapUsage.connect(self.setHeapView)
+        handler.resMonitor.gcPercent.connect(self.setGCView)
+        handler.resMonitor.mainThreadPercent.connect(self.setMainThreadView)
+        handler.resMonitor.threadGroupPercent.connect(self.setThreadGroupView)
+        handler.resMonitor.sampled.connect(self.resourceHistoryChart.update)
+        handler.tickMetrics.tickUpdated.connect(self.setTickView)
+        handler.tickMetrics.lagSpike.connect(self.setLagView)
+        handler.tickMetrics.startupFinished.connect(self.setStartupView)
+        self.resourceHistoryChart.setHistory(handler.resMonitor.history)
+        self.titleLabel.setText(self.tr("终端：") + handler.serverName)
+        self.consoleModel.setBuffer(handler.consoleBuffer)
+        self.serverOutput.scrollToBottom()
+        self.setPendingCommandsView(len(handler.commandQueue))
+        if not handler.isServerRunning():
+            self.setMemView(0.0)
+            self.setCPUView(0.0)
+            self.setHeapView(0.0, 0.0)
+            self.setGCView(0.0)
+            self.setMainThreadView(0.0)
+            self.setThreadGroupView({})
+        # 游戏循环指标是零星的事件，切换服务器时按已记录的值刷新
+        metrics = handler.tickMetrics
+        self.setTickView(metrics.tps, metrics.mspt)
+        self.setLagView(*metrics.lastLag)
+        self.setStartupView(metrics.startupSeconds)
+
+    def memChartScale(self, values) -> float:
+        """内存曲线的满刻度：服务器最大内存，未设置时取记录中的最大值"""
+        if self.serverHandler is not None and self.serverHandler.serverVariables.maxMem:
+            return self.serverHandler.serverVariables.maxMem
+        return max((v for v in values if not isnan(v)), default=0.0)
+
+    def isServerRunning(self) -> bool:
+        return self.serverHandler is not None and self.serverHandler.isServerRunning()
 
     @pyqtSlot(float)
     def setMemView(self, mem):
-        self.serverMemLabel.setText(
-            self.tr("内存：") + str(round(mem, 2)) + serverVariables.memUnit
-        )
-        self.serverMemProgressRing.setValue(int(int(mem) / serverVariables.maxMem * 100))
+        variables = self.serverHandler.serverVariables
+        self.serverMemLabel.setText(self.tr("内存：") + str(round(mem, 2)) + variables.memUnit)
+        if variables.maxMem:
+            self.serverMemProgressRing.setValue(int(int(mem) / variables.maxMem * 100))
 
     @pyqtSlot(float)
     def setCPUView(self, cpuPercent):
         self.serverCPUProgressRing.setValue(int(cpuPercent))
 
-    @pyqtSlot(str)
-    def colorConsoleText(self, serverOutput):
-        readServerProperties()
-        fmt = QTextCharFormat()
-        # fmt: off
-        greenText = ["INFO", "Info", "info", "tip", "tips", "hint", "HINT", "提示"]
-        orangeText = ["WARN", "Warning", "warn", "alert", "ALERT", "Alert", "CAUTION", "Caution", "警告"]
-        redText = ["ERR", "Err", "Fatal", "FATAL", "Critical", "Danger", "DANGER", "错", "at java", "at net", "at oolloo", "Caused by", "at sun"]
-        blueText = ["DEBUG", "Debug", "debug", "调试", "TEST", "Test", "Unknown command", "MCSL2"]
-        color = [QColor(52, 185, 96), QColor(196, 139, 33), QColor(214, 39, 21), QColor(22, 122, 232)]
-        for keyword in greenText:
-            if keyword in serverOutput:
-                fmt.setForeground(QBrush(color[0]))
-        for keyword in orangeText:
-            if keyword in serverOutput:
-                fmt.setForeground(QBrush(color[1]))
-        for keyword in redText:
-            if keyword in serverOutput:
-                fmt.setForeground(QBrush(color[2]))
-        for keyword in blueText:
-            if keyword in serverOutput:
-                fmt.setForeground(QBrush(color[3]))
-        self.serverOutput.mergeCurrentCharFormat(fmt)
-        serverOutput = (
-            serverOutput.replace("[38;2;170;170;170m", "")
-            .replace("[38;2;255;170;0m", "")
-            .replace("[38;2;255;255;255m", "")
-            .replace("[0m", "")
-            .replace("[38;2;255;255;85m", "")
-            .replace("[38;2;255;255;0m", "")
-            .replace("[38;2;255;85;85m", "")
-            .replace("[38;2;255;255;255m", "")
-            .replace("[3m", "")
-            .replace("[m[", "[")
-            .replace("[32m", "")
-            .replace("Preparing spawn area", self.tr("准备生成点区域中"))
-            .replace("main/INFO", self.tr("主类/信息"))
-            .replace("main/WARN", self.tr("主类/警告"))
-            .replace("main/ERROR", self.tr("主类/错误"))
-            .replace("main/FATAL", self.tr("主类/致命错误"))
-            .replace("main/DEBUG", self.tr("主类/调试信息"))
-            .replace("INFO", self.tr("信息"))
-            .replace("WARN", self.tr("警告"))
-            .replace("ERROR", self.tr("错误"))
-            .replace("FATAL", self.tr("致命错误"))
-            .replace("DEBUG", self.tr("调试信息"))
-            .replace("Server thread", self.tr("服务器线程"))
-            .replace("Server-Worker", self.tr("服务器工作进程"))
-            .replace("DEBUG", self.tr("调试信息"))
-            .replace("Forge Version Check", self.tr("Forge版本检查"))
-            .replace("ModLauncher running: args", self.tr("ModLauncher运行中: 参数"))
-            .replace("All chunks are saved", self.tr("所有区块已保存"))
-            .replace("Saving the game (this may take a moment!)", self.tr("保存游戏存档中（可能需要一些时间）"))
-            .replace("Saved the game", self.tr("已保存游戏存档"))
+    @pyqtSlot(float, float)
+    def setHeapView(self, used, committed):
+        """JVM堆已用/已提交，和上面的进程内存对比可看出增长的是堆还是堆外内存"""
+        unit = self.serverHandler.serverVariables.memUnit
+        digits = 1 if unit == "G" else 0
+        self.serverHeapLabel.setText(
+            self.tr("堆：") + f"{used:.{digits}f}/{committed:.{digits}f}{unit}"
         )
-        if "Disabling terminal, you're running in an unsupported environment." in serverOutput:
-            return
-        if "Advanced terminal features are not available in this environment" in serverOutput:
-            return
-        if "Unable to instantiate org.fusesource.jansi.WindowsAnsiOutputStream" in serverOutput:
-            return
-        if "Loading libraries, please wait..." in serverOutput:
-            self.playersList.clear()
-            serverOutput = self.tr("[MCSL2 | 提示]：服务器正在启动，请稍后...\n") + serverOutput
-            InfoBar.info(
-                title=self.tr("提示"),
-                content=self.tr("服务器正在启动，请稍后..."),
-                orient=Qt.Horizontal,
-                isClosable=False,
-                position=InfoBarPosition.TOP,
-                duration=2222,
-                parent=self,
-            )
-        self.serverOutput.appendPlainText(serverOutput)
-        if search(r"(?=.*Done)(?=.*!)", serverOutput):
-            fmt.setForeground(QBrush(color[3]))
-            self.serverOutput.mergeCurrentCharFormat(fmt)
-            try:
-                ip = serverVariables.serverProperties["server-ip"]
-                ip = "127.0.0.1" if ip == "" else ip
-            except KeyError:
-                ip = "127.0.0.1"
-            port = serverVariables.serverProperties.get("server-port", 25565)
-            self.serverOutput.appendPlainText(
-                self.tr("[MCSL2 | 提示]：服务器启动完毕！\n[MCSL2 | 提示]：如果本机开服，IP 地址为") + ip + self.tr("，端口为") + port + self.tr("。\n[MCSL2 | 提示]：如果外网开服,或使用了内网穿透等服务，连接地址为你的相关服务地址。")
-            )
-            InfoBar.success(
-                title=self.tr("提示"),
-                content=self.tr("服务器启动完毕！\n如果本机开服，IP 地址为") + ip + self.tr("，端口为") + port + self.tr("。\n如果外网开服,或使用了内网穿透等服务，连接地址为你的相关服务地址。"),
-                orient=Qt.Horizontal,
-                isClosable=False,
-                position=InfoBarPosition.TOP,
-                duration=5000,
-                parent=self,
-            )
-            self.initQuickMenu_Difficulty()
-        if "�" in serverOutput:
-            fmt.setForeground(QBrush(color[1]))
-            self.serverOutput.mergeCurrentCharFormat(fmt)
-            self.serverOutput.appendPlainText(
-                self.tr("[MCSL2 | 警告]：服务器疑似输出非法字符，也有可能是无法被当前编码解析的字符。请尝试更换编码。")
-            )
-            InfoBar.warning(
-                title=self.tr("警告"),
-                content=self.tr("服务器疑似输出非法字符，也有可能是无法被当前编码解析的字符。\n请尝试更换编码。"),
-                orient=Qt.Horizontal,
-                isClosable=False,
-                position=InfoBarPosition.TOP,
-                duration=2222,
-                parent=self,
+        self.serverHeapProgressBar.setValue(int(used / committed * 100) if committed else 0)
+
+    @pyqtSlot(float)
+    def setGCView(self, gcPercent):
+        self.serverGCLabel.setText(self.tr("GC耗时：") + f"{gcPercent:.1f}%")
+
+    @pyqtSlot(float)
+    def setMainThreadView(self, percent):
+        """主线程占用，接近100%时即使整机CPU占用很低，服务器也已经满载"""
+        self.serverMainThreadLabel.setText(self.tr("主线程：") + f"{percent:.0f}%")
+
+    @pyqtSlot(float, float)
+    def setTickView(self, tps, mspt):
+        """游戏循环的TPS和每tick耗时，比进程CPU占用更直接地反映服务器是否卡顿"""
+        self.serverTPSLabel.setText(self.tr("TPS：") + ("NaN" if isnan(tps) else f"{tps:.1f}"))
+        self.serverTPSProgressBar.setValue(0 if isnan(tps) else int(min(tps / 20.0, 1.0) * 100))
+        self.serverMSPTLabel.setText(
+            self.tr("MSPT：") + ("NaN" if isnan(mspt) else f"{mspt:.1f}ms")
+        )
+
+    @pyqtSlot(int, int)
+    def setLagView(self, ms, ticks):
+        metrics = self.serverHandler.tickMetrics
+        self.serverLagLabel.setText(self.tr("卡顿：") + f"{metrics.lagSpikes}" + self.tr("次"))
+        if metrics.lagSpikes:
+            self.serverLagLabel.setToolTip(
+                self.tr("最近一次落后{ms}毫秒({ticks}tick)，累计落后{total}毫秒").format(
+                    ms=ms, ticks=ticks, total=metrics.lagMsTotal
+                )
             )
-        if self.errorHandler.isChecked():
-            self.errMsg += ServerErrorHandler.detect(serverOutput)
-        if (
-            "logged in with entity id" in serverOutput
-            or " left the game" in serverOutput
-        ):
-            self.recordPlayers(serverOutput)
+        else:
+            self.serverLagLabel.setToolTip("")
+
+    @pyqtSlot(int)
+    def setPendingCommandsView(self, count):
+        """指令队列中还有待发送的指令时，在输入框的提示中显示条数"""
+        self.commandLineEdit.setPlaceholderText(
+            self.tr("在此输入指令，回车或点击右边按钮发送，不需要加/")
+            + (self.tr("（{count}条指令待发送）").format(count=count) if count else "")
+        )
+
+    @pyqtSlot(float)
+    def setStartupView(self, seconds):
+        self.serverTickCardWidget.setToolTip(
+            "" if isnan(seconds) else self.tr("启动用时：") + f"{seconds:.1f}s"
+        )
+
+    @pyqtSlot(dict)
+    def setThreadGroupView(self, groups):
+        """在CPU卡片的提示中列出各线程分组的占用"""
+        busy = sorted(
+            ((group, percent) for group, percent in groups.items() if percent >= 0.5),
+            key=lambda item: item[1],
+            reverse=True,
+        )
+        self.serverCPUCardWidget.setToolTip(
+            "\n".join(f"{group}：{percent:.0f}%" for group, percent in busy[:8])
+        )
+
+    @pyqtSlot(list)
+    def syncConsoleView(self, _):
+        """一批日志写入终端缓冲区后刷新界面"""
+        self.serverOutput.syncModel()
+
+    def showServerStartingInfo(self):
+        InfoBar.info(
+            title=self.tr("提示"),
+            content=self.tr("服务器正在启动，请稍后..."),
+            orient=Qt.Horizontal,
+            isClosable=False,
+            position=InfoBarPosition.TOP,
+            duration=2222,
+            parent=self,
+        )
+
+    @pyqtSlot(str, str)
+    def showServerStartupDone(self, ip: str, port: str):
+        InfoBar.success(
+            title=self.tr("提示"),
+            content=self.tr("服务器启动完毕！\n如果本机开服，IP 地址为") + ip + self.tr("，端口为") + port + self.tr("。\n如果外网开服,或使用了内网穿透等服务，连接地址为你的相关服务地址。"),
+            orient=Qt.Horizontal,
+            isClosable=False,
+            position=InfoBarPosition.TOP,
+            duration=5000,
+            parent=self,
+        )
+        self.initQuickMenu_Difficulty()
+
+    def showInvalidOutputWarning(self):
+        InfoBar.warning(
+            title=self.tr("警告"),
+            content=self.tr("服务器疑似输出非法字符，也有可能是无法被当前编码解析的字符。\n请尝试更换编码。"),
+            orient=Qt.Horizontal,
+            isClosable=False,
+            position=InfoBarPosition.TOP,
+            duration=2222,
+            parent=self,
+        )
 
     def showErrorHandlerReport(self):
         if self.errorHandler.isChecked():
-            if self.errMsg != "":
-                w = MessageBox("错误分析器日志", self.errMsg, self)
+            errMsg = self.serverHandler.serverErrorHandler.report()
+            if errMsg != "":
+                w = MessageBox("错误分析器日志", errMsg, self)
                 w.cancelButton.setParent(None)
                 w.show()
             else:
@@ -472,45 +657,67 @@ class ConsolePage(QWidget):
                 w.cancelButton.setParent(None)
                 w.show()
 
-    def recordPlayers(self, serverOutput: str):
-        if "logged in with entity id" in serverOutput:
-            try:
-                self.playersList.append(str(str(serverOutput).split("INFO]: ")[1].split("[/")[0]))
-                return
-            except Exception:
-                pass
-
-            try:
-                # 若不成功，尝试提取玩家名字
-                # [11:49:05] [Server thread/INFO] [minecraft/PlayerList]: Ares_Connor[/127.0.0.1:63854] logged in with entity id 229 at (7.258252218995321, 65.0, 11.09627995098097)
-                # 提取玩家名字
-                name = serverOutput
-                name = name.split("]: ")[1].split("[/")[0]
-                self.playersList.append(name)
-            except Exception as e:
-                MCSL2Logger.error(
-                    msg=f"extract player name failed\nonRecordPlayers::login {serverOutput}",
-                    exc=e,
-                )
+    def showStartupProfile(self):
+        """当前服务器的启动阶段趋势，以及各服务器的启动耗时对比"""
+        if self.serverHandler is None:
+            return
+        serverNames = ServerConfigRepository().names()
+        StartupProfileBox(self.serverHandler.serverName, serverNames, self).exec()
 
-        elif " left the game" in serverOutput:
-            try:
-                # fmt: off
-                self.playersList.pop(self.playersList.index(str(str(serverOutput).split("INFO]: ")[1].split(" left the game")[0])))
-                return
-            except Exception:
-                pass
+    def showProcessTuning(self):
+        """编辑当前服务器的进程调度设置，服务器运行中时立即应用"""
+        if self.serverHandler is None:
+            return
+        box = ProcessTuningBox(self.serverHandler.serverName, self)
+        if not box.exec():
+            return
+        self.serverHandler.processTuning = box.tuning
+        if self.serverHandler.isServerRunning():
+            self.serverHandler.applyProcessTuning()
 
-            try:  # 若不成功，尝试提取玩家名字
-                # [11:53:52] [Server thread/INFO] [minecraft/DedicatedServer]: Ares_Connor left the game
-                name = serverOutput
-                name = name.split("]: ")[1].split(" left the game")[0].strip()
-                self.playersList.pop(self.playersList.index(name))
-            except Exception as e:
-                MCSL2Logger.error(
-                    msg=f"extract player name failed\nonRecordPlayers::logout {serverOutput}",
-                    exc=e,
-                )
+    def exportResourceHistory(self):
+        """把当前服务器的资源记录导出为CSV"""
+        if self.serverHandler is None or not len(self.serverHandler.resMonitor.history):
+            InfoBar.warning(
+                title=self.tr("无法导出"),
+                content=self.tr("还没有资源记录，请先开启服务器。"),
+                orient=Qt.Horizontal,
+                isClosable=True,
+                position=InfoBarPosition.TOP,
+                duration=3000,
+                parent=self,
+            )
+            return
+        path, _ = QFileDialog.getSaveFileName(
+            self,
+            self.tr("导出资源记录"),
+            f"{self.serverHandler.serverName}-resources.csv",
+            "CSV (*.csv)",
+        )
+        if not path:
+            return
+        try:
+            self.serverHandler.resMonitor.history.exportCSV(path)
+        except OSError as e:
+            InfoBar.error(
+                title=self.tr("导出失败"),
+                content=str(e),
+                orient=Qt.Horizontal,
+                isClosable=True,
+                position=InfoBarPosition.TOP,
+                duration=5000,
+                parent=self,
+            )
+            return
+        InfoBar.success(
+            title=self.tr("已导出"),
+            content=path,
+            orient=Qt.Horizontal,
+            isClosable=True,
+            position=InfoBarPosition.TOP,
+            duration=3000,
+            parent=self,
+        )
 
     def showServerNotOpenMsg(self):
         """弹出服务器未开启提示"""
@@ -525,14 +732,16 @@ class ConsolePage(QWidget):
         w.exec()
 
     def sendCommand(self, command):
-        if ServerHandler().isServerRunning():
-            if command != "":
-                ServerHandler().sendCommand(command=command)
+        if self.isServerRunning():
+            if command == "":
+                pass
+            # 手动输入的指令不去重，重复输入几次就发送几次
+            elif self.serverHandler.sendCommand(command=command, dedupe=False):
                 self.commandLineEdit.clear()
                 GlobalMCSL2Variables.userCommandHistory.append(command)
                 GlobalMCSL2Variables.upT = 0
             else:
-                pass
+                self.showCommandNotQueuedMsg(command)
         else:
             w = MessageBox(
                 title=self.tr("失败"),
@@ -543,6 +752,29 @@ class ConsolePage(QWidget):
             w.cancelButton.deleteLater()
             w.exec()
 
+    def runQuickCommand(self, command):
+        """快捷菜单的指令，服务器开启了RCON时经RCON发送"""
+        if self.isServerRunning():
+            if not self.serverHandler.runCommand(command):
+                self.showCommandNotQueuedMsg(command)
+        else:
+            self.showServerNotOpenMsg()
+
+    def showCommandNotQueuedMsg(self, command: str):
+        """指令没有入队：服务器已停止，或相同的指令正在等待发送"""
+        if not self.isServerRunning():
+            self.showServerNotOpenMsg()
+            return
+        InfoBar.warning(
+            title=self.tr("指令未发送"),
+            content=self.tr("相同的指令正在等待发送，已忽略：") + command,
+            orient=Qt.Horizontal,
+            isClosable=True,
+            position=InfoBarPosition.TOP,
+            duration=3000,
+            parent=self,
+        )
+
     def lineEditChecker(self, text):
         if text != "":
             self.playersControllerBtnEnabled.emit(True)
@@ -551,23 +783,40 @@ class ConsolePage(QWidget):
 
     def getKnownServerPlayers(self) -> str:
         players = self.tr("无玩家加入")
-        if len(self.playersList):
+        if self.serverHandler is not None and len(self.serverHandler.playersList):
             players = ""
-            for player in self.playersList:
+            for player in self.serverHandler.playersList:
                 players += f"{player}\n"
         else:
             pass
+        status = self.serverHandler.status if self.serverHandler is not None else None
+        if status is not None and status.online:
+            players = (
+                self.tr("在线 {online}/{max}，延迟 {latency}毫秒\n{motd}\n\n").format(
+                    online=status.playersOnline,
+                    max=status.playersMax,
+                    latency=f"{status.latency:.0f}",
+                    motd=status.motd,
+                )
+                + players
+            )
         return players
 
     def initQuickMenu_Difficulty(self):
         """快捷菜单-服务器游戏难度"""
         textDiffiultyList = ["peaceful", "easy", "normal", "hard"]
-        if ServerHandler().isServerRunning():
+        if self.isServerRunning():
             try:
-                self.difficulty.setCurrentIndex(int(serverVariables.serverProperties["difficulty"]))
+                self.difficulty.setCurrentIndex(
+                    int(self.serverHandler.serverVariables.serverProperties["difficulty"])
+                )
             except ValueError:
                 self.difficulty.setCurrentIndex(
-                    int(textDiffiultyList.index(serverVariables.serverProperties["difficulty"]))
+                    int(
+                        textDiffiultyList.index(
+                            self.serverHandler.serverVariables.serverProperties["difficulty"]
+                        )
+                    )
                 )
             except Exception:
                 pass
@@ -576,11 +825,11 @@ class ConsolePage(QWidget):
 
     def runQuickMenu_Difficulty(self):
         textDiffiultyList = ["peaceful", "easy", "normal", "hard"]
-        self.sendCommand(f"difficulty {textDiffiultyList[self.difficulty.currentIndex()]}")
+        self.runQuickCommand(f"difficulty {textDiffiultyList[self.difficulty.currentIndex()]}")
 
     def initQuickMenu_GameMode(self):
         """快捷菜单-游戏模式"""
-        if ServerHandler().isServerRunning():
+        if self.isServerRunning():
             gamemodeWidget = playersController()
             gamemodeWidget.mode.addItems(
                 [self.tr("生存"), self.tr("创造"), self.tr("冒险"), self.tr("旁观")]
@@ -607,11 +856,11 @@ class ConsolePage(QWidget):
 
     def runQuickMenu_GameMode(self, gamemode: int, player: str):
         gameModeList = ["survival", "creative", "adventure", "spectator"]
-        ServerHandler().sendCommand(command=f"gamemode {gameModeList[gamemode]} {player}")
+        self.runQuickCommand(f"gamemode {gameModeList[gamemode]} {player}")
 
     def initQuickMenu_WhiteList(self):
         """快捷菜单-白名单"""
-        if ServerHandler().isServerRunning():
+        if self.isServerRunning():
             whiteListWidget = playersController()
             whiteListWidget.mode.addItems([self.tr("添加(add)"), self.tr("删除(remove)")])
             whiteListWidget.who.textChanged.connect(
@@ -642,11 +891,11 @@ class ConsolePage(QWidget):
 
     def runQuickMenu_WhiteList(self, mode: int, player: str):
         whiteListMode = ["add", "remove"]
-        ServerHandler().sendCommand(command=f"whitelist {whiteListMode[mode]} {player}")
+        self.runQuickCommand(f"whitelist {whiteListMode[mode]} {player}")
 
     def initQuickMenu_Operator(self):
         """快捷菜单-服务器管理员"""
-        if ServerHandler().isServerRunning():
+        if self.isServerRunning():
             opWidget = playersController()
             opWidget.mode.addItems([self.tr("添加"), self.tr("删除")])
             opWidget.mode.setCurrentIndex(0)
@@ -668,11 +917,11 @@ class ConsolePage(QWidget):
 
     def runQuickMenu_Operator(self, mode: int, player: str):
         commandPrefixList = ["op", "deop"]
-        ServerHandler().sendCommand(command=f"{commandPrefixList[mode]} {player}")
+        self.runQuickCommand(f"{commandPrefixList[mode]} {player}")
 
     def initQuickMenu_Kick(self):
         """快捷菜单-踢人"""
-        if ServerHandler().isServerRunning():
+        if self.isServerRunning():
             kickWidget = playersController()
             kickWidget.mode.setParent(None)
             kickWidget.mode.deleteLater()
@@ -691,11 +940,11 @@ class ConsolePage(QWidget):
             self.showServerNotOpenMsg()
 
     def runQuickMenu_Kick(self, player: str):
-        ServerHandler().sendCommand(command=f"kick {player}")
+        self.runQuickCommand(f"kick {player}")
 
     def initQuickMenu_BanOrPardon(self):
         """快捷菜单-封禁或解禁玩家"""
-        if ServerHandler().isServerRunning():
+        if self.isServerRunning():
             banOrPardonWidget = playersController()
             banOrPardonWidget.mode.addItems([self.tr("封禁"), self.tr("解禁")])
             banOrPardonWidget.mode.setCurrentIndex(0)
@@ -720,19 +969,19 @@ class ConsolePage(QWidget):
 
     def runQuickMenu_BanOrPardon(self, mode: int, player: str):
         commandPrefixList = ["ban", "pardon"]
-        ServerHandler().sendCommand(command=f"{commandPrefixList[mode]} {player}")
+        self.runQuickCommand(f"{commandPrefixList[mode]} {player}")
 
     def runQuickMenu_StopServer(self):
-        if ServerHandler().isServerRunning():
+        if self.isServerRunning():
             box = MessageBox(self.tr("正常关闭服务器"), self.tr("你确定要关闭服务器吗？"), self)
-            box.yesSignal.connect(ServerHandler().stopServer)
+            box.yesSignal.connect(self.serverHandler.stopServer)
             box.exec()
         else:
             self.showServerNotOpenMsg()
 
     def runQuickMenu_KillServer(self):
         """快捷菜单-强制关闭服务器"""
-        if ServerHandler().isServerRunning():
+        if self.isServerRunning():
             w = MessageBox(
                 self.tr("强制关闭服务器"),
                 self.tr("确定要强制关闭服务器吗？\n有可能导致数据丢失！\n请确保存档已经保存！"),
@@ -740,7 +989,7 @@ class ConsolePage(QWidget):
             )
             w.yesButton.setText(self.tr("算了"))
             w.cancelButton.setText(self.tr("强制关闭"))
-            w.cancelSignal.connect(lambda: ServerHandler().haltServer())
+            w.cancelSignal.connect(self.serverHandler.haltServer)
             w.cancelSignal.connect(
                 lambda: InfoBar.warning(
                     title=self.tr("警告"),
@@ -14,7 +14,7 @@
 Manage exists Minecraft servers.
 """
 
-from json import dump, loads, dumps
+from json import dump
 from os import getcwd, rename, path as osp, remove
 from shutil import copy, rmtree
 
@@ -53,6 +53,7 @@ from qfluentwidgets import (
 )
 
 from MCSL2Lib.Controllers import javaDetector
+from MCSL2Lib.Controllers.serverConfigRepository import ServerConfigRepository
 from MCSL2Lib.Controllers.serverController import ServerHelper
 from MCSL2Lib.Controllers.serverInstaller import ForgeInstaller
 from MCSL2Lib.Controllers.settingsController import cfg
@@ -63,7 +64,6 @@ from MCSL2Lib.Widgets.serverManagerWidget import singleServerManager
 from MCSL2Lib.singleton import Singleton
 
 # from MCSL2Lib.Controllers.interfaceController import ChildStackedWidget
-from MCSL2Lib.utils import readGlobalServerConfig
 from MCSL2Lib.variables import GlobalMCSL2Variables, EditServerVariables
 from MCSL2Lib.utils import MCSL2Logger
 
@@ -656,21 +656,19 @@ class ServerManagerPage(QWidget):
         """刷新服务器列表主逻辑"""
         self.releaseMemory()
         # 读取全局设置
-        globalConfig = readGlobalServerConfig()
-        if len(globalConfig):
+        servers = ServerConfigRepository().records()
+        if len(servers):
             # 添加新的
-            for i in range(len(globalConfig)):
+            for i, server in enumerate(servers):
                 self.tmpSingleServerWidget = singleServerManager(self.serversSmoothScrollArea)
                 self.tmpSingleServerWidget.mem.setText(
-                    f"{globalConfig[i]['min_memory']}{globalConfig[i]['memory_unit']}~{globalConfig[i]['max_memory']}{globalConfig[i]['memory_unit']}"
+                    f"{server.minMem}{server.memUnit}~{server.maxMem}{server.memUnit}"
                 )
-                self.tmpSingleServerWidget.coreFileName.setText(
-                    f"{globalConfig[i]['core_file_name']}"
-                )
-                self.tmpSingleServerWidget.javaPath.setText(f"{globalConfig[i]['java_path']}")
-                self.tmpSingleServerWidget.serverName.setText(f"{globalConfig[i]['name']}")
+                self.tmpSingleServerWidget.coreFileName.setText(f"{server.coreFileName}")
+                self.tmpSingleServerWidget.javaPath.setText(f"{server.javaPath}")
+                self.tmpSingleServerWidget.serverName.setText(f"{server.name}")
                 self.tmpSingleServerWidget.Icon.setPixmap(
-                    QPixmap(f":/built-InIcons/{globalConfig[i]['icon']}")
+                    QPixmap(f":/built-InIcons/{server.icon}")
                 )
                 self.tmpSingleServerWidget.Icon.setFixedSize(QSize(60, 60))
 
@@ -707,8 +705,8 @@ class ServerManagerPage(QWidget):
     ##################
     def deleteServer_Step1(self, index):
         """删除服务器步骤1，询问是否删除"""
-        globalConfig: list = readGlobalServerConfig()
-        title = self.tr('是否要删除服务器"') + globalConfig[index]["name"] + self.tr('"?')
+        serverName = ServerConfigRepository().at(index).name
+        title = self.tr('是否要删除服务器"') + serverName + self.tr('"?')
         content = self.tr("此操作是不可逆的！你确定这么做吗？")
         w = MessageBox(title, content, self)
         w.yesButton.setText(self.tr("取消"))
@@ -723,11 +721,11 @@ class ServerManagerPage(QWidget):
 
     def deleteServer_Step2(self, index):
         """删除服务器步骤2：输入确认"""
-        globalConfig: list = readGlobalServerConfig()
-        title = self.tr('你真的要删除服务器"') + globalConfig[index]["name"] + self.tr('"?')
+        serverName = ServerConfigRepository().at(index).name
+        title = self.tr('你真的要删除服务器"') + serverName + self.tr('"?')
         content = (
             self.tr('此操作是不可逆的！它会失去很久，很久！\n如果真的要删除，请在下方输入框内输入"')
-            + globalConfig[index]["name"]
+            + serverName
             + self.tr('"，然后点击“删除”按钮：')
         )
         w2 = MessageBox(title, content, self)
@@ -742,10 +740,10 @@ class ServerManagerPage(QWidget):
         confirmLineEdit = LineEdit(w2)
         confirmLineEdit.textChanged.connect(
             lambda: self.compareDeleteServerName(
-                name=globalConfig[index]["name"], LineEditText=confirmLineEdit.text()
+                name=serverName, LineEditText=confirmLineEdit.text()
             )
         )
-        confirmLineEdit.setPlaceholderText(self.tr('在此输入"') + globalConfig[index]["name"] + '"')
+        confirmLineEdit.setPlaceholderText(self.tr('在此输入"') + serverName + '"')
         self.deleteBtnEnabled.connect(w2.cancelButton.setEnabled)
         w2.cancelSignal.connect(lambda: self.deleteServer_Step3(index=index))
         w2.textLayout.addWidget(confirmLineEdit)
@@ -753,8 +751,7 @@ class ServerManagerPage(QWidget):
 
     def deleteServer_Step3(self, index):
         """删除服务器步骤3：弹窗提示正在删除"""
-        globalConfig: list = readGlobalServerConfig()
-        delServerName = globalConfig[index]["name"]
+        delServerName = ServerConfigRepository().at(index).name
 
         self.deletingServerStateToolTip = StateToolTip(
             self.tr("删除服务器"), self.tr("请稍后，正在删除..."), self
@@ -789,76 +786,76 @@ class ServerManagerPage(QWidget):
     ##################
     def initEditServerInterface(self, index):
         """初始化编辑服务器界面"""
-        globalConfig: list = readGlobalServerConfig()
+        config = ServerConfigRepository().at(index).toDict()
         self.stackedWidget.setCurrentIndex(1)
         self.javaFindWorkThreadFactory.create().start()
         self.serverIndex = index
         # 自动填充旧配置。在下方初始化变量之前不应调用任何的editServerVariables的属性
         self.editServerSubtitleLabel.setText(
-            self.tr("编辑服务器") + f"-{globalConfig[index]['name']}"
+            self.tr("编辑服务器") + f"-{config['name']}"
         )
-        self.editJavaTextEdit.setText(globalConfig[index]["java_path"])
-        self.editMinMemLineEdit.setText(str(globalConfig[index]["min_memory"]))
-        self.editMaxMemLineEdit.setText(str(globalConfig[index]["max_memory"]))
+        self.editJavaTextEdit.setText(config["java_path"])
+        self.editMinMemLineEdit.setText(str(config["min_memory"]))
+        self.editMaxMemLineEdit.setText(str(config["max_memory"]))
         self.editOutputDeEncodingComboBox.setCurrentIndex(
-            editServerVariables.consoleDeEncodingList.index(globalConfig[index]["output_decoding"])
+            editServerVariables.consoleDeEncodingList.index(config["output_decoding"])
         )
         self.editInputDeEncodingComboBox.setCurrentIndex(
-            editServerVariables.consoleDeEncodingList.index(globalConfig[index]["input_encoding"])
+            editServerVariables.consoleDeEncodingList.index(config["input_encoding"])
         )
         self.editMemUnitComboBox.setCurrentIndex(
-            editServerVariables.memUnitList.index(globalConfig[index]["memory_unit"])
+            editServerVariables.memUnitList.index(config["memory_unit"])
         )
-        self.coreLineEdit.setText(globalConfig[index]["core_file_name"])
+        self.coreLineEdit.setText(config["core_file_name"])
         totalJVMArg = ""
-        for arg in globalConfig[index]["jvm_arg"]:
+        for arg in config["jvm_arg"]:
             totalJVMArg += f"{arg} "
         totalJVMArg = totalJVMArg.strip()
         self.JVMArgPlainTextEdit.setPlainText(totalJVMArg)
-        self.editServerNameLineEdit.setText(globalConfig[index]["name"])
+        self.editServerNameLineEdit.setText(config["name"])
 
         self.editServerPixmapLabel.setPixmap(
-            QPixmap(f":/built-InIcons/{globalConfig[index]['icon']}")
+            QPixmap(f":/built-InIcons/{config['icon']}")
         )
         self.editServerIcon.setCurrentIndex(
-            editServerVariables.iconsFileNameList.index(globalConfig[index]["icon"])
+            editServerVariables.iconsFileNameList.index(config["icon"])
         )
         self.editServerPixmapLabel.setFixedSize(QSize(60, 60))
 
         """初始化变量"""
-        editServerVariables.oldMinMem = editServerVariables.minMem = globalConfig[index][
+        editServerVariables.oldMinMem = editServerVariables.minMem = config[
             "min_memory"
         ]
-        editServerVariables.oldMaxMem = editServerVariables.maxMem = globalConfig[index][
+        editServerVariables.oldMaxMem = editServerVariables.maxMem = config[
             "max_memory"
         ]
-        editServerVariables.oldCoreFileName = editServerVariables.coreFileName = globalConfig[
-            index
-        ]["core_file_name"]
+        editServerVariables.oldCoreFileName = editServerVariables.coreFileName = config[
+            "core_file_name"
+        ]
         editServerVariables.oldSelectedJavaPath = (
             editServerVariables.selectedJavaPath
-        ) = globalConfig[index]["java_path"]
-        editServerVariables.oldMemUnit = editServerVariables.memUnit = globalConfig[index][
+        ) = config["java_path"]
+        editServerVariables.oldMemUnit = editServerVariables.memUnit = config[
             "memory_unit"
         ]
-        editServerVariables.oldJVMArg = editServerVariables.oldJVMArg = globalConfig[index][
+        editServerVariables.oldJVMArg = editServerVariables.oldJVMArg = config[
             "jvm_arg"
         ]
-        editServerVariables.oldServerName = editServerVariables.serverName = globalConfig[index][
+        editServerVariables.oldServerName = editServerVariables.serverName = config[
             "name"
         ]
         editServerVariables.oldConsoleOutputDeEncoding = (
             editServerVariables.consoleOutputDeEncoding
-        ) = globalConfig[index]["output_decoding"]
+        ) = config["output_decoding"]
         editServerVariables.oldConsoleInputDeEncoding = (
             editServerVariables.consoleInputDeEncoding
-        ) = globalConfig[index]["input_encoding"]
-        editServerVariables.oldIcon = editServerVariables.icon = globalConfig[index]["icon"]
+        ) = config["input_encoding"]
+        editServerVariables.oldIcon = editServerVariables.icon = config["icon"]
         try:
-            editServerVariables.oldServerType = editServerVariables.serverType = globalConfig[
-                index
-            ]["server_type"]
-            editServerVariables.oldExtraData = editServerVariables.extraData = globalConfig[index][
+            editServerVariables.oldServerType = editServerVariables.serverType = config[
+                "server_type"
+            ]
+            editServerVariables.oldExtraData = editServerVariables.extraData = config[
                 "extra_data"
             ]
         except Exception:
@@ -1338,20 +1335,25 @@ class ServerManagerPage(QWidget):
             if arg == "" or arg == " ":
                 editServerVariables.jvmArg.pop(editServerVariables.jvmArg.index(arg))
 
-        serverConfig = {
-            "name": editServerVariables.serverName,
-            "core_file_name": editServerVariables.coreFileName,
-            "java_path": editServerVariables.selectedJavaPath,
-            "min_memory": editServerVariables.minMem,
-            "max_memory": editServerVariables.maxMem,
-            "memory_unit": editServerVariables.memUnit,
-            "jvm_arg": editServerVariables.jvmArg,
-            "output_decoding": editServerVariables.consoleOutputDeEncoding,
-            "input_encoding": editServerVariables.consoleInputDeEncoding,
-            "icon": editServerVariables.icon,
-            "server_type": editServerVariables.serverType,
-            "extra_data": editServerVariables.extraData,
-        }
+        # 在旧配置的基础上修改，保留编辑页不认识的键(如core_md5)；必须在改名之前读取
+        oldRecord = ServerConfigRepository().get(editServerVariables.oldServerName)
+        serverConfig = {} if oldRecord is None else oldRecord.toDict()
+        serverConfig.update(
+            {
+                "name": editServerVariables.serverName,
+                "core_file_name": editServerVariables.coreFileName,
+                "java_path": editServerVariables.selectedJavaPath,
+                "min_memory": editServerVariables.minMem,
+                "max_memory": editServerVariables.maxMem,
+                "memory_unit": editServerVariables.memUnit,
+                "jvm_arg": editServerVariables.jvmArg,
+                "output_decoding": editServerVariables.consoleOutputDeEncoding,
+                "input_encoding": editServerVariables.consoleInputDeEncoding,
+                "icon": editServerVariables.icon,
+                "server_type": editServerVariables.serverType,
+                "extra_data": editServerVariables.extraData,
+            }
+        )
         # 复制核心
         try:
             if editServerVariables.coreFileName != editServerVariables.oldCoreFileName:
@@ -1403,47 +1405,9 @@ class ServerManagerPage(QWidget):
             exitCode = 1
             exit1Msg += f"\n{e}"
 
-        # 写入全局配置
+        # 写入服务器配置
         try:
-            with open(
-                r"MCSL2/MCSL2_ServerList.json", "r", encoding="utf-8"
-            ) as globalServerListFile:
-                # old
-                globalServerList = loads(globalServerListFile.read())
-
-            with open(
-                r"MCSL2/MCSL2_ServerList.json", "w+", encoding="utf-8"
-            ) as newGlobalServerListFile:
-                # 添加新的
-                globalServerList["MCSLServerList"].pop(self.serverIndex)
-                globalServerList["MCSLServerList"].insert(0, serverConfig)
-                newGlobalServerListFile.write(dumps(globalServerList, indent=4))
-            exitCode = 0
-        except Exception as e:
-            exitCode = 1
-            exit1Msg += f"\n{e}"
-
-        # 写入单独配置
-        try:
-            if not cfg.get(cfg.onlySaveGlobalServerConfig):
-                with open(
-                    f"Servers//{editServerVariables.serverName}//MCSL2ServerConfig.json",
-                    "w+",
-                    encoding="utf-8",
-                ) as serverListFile:
-                    serverListFile.write(dumps(serverConfig, indent=4))
-            else:
-                InfoBar.info(
-                    title=self.tr("功能提醒"),
-                    content=self.tr(
-                        "您在设置中开启了“只保存全局服务器设置”。\n将不会保存单独服务器设置。\n这有可能导致服务器迁移较为繁琐。"
-                    ),
-                    orient=Qt.Horizontal,
-                    isClosable=True,
-                    position=InfoBarPosition.TOP,
-                    duration=3000,
-                    parent=self,
-                )
+            ServerConfigRepository().update(editServerVariables.oldServerName, serverConfig)
             exitCode = 0
         except Exception as e:
             exitCode = 1
@@ -1568,15 +1532,7 @@ class DeleteServerThread(QThread):
         exit1Msg = ""
         # 删配置
         try:
-            with open(
-                r"MCSL2/MCSL2_ServerList.json", "r", encoding="utf-8"
-            ) as RglobalServerListFile:
-                globalServerList = loads(RglobalServerListFile.read())
-            globalServerList["MCSLServerList"].pop(self.index)
-            with open(
-                r"MCSL2/MCSL2_ServerList.json", "w+", encoding="utf-8"
-            ) as WglobalServerConfigFile:
-                WglobalServerConfigFile.write(dumps(globalServerList, indent=4))
+            ServerConfigRepository().remove(self.delServerName)
         except Exception as e:
             self.exitCode.emit(1)
             exit1Msg += f"\n{e}"
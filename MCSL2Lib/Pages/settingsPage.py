@@ -161,6 +161,41 @@ class SettingsPage(QWidget):
             configItem=cfg.sendStopInsteadOfKill,
             parent=self.serverSettingsGroup,
         )
+        self.stopTimeoutSeconds = RangeSettingCard(
+            configItem=cfg.stopTimeoutSeconds,
+            icon=FIF.POWER_BUTTON,
+            title=self.tr("安全关闭超时(秒)"),
+            content=self.tr("发送stop后超过此时间仍未关闭，将终止服务器进程。存档较大时请适当调高。"),
+            parent=self.serverSettingsGroup,
+        )
+        self.commandsPerTick = RangeSettingCard(
+            configItem=cfg.commandsPerTick,
+            icon=FIF.COMMAND_PROMPT,
+            title=self.tr("每tick最多发送的指令数"),
+            content=self.tr("批量发送指令时按此速度排队写入，重复的待发送指令只会发送一次。"),
+            parent=self.serverSettingsGroup,
+        )
+        self.enableAppCDS = SwitchSettingCard(
+            icon=FIF.SPEED_OFF,
+            title=self.tr("AppCDS启动加速"),
+            content=self.tr("正常关闭后生成类数据共享归档，之后启动时复用以加快启动。需Java 13+。"),
+            configItem=cfg.enableAppCDS,
+            parent=self.serverSettingsGroup,
+        )
+        self.checkMemoryBeforeLaunch = SwitchSettingCard(
+            icon=FIF.PIE_SINGLE,
+            title=self.tr("启动前检查内存"),
+            content=self.tr("估算所有运行中的服务器的内存占用，内存不足时提示降低最大内存。"),
+            configItem=cfg.checkMemoryBeforeLaunch,
+            parent=self.serverSettingsGroup,
+        )
+        self.serverStatusPollInterval = RangeSettingCard(
+            configItem=cfg.serverStatusPollInterval,
+            icon=FIF.PEOPLE,
+            title=self.tr("服务器状态刷新间隔(秒)"),
+            content=self.tr("按此间隔查询运行中的服务器的在线人数、MOTD和延迟。"),
+            parent=self.serverSettingsGroup,
+        )
         self.restartServerWhenCrashed = SwitchSettingCard(
             icon=FIF.HISTORY,
             title=self.tr("崩溃自动重启"),
@@ -168,10 +203,31 @@ class SettingsPage(QWidget):
             configItem=cfg.restartServerWhenCrashed,
             parent=self.serverSettingsGroup,
         )
+        self.crashLoopMaxCrashes = RangeSettingCard(
+            configItem=cfg.crashLoopMaxCrashes,
+            icon=FIF.CANCEL,
+            title=self.tr("崩溃循环判定次数"),
+            content=self.tr("在下方的时间内崩溃达到此次数后，不再自动重启。"),
+            parent=self.serverSettingsGroup,
+        )
+        self.crashLoopWindowMinutes = RangeSettingCard(
+            configItem=cfg.crashLoopWindowMinutes,
+            icon=FIF.STOP_WATCH,
+            title=self.tr("崩溃循环判定时间(分钟)"),
+            content=self.tr("自动重启的等待时间从5秒起逐次翻倍，最长5分钟。"),
+            parent=self.serverSettingsGroup,
+        )
         self.serverSettingsGroup.addSettingCard(self.autoRunLastServer)
         self.serverSettingsGroup.addSettingCard(self.acceptAllMojangEula)
         self.serverSettingsGroup.addSettingCard(self.sendStopInsteadOfKill)
+        self.serverSettingsGroup.addSettingCard(self.stopTimeoutSeconds)
+        self.serverSettingsGroup.addSettingCard(self.commandsPerTick)
+        self.serverSettingsGroup.addSettingCard(self.serverStatusPollInterval)
+        self.serverSettingsGroup.addSettingCard(self.enableAppCDS)
+        self.serverSettingsGroup.addSettingCard(self.checkMemoryBeforeLaunch)
         self.serverSettingsGroup.addSettingCard(self.restartServerWhenCrashed)
+        self.serverSettingsGroup.addSettingCard(self.crashLoopMaxCrashes)
+        self.serverSettingsGroup.addSettingCard(self.crashLoopWindowMinutes)
         self.settingsLayout.addWidget(self.serverSettingsGroup)
 
         # Configure server
@@ -191,13 +247,6 @@ class SettingsPage(QWidget):
             ],
             parent=self.configureServerSettingsGroup,
         )
-        self.onlySaveGlobalServerConfig = SwitchSettingCard(
-            icon=FIF.PASTE,
-            title=self.tr("只保存全局服务器设置"),
-            content=self.tr("这可能会导致迁移服务器有些许麻烦。"),
-            configItem=cfg.onlySaveGlobalServerConfig,
-            parent=self.configureServerSettingsGroup,
-        )
         self.clearAllNewServerConfigInProgram = SwitchSettingCard(
             icon=FIF.REMOVE_FROM,
             title=self.tr("新建服务器后立刻清空相关设置项"),
@@ -206,7 +255,6 @@ class SettingsPage(QWidget):
             parent=self.configureServerSettingsGroup,
         )
         self.configureServerSettingsGroup.addSettingCard(self.newServerType)
-        self.configureServerSettingsGroup.addSettingCard(self.onlySaveGlobalServerConfig)
         self.configureServerSettingsGroup.addSettingCard(self.clearAllNewServerConfigInProgram)
         self.settingsLayout.addWidget(self.configureServerSettingsGroup)
 
@@ -262,7 +310,12 @@ class SettingsPage(QWidget):
             icon=FIF.CODE,
             title=self.tr("控制台输出编码"),
             content=self.tr("优先级低于服务器配置设置。"),
-            texts=[self.tr("UTF-8"), self.tr("GB18030"), self.tr("ANSI(推荐)")],
+            texts=[
+                self.tr("自动检测(推荐)"),
+                self.tr("UTF-8"),
+                self.tr("GB18030"),
+                self.tr("ANSI"),
+            ],
             parent=self.consoleSettingsGroup,
         )
         self.inputDeEncoding = ComboBoxSettingCard(
@@ -295,7 +348,35 @@ class SettingsPage(QWidget):
         self.consoleSettingsGroup.addSettingCard(self.outputDeEncoding)
         self.consoleSettingsGroup.addSettingCard(self.inputDeEncoding)
         self.consoleSettingsGroup.addSettingCard(self.quickMenu)
+        self.consoleBufferLines = RangeSettingCard(
+            configItem=cfg.consoleBufferLines,
+            icon=FIF.ALIGNMENT,
+            title=self.tr("终端最多显示的行数"),
+            content=self.tr("下次启动服务器时生效，更早的日志会被移出内存。"),
+            parent=self.consoleSettingsGroup,
+        )
+        self.spillConsoleToDisk = SwitchSettingCard(
+            icon=FIF.SAVE,
+            title=self.tr("将移出终端的日志保存到文件"),
+            content=self.tr("保存在MCSL2/ConsoleLogs文件夹，下次启动该服务器时清空。"),
+            configItem=cfg.spillConsoleToDisk,
+            parent=self.consoleSettingsGroup,
+        )
+        self.resourceMonitorMemMode = ComboBoxSettingCard(
+            configItem=cfg.resourceMonitorMemMode,
+            icon=FIF.SPEED_HIGH,
+            title=self.tr("服务器内存统计方式"),
+            content=self.tr("下次启动服务器时生效。USS更准确，但采样开销较大。"),
+            texts=[
+                self.tr("RSS(开销小，推荐)"),
+                self.tr("USS(独占内存，更准确)"),
+            ],
+            parent=self.consoleSettingsGroup,
+        )
         self.consoleSettingsGroup.addSettingCard(self.clearConsoleWhenStopServer)
+        self.consoleSettingsGroup.addSettingCard(self.consoleBufferLines)
+        self.consoleSettingsGroup.addSettingCard(self.spillConsoleToDisk)
+        self.consoleSettingsGroup.addSettingCard(self.resourceMonitorMemMode)
         self.settingsLayout.addWidget(self.consoleSettingsGroup)
 
         # Software
@@ -0,0 +1,139 @@
+#     Copyright 2023, MCSL Team, mailto:lxhtt@vip.qq.com
+#
+#     Part of "MCSL2", a simple and multifunctional Minecraft server launcher.
+#
+#     Licensed under the GNU General Public License, Version 3.0, with our
+#     additional agreements. (the "License");
+#     you may not use this file except in compliance with the License.
+#     You may obtain a copy of the License at
+#
+#        https://github.com/MCSLTeam/MCSL2/raw/master/LICENSE
+#
+################################################################################
+"""
+Virtualized console log view, only lays out the rows on screen.
+"""
+
+from typing import Dict, Optional
+
+from PyQt5.QtCore import QAbstractListModel, QModelIndex, Qt
+from PyQt5.QtGui import QBrush, QFontDatabase, QKeySequence, QPainter
+from PyQt5.QtWidgets import QAbstractItemView, QApplication, QListView
+from qfluentwidgets import isDarkTheme, qconfig
+
+from MCSL2Lib.Controllers.consoleLogBuffer import ConsoleLogBuffer
+
+
+class ConsoleLogModel(QAbstractListModel):
+    """
+    把ConsoleLogBuffer包装成列表模型。\n
+    日志在写入缓冲区时已由ServerHandler分类，这里只按行读取文本和颜色等级。
+    """
+
+    def __init__(self, levelBrushes: Dict[int, QBrush], parent=None):
+        super().__init__(parent)
+        self.levelBrushes = levelBrushes
+        self._buffer: Optional[ConsoleLogBuffer] = None
+        self._rows = 0
+        self._evicted = 0
+
+    def setBuffer(self, buffer: Optional[ConsoleLogBuffer]):
+        """切换显示的缓冲区"""
+        self.beginResetModel()
+        self._buffer = buffer
+        self._rows = len(buffer) if buffer is not None else 0
+        self._evicted = buffer.evictedLines if buffer is not None else 0
+        self.endResetModel()
+
+    def sync(self):
+        """缓冲区追加或淘汰了行之后调用，只通知变化的部分"""
+        if self._buffer is None:
+            return
+        removed = min(self._buffer.evictedLines - self._evicted, self._rows)
+        self._evicted = self._buffer.evictedLines
+        if removed > 0:
+            self.beginRemoveRows(QModelIndex(), 0, removed - 1)
+            self._rows -= removed
+            self.endRemoveRows()
+        count = len(self._buffer)
+        if count > self._rows:
+            self.beginInsertRows(QModelIndex(), self._rows, count - 1)
+            self._rows = count
+            self.endInsertRows()
+
+    def rowCount(self, parent=QModelIndex()) -> int:
+        return 0 if parent.isValid() else self._rows
+
+    def data(self, index: QModelIndex, role=Qt.DisplayRole):
+        if self._buffer is None or not 0 <= index.row() < min(self._rows, len(self._buffer)):
+            return None
+        if role == Qt.DisplayRole:
+            return self._buffer.text(index.row())
+        if role == Qt.ForegroundRole:
+            return self.levelBrushes.get(self._buffer.level(index.row()), None)
+        return None
+
+
+class ConsoleLogView(QListView):
+    """
+    终端日志视图。\n
+    所有行等高，QListView只会为屏幕上可见的行布局和绘制，行数再多滚动也不会变慢。
+    """
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.placeholderText = ""
+        self.setUniformItemSizes(True)
+        self.setLayoutMode(QListView.Batched)
+        self.setBatchSize(200)
+        self.setSelectionMode(QAbstractItemView.ExtendedSelection)
+        self.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.setVerticalScrollMode(QAbstractItemView.ScrollPerPixel)
+        self.setFont(QFontDatabase.systemFont(QFontDatabase.FixedFont))
+        self.setTextElideMode(Qt.ElideNone)
+        self.updateStyle()
+        qconfig.themeChanged.connect(self.updateStyle)
+
+    def updateStyle(self):
+        textColor = "white" if isDarkTheme() else "black"
+        self.setStyleSheet(
+            f"ConsoleLogView {{background: transparent; border: none; color: {textColor};}}"
+        )
+
+    def setPlaceholderText(self, text: str):
+        self.placeholderText = text
+        self.viewport().update()
+
+    def isAtBottom(self) -> bool:
+        scrollBar = self.verticalScrollBar()
+        return scrollBar.value() >= scrollBar.maximum()
+
+    def syncModel(self):
+        """同步模型，原本停在底部时自动滚动到最新一行"""
+        atBottom = self.isAtBottom()
+        self.model().sync()
+        if atBottom:
+            self.scrollToBottom()
+
+    def copySelection(self):
+        rows = sorted(index.row() for index in self.selectedIndexes())
+        QApplication.clipboard().setText(
+            "\n".join(self.model().index(row).data() or "" for row in rows)
+        )
+
+    def keyPressEvent(self, e):
+        if e.matches(QKeySequence.Copy):
+            self.copySelection()
+            return
+        super().keyPressEvent(e)
+
+    def paintEvent(self, e):
+        super().paintEvent(e)
+        if self.placeholderText and (self.model() is None or not self.model().rowCount()):
+            painter = QPainter(self.viewport())
+            painter.setPen(self.palette().placeholderText().color())
+            painter.drawText(
+                self.viewport().rect().adjusted(4, 4, -4, -4),
+                Qt.AlignLeft | Qt.AlignTop,
+                self.placeholderText,
+            )
@@ -0,0 +1,134 @@
+#     Copyright 2023, MCSL Team, mailto:lxhtt@vip.qq.com
+#
+#     Part of "MCSL2", a simple and multifunctional Minecraft server launcher.
+#
+#     Licensed under the GNU General Public License, Version 3.0, with our
+#     additional agreements. (the "License");
+#     you may not use this file except in compliance with the License.
+#     You may obtain a copy of the License at
+#
+#        https://github.com/MCSLTeam/MCSL2/raw/master/LICENSE
+#
+################################################################################
+"""
+Dialog for editing a server's process priority, I/O class and CPU affinity.
+"""
+
+from PyQt5.QtWidgets import QFormLayout
+from qfluentwidgets import (
+    BodyLabel,
+    CaptionLabel,
+    ComboBox,
+    LineEdit,
+    MessageBoxBase,
+    SpinBox,
+    SubtitleLabel,
+)
+
+from MCSL2Lib.Controllers.processTuningController import (
+    AFFINITY_MODES,
+    IO_CLASSES,
+    CoreAllocator,
+    ProcessTuning,
+    formatCpuList,
+    parseCpuList,
+)
+
+
+class ProcessTuningBox(MessageBoxBase):
+    """服务器的进程调度设置，保存到服务器目录，下次启动时生效，服务器运行中时立即应用"""
+
+    def __init__(self, serverName: str, parent=None):
+        super().__init__(parent)
+        self.serverName = serverName
+        self.tuning = ProcessTuning.load(serverName)
+        allocator = CoreAllocator()
+
+        self.titleLabel = SubtitleLabel(self.tr("进程调度"), self)
+        self.niceSpinBox = SpinBox(self)
+        self.niceSpinBox.setRange(-20, 19)
+        self.niceSpinBox.setValue(self.tuning.nice)
+        self.ioClassComboBox = ComboBox(self)
+        self.ioClassComboBox.addItems(
+            [self.tr("默认"), self.tr("高"), self.tr("低"), self.tr("空闲时")]
+        )
+        self.ioClassComboBox.setCurrentIndex(IO_CLASSES.index(self.tuning.ioClass))
+        self.affinityComboBox = ComboBox(self)
+        self.affinityComboBox.addItems(
+            [self.tr("不限制"), self.tr("自动分配物理核心"), self.tr("手动指定")]
+        )
+        self.affinityComboBox.setCurrentIndex(AFFINITY_MODES.index(self.tuning.affinityMode))
+        self.cpusLineEdit = LineEdit(self)
+        self.cpusLineEdit.setPlaceholderText(self.tr("如 2-5,8"))
+        self.cpusLineEdit.setText(formatCpuList(self.tuning.cpus))
+        self.affinityComboBox.currentIndexChanged.connect(self.updateCpusLineEdit)
+        self.updateCpusLineEdit()
+
+        topology = allocator.topology
+        self.topologyLabel = CaptionLabel(
+            self.tr("可用CPU：{cpus}，{cores}个物理核心，{nodes}个NUMA节点").format(
+                cpus=formatCpuList(allocator.allCpus()),
+                cores=len(topology.cores),
+                nodes=len(topology.nodes),
+            ),
+            self,
+        )
+        self.tipLabel = CaptionLabel(
+            self.tr(
+                "优先级数值越小越优先，调高优先级(负数)可能需要管理员权限；"
+                "Windows下按数值换算为优先级类别。\n"
+                "自动分配时，核心足够的情况下第一个物理核心留给MCSL2，"
+                "其余核心在自动模式的服务器之间平均分配，并尽量不跨NUMA节点。"
+            ),
+            self,
+        )
+        self.tipLabel.setWordWrap(True)
+        self.errorLabel = CaptionLabel(self)
+        self.errorLabel.setTextColor("#cf1010", "#ff1c20")
+        self.errorLabel.hide()
+
+        formLayout = QFormLayout()
+        formLayout.setSpacing(10)
+        formLayout.addRow(BodyLabel(self.tr("优先级(nice)："), self), self.niceSpinBox)
+        formLayout.addRow(BodyLabel(self.tr("I/O优先级："), self), self.ioClassComboBox)
+        formLayout.addRow(BodyLabel(self.tr("CPU亲和性："), self), self.affinityComboBox)
+        formLayout.addRow(BodyLabel(self.tr("指定CPU："), self), self.cpusLineEdit)
+
+        self.viewLayout.addWidget(self.titleLabel)
+        self.viewLayout.addLayout(formLayout)
+        self.viewLayout.addWidget(self.topologyLabel)
+        self.viewLayout.addWidget(self.tipLabel)
+        self.viewLayout.addWidget(self.errorLabel)
+
+        self.yesButton.setText(self.tr("保存"))
+        self.cancelButton.setText(self.tr("取消"))
+        self.widget.setMinimumWidth(480)
+
+    def updateCpusLineEdit(self):
+        self.cpusLineEdit.setEnabled(self.affinityComboBox.currentIndex() == 2)
+
+    def validate(self) -> bool:
+        cpus = []
+        if AFFINITY_MODES[self.affinityComboBox.currentIndex()] == "manual":
+            try:
+                cpus = parseCpuList(self.cpusLineEdit.text())
+            except ValueError:
+                cpus = []
+            available = set(CoreAllocator().allCpus())
+            if not cpus or not set(cpus) <= available:
+                self.errorLabel.setText(self.tr("请填写可用CPU范围内的CPU编号"))
+                self.errorLabel.show()
+                return False
+        self.tuning = ProcessTuning(
+            self.niceSpinBox.value(),
+            IO_CLASSES[self.ioClassComboBox.currentIndex()],
+            AFFINITY_MODES[self.affinityComboBox.currentIndex()],
+            cpus,
+        )
+        try:
+            self.tuning.save(self.serverName)
+        except OSError as e:
+            self.errorLabel.setText(self.tr("保存失败：") + str(e))
+            self.errorLabel.show()
+            return False
+        return True
@@ -0,0 +1,91 @@
+#     Copyright 2023, MCSL Team, mailto:lxhtt@vip.qq.com
+#
+#     Part of "MCSL2", a simple and multifunctional Minecraft server launcher.
+#
+#     Licensed under the GNU General Public License, Version 3.0, with our
+#     additional agreements. (the "License");
+#     you may not use this file except in compliance with the License.
+#     You may obtain a copy of the License at
+#
+#        https://github.com/MCSLTeam/MCSL2/raw/master/LICENSE
+#
+################################################################################
+"""
+A small line chart of a server's resource history.
+"""
+
+from math import isnan
+from typing import Callable, List, Optional
+
+from PyQt5.QtCore import QPointF, Qt
+from PyQt5.QtGui import QColor, QPainter, QPainterPath, QPen
+from PyQt5.QtWidgets import QWidget
+from qfluentwidgets import isDarkTheme
+
+from MCSL2Lib.Controllers.serverResourceController import ResourceHistory
+
+
+class ResourceHistoryChart(QWidget):
+    """
+    资源记录折线图。\n
+    把最近的采样按像素宽度分桶，每桶取最大值，因此几小时的记录也只画几百个点，
+    且短暂的峰值不会被平均掉。
+    """
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.history: Optional[ResourceHistory] = None
+        # (列名, 颜色, 返回纵轴最大值的函数)
+        self.series: List[tuple] = []
+        self.setMinimumHeight(40)
+
+    def setHistory(self, history: Optional[ResourceHistory]):
+        self.history = history
+        self.update()
+
+    def addSeries(self, column: str, color: QColor, maxValue: Callable[[List[float]], float]):
+        self.series.append((column, color, maxValue))
+        self.update()
+
+    @staticmethod
+    def bucketMax(values: List[float], buckets: int) -> List[float]:
+        if len(values) <= buckets:
+            return values
+        step = len(values) / buckets
+        result = []
+        for i in range(buckets):
+            bucket = [v for v in values[int(i * step) : int((i + 1) * step)] if not isnan(v)]
+            result.append(max(bucket) if bucket else float("nan"))
+        return result
+
+    def paintEvent(self, e):
+        painter = QPainter(self)
+        painter.setRenderHint(QPainter.Antialiasing)
+        rect = self.rect().adjusted(1, 1, -1, -1)
+        painter.setPen(QPen(QColor(255, 255, 255, 40) if isDarkTheme() else QColor(0, 0, 0, 30)))
+        painter.drawLine(rect.bottomLeft(), rect.bottomRight())
+        if self.history is None or len(self.history) < 2:
+            return
+        for column, color, maxValue in self.series:
+            values = self.bucketMax(self.history.column(column), max(rect.width(), 1))
+            top = maxValue(values)
+            if not top or isnan(top):
+                continue
+            path = QPainterPath()
+            started = False
+            xStep = rect.width() / max(len(values) - 1, 1)
+            for i, value in enumerate(values):
+                if isnan(value):
+                    started = False
+                    continue
+                point = QPointF(
+                    rect.left() + i * xStep,
+                    rect.bottom() - min(value / top, 1.0) * rect.height(),
+                )
+                if started:
+                    path.lineTo(point)
+                else:
+                    path.moveTo(point)
+                    started = True
+            painter.setPen(QPen(color, 1.5, Qt.SolidLine, Qt.RoundCap, Qt.RoundJoin))
+            painter.drawPath(path)
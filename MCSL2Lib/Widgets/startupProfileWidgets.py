@@ -0,0 +1,144 @@
+#     Copyright 2023, MCSL Team, mailto:lxhtt@vip.qq.com
+#
+#     Part of "MCSL2", a simple and multifunctional Minecraft server launcher.
+#
+#     Licensed under the GNU General Public License, Version 3.0, with our
+#     additional agreements. (the "License");
+#     you may not use this file except in compliance with the License.
+#     You may obtain a copy of the License at
+#
+#        https://github.com/MCSLTeam/MCSL2/raw/master/LICENSE
+#
+################################################################################
+"""
+Stacked bar charts of server startup phases, for trends and per-server comparison.
+"""
+
+from datetime import datetime
+from typing import Dict, List, Tuple
+
+from PyQt5.QtCore import QRectF, Qt
+from PyQt5.QtGui import QColor, QPainter
+from PyQt5.QtWidgets import QWidget
+from qfluentwidgets import MessageBoxBase, StrongBodyLabel, SubtitleLabel, isDarkTheme
+
+from MCSL2Lib.Controllers.startupProfiler import loadStartupHistory, medianSegments
+
+PHASE_COLORS: Dict[str, QColor] = {
+    "spawn": QColor(120, 120, 120),
+    "firstOutput": QColor(22, 122, 232),
+    "loadingLibraries": QColor(0, 159, 170),
+    "preparingLevel": QColor(196, 139, 33),
+    "preparingSpawn": QColor(52, 185, 96),
+}
+
+
+class StartupPhaseChart(QWidget):
+    """
+    启动阶段堆叠条形图，每行一次启动(或一个服务器)，所有行共用同一横轴刻度。
+    """
+
+    rowHeight = 18
+    labelWidth = 110
+    totalWidth = 60
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        # (行标题, [(阶段, 毫秒)])
+        self.rows: List[Tuple[str, List[Tuple[str, int]]]] = []
+
+    def phaseNames(self) -> Dict[str, str]:
+        return {
+            "spawn": self.tr("JVM启动"),
+            "firstOutput": self.tr("服务端初始化"),
+            "loadingLibraries": self.tr("加载依赖与模组"),
+            "preparingLevel": self.tr("加载世界"),
+            "preparingSpawn": self.tr("准备出生点"),
+        }
+
+    def setRows(self, rows: List[Tuple[str, List[Tuple[str, int]]]]):
+        self.rows = rows
+        self.setMinimumHeight((len(rows) + 1) * (self.rowHeight + 4) + 4)
+        self.update()
+
+    def paintEvent(self, e):
+        painter = QPainter(self)
+        painter.setRenderHint(QPainter.Antialiasing)
+        textColor = QColor(255, 255, 255) if isDarkTheme() else QColor(0, 0, 0)
+        barWidth = max(self.width() - self.labelWidth - self.totalWidth, 1)
+        longest = max((sum(ms for _, ms in segments) for _, segments in self.rows), default=0)
+        y = 2
+        for title, segments in self.rows:
+            painter.setPen(textColor)
+            painter.drawText(
+                QRectF(0, y, self.labelWidth - 6, self.rowHeight),
+                Qt.AlignRight | Qt.AlignVCenter,
+                title,
+            )
+            x = float(self.labelWidth)
+            for phase, ms in segments:
+                width = ms / longest * barWidth if longest else 0
+                painter.fillRect(QRectF(x, y + 2, width, self.rowHeight - 4), PHASE_COLORS[phase])
+                x += width
+            painter.setPen(textColor)
+            painter.drawText(
+                QRectF(x + 4, y, self.totalWidth, self.rowHeight),
+                Qt.AlignLeft | Qt.AlignVCenter,
+                f"{sum(ms for _, ms in segments) / 1000:.1f}s",
+            )
+            y += self.rowHeight + 4
+        # 图例
+        x = float(self.labelWidth)
+        for phase, name in self.phaseNames().items():
+            painter.fillRect(QRectF(x, y + 5, 10, 10), PHASE_COLORS[phase])
+            painter.setPen(textColor)
+            width = painter.fontMetrics().horizontalAdvance(name)
+            painter.drawText(QRectF(x + 14, y, width + 2, self.rowHeight), Qt.AlignVCenter, name)
+            x += width + 26
+
+
+class StartupProfileBox(MessageBoxBase):
+    """启动分析：当前服务器最近几次启动的趋势，以及各服务器启动耗时的对比"""
+
+    trendCount = 10
+    compareCount = 5
+
+    def __init__(self, serverName: str, serverNames: List[str], parent=None):
+        super().__init__(parent)
+        self.titleLabel = SubtitleLabel(self.tr("启动分析"), self)
+        self.trendLabel = StrongBodyLabel(
+            self.tr("{name} 最近{count}次启动").format(name=serverName, count=self.trendCount),
+            self,
+        )
+        self.trendChart = StartupPhaseChart(self)
+        self.compareLabel = StrongBodyLabel(
+            self.tr("各服务器对比(最近{count}次的中位数)").format(count=self.compareCount), self
+        )
+        self.compareChart = StartupPhaseChart(self)
+
+        records = loadStartupHistory(serverName)[-self.trendCount :]
+        self.trendChart.setRows(
+            [
+                (datetime.fromtimestamp(r.time).strftime("%m-%d %H:%M"), r.segments())
+                for r in records
+            ]
+        )
+        compareRows = []
+        for name in serverNames:
+            history = loadStartupHistory(name)[-self.compareCount :]
+            if history:
+                compareRows.append((name, medianSegments(history)))
+        compareRows.sort(key=lambda row: sum(ms for _, ms in row[1]))
+        self.compareChart.setRows(compareRows)
+
+        self.viewLayout.addWidget(self.titleLabel)
+        self.viewLayout.addWidget(self.trendLabel)
+        self.viewLayout.addWidget(self.trendChart)
+        self.viewLayout.addWidget(self.compareLabel)
+        self.viewLayout.addWidget(self.compareChart)
+        if not records and not compareRows:
+            self.trendLabel.setText(self.tr("还没有启动记录，服务器完整启动一次后即可查看。"))
+
+        self.yesButton.setText(self.tr("关闭"))
+        self.cancelButton.hide()
+        self.widget.setMinimumWidth(640)
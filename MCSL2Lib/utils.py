@@ -16,9 +16,8 @@ These are the built-in functions of MCSL2. They are just for solving the circula
 
 import enum
 import functools
-import hashlib
 import inspect
-from json import loads
+import os
 from os import makedirs, path as osp
 from types import TracebackType
 from typing import Type, Optional, Iterable, Callable, Dict, List
@@ -40,10 +39,33 @@ class ServerUrl:
 
 
 def readGlobalServerConfig() -> list:
-    """读取全局服务器配置, 返回的是一个list"""
-    with open(r"MCSL2/MCSL2_ServerList.json", "r", encoding="utf-8") as globalServerConfigFile:
-        globalServerList = loads(globalServerConfigFile.read())["MCSLServerList"]
-    return globalServerList
+    """
+    读取全局服务器配置, 返回的是一个list\n
+    来自ServerConfigRepository的缓存，文件未修改时不会重新解析；修改返回的字典不会影响缓存。
+    """
+    from MCSL2Lib.Controllers.serverConfigRepository import ServerConfigRepository
+
+    return ServerConfigRepository().configs()
+
+
+def writeFileAtomic(path: str, text: str, errors: str = "strict"):
+    """
+    先写入同目录下的临时文件再替换，写入过程中崩溃或断电时原文件保持完整。\n
+    errors: 编码错误的处理方式，同open()
+    """
+    tmpPath = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(tmpPath, "w", encoding="utf-8", errors=errors) as f:
+            f.write(text)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmpPath, path)
+    except BaseException:
+        try:
+            os.remove(tmpPath)
+        except OSError:
+            pass
+        raise
 
 
 def initializeMCSL2():
@@ -63,11 +85,6 @@ def initializeMCSL2():
         if not osp.exists(folder):
             makedirs(folder, exist_ok=True)
 
-    if not osp.exists(r"./MCSL2/MCSL2_ServerList.json"):
-        with open(r"./MCSL2/MCSL2_ServerList.json", "w+", encoding="utf-8") as serverList:
-            serverListTemplate = '{\n  "MCSLServerList": [\n\n  ]\n}'
-            serverList.write(serverListTemplate)
-
     # set global thread pool
     QThreadPool.globalInstance().setMaxThreadCount(
         psutil.cpu_count(logical=True)
@@ -184,15 +201,19 @@ def checkSHA1(fileAndSha1: Iterable, _filter: Callable[[str, str], bool] = None)
     if _filter is None:
         def _filter(a, b):
             return True
-    for file, sha1 in fileAndSha1:
+    # 避免循环导入
+    from MCSL2Lib.Controllers.fileHashController import FileHashService
+
+    checks = [
+        (file, sha1, osp.exists(file) and _filter(file, sha1)) for file, sha1 in fileAndSha1
+    ]
+    digests = FileHashService().digestsMany(file for file, _, check in checks if check)
+    for file, sha1, check in checks:
         if not osp.exists(file):
             rv.append({"file": file, "result": False})
-            continue
-        if _filter(file, sha1):
-            # check sha1
-            with open(file, "rb") as f:
-                fileSha1 = hashlib.sha1(f.read()).hexdigest()
-            rv.append({"file": file, "result": fileSha1 == sha1})
+        elif check:
+            result = digests[file]
+            rv.append({"file": file, "result": result is not None and result.sha1 == sha1})
         else:
             rv.append({"file": file, "result": True})
     return rv
@@ -14,8 +14,10 @@
 These are the built-in variables of MCSL2.
 """
 
+from MCSL2Lib.Controllers.serverPropertiesController import ServerProperties
+from MCSL2Lib.Controllers.serverConfigRepository import ServerConfigRepository
 from MCSL2Lib.Controllers.settingsController import cfg
-from MCSL2Lib.utils import readGlobalServerConfig, warning
+from MCSL2Lib.utils import warning
 from MCSL2Lib.singleton import Singleton
 
 
@@ -317,9 +319,8 @@ class DownloadVariables:
         self.AkiraCoreDict = {}
 
 
-@Singleton
-class ServerVariables:
-    """需要开启的服务器的变量"""
+class BaseServerVariables:
+    """单个服务器的变量，每个服务器实例各持有一份"""
 
     def __init__(self):
         self.serverName: str = ""
@@ -331,13 +332,21 @@ class ServerVariables:
         self.jvmArg: list[str] = [""]
         self.outputDecoding: str = "utf-8"
         self.inputEncoding: str = "utf-8"
-        self.serverProperties = {}
         self.serverType: str = ""
         self.extraData = {}
 
+    @property
+    def serverProperties(self) -> ServerProperties:
+        """该服务器的server.properties，同名服务器共享同一份缓存"""
+        return ServerProperties.forServer(self.serverName)
+
     @warning("要为所有ServerVariables添加serverType和extraData属性")
     def initialize(self, index: int):
-        self.serverConfig: dict = readGlobalServerConfig()[index]
+        self.initializeFromConfig(ServerConfigRepository().at(index).toDict())
+
+    def initializeFromConfig(self, serverConfig: dict):
+        """从单个服务器的配置字典加载变量"""
+        self.serverConfig: dict = serverConfig
         self.serverName = self.serverConfig["name"]
         self.coreFileName = self.serverConfig["core_file_name"]
         self.javaPath = self.serverConfig["java_path"]
@@ -364,6 +373,18 @@ class ServerVariables:
             if self.inputEncoding == "follow":  # 跟随输出
                 self.inputEncoding = self.outputDecoding
 
+    def copy(self) -> "BaseServerVariables":
+        """复制一份独立的变量，供服务器实例使用"""
+        variables = BaseServerVariables()
+        if hasattr(self, "serverConfig"):
+            variables.initializeFromConfig(self.serverConfig)
+        return variables
+
+
+@Singleton
+class ServerVariables(BaseServerVariables):
+    """当前选中的服务器的变量"""
+
 
 @Singleton
 class SettingsVariables:
@@ -379,7 +400,7 @@ class SettingsVariables:
             "Akira Cloud镜像站",
         ]
         self.saveSameFileExceptionList = ["ask", "overwrite", "stop"]
-        self.outputDeEncodingList = ["utf-8", "GB18030", "ansi"]
+        self.outputDeEncodingList = ["auto", "utf-8", "GB18030", "ansi"]
         self.inputDeEncodingList = ["follow", "utf-8", "GB18030", "ansi"]
         self.themeList = ["auto", "dark", "light"]
 
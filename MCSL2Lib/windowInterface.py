@@ -19,7 +19,7 @@ from platform import system
 from platform import version as systemVersion
 from traceback import format_exception
 from types import TracebackType
-from typing import Type
+from typing import Dict, Type
 from PyQt5.QtCore import (
     QEvent,
     QObject,
@@ -41,6 +41,7 @@ from qfluentwidgets import (
     InfoBarPosition,
     MessageBox,
     HyperlinkButton,
+    PushButton,
     SplashScreen,
     isDarkTheme,
 )
@@ -51,13 +52,16 @@ from MCSL2Lib.Controllers.aria2ClientController import (
     initializeAria2Configuration,
     Aria2BootThread,
 )
+from MCSL2Lib.Controllers.fileHashController import FileHashService
+from MCSL2Lib.Controllers.memoryBudgetController import formatMemory
 from MCSL2Lib.Controllers.serverController import (
-    MinecraftServerResMonitorUtil,
     MojangEula,
-    ServerHandler,
+    ServerHandlerRegistry,
     ServerHelper,
     ServerLauncher,
 )
+from MCSL2Lib.Controllers.ServerSettingController import ServerSettingController
+from MCSL2Lib.Controllers.serverStatusController import ServerStatusPoller
 from MCSL2Lib.Controllers.settingsController import cfg
 from MCSL2Lib.Pages.configurePage import ConfigurePage
 from MCSL2Lib.Pages.consolePage import ConsolePage
@@ -90,6 +94,7 @@ serverVariables = ServerVariables()
 configureServerVariables = ConfigureServerVariables()
 editServerVariables = EditServerVariables()
 serverHelper = ServerHelper()
+serverRegistry = ServerHandlerRegistry()
 settingsVariables = SettingsVariables()
 
 pageLoadConfig = [
@@ -275,6 +280,7 @@ class Window(VerifyFluentWindowBase):
         if loaded.allPageLoaded():
             self.startFetchingNotice.connect(self.homeInterface.noticeThread.start)
             self.initNavigation()
+            ServerSettingController().validationFinished.connect(self.onServerValidationFinished)
             serverHelper.loadAtLaunch()
             self.initQtSlot()
             self.initPluginSystem()
@@ -319,7 +325,11 @@ class Window(VerifyFluentWindowBase):
         self.startFetchingNotice.emit()
 
     def closeEvent(self, a0) -> None:
-        if ServerHandler().isServerRunning():
+        if serverRegistry.isAnyServerRunning() and self.exitingMsgBox.isVisible():
+            # 正在关闭服务器，某个服务器关闭后会再次调用close
+            a0.ignore()
+            return
+        if serverRegistry.isAnyServerRunning():
             box = MessageBox(
                 self.tr("是否退出MCSL2？"),
                 self.tr("服务器正在运行。\n\n请在退出前先关闭服务器。"),
@@ -336,19 +346,25 @@ class Window(VerifyFluentWindowBase):
                 a0.ignore()
                 return
 
-            process = ServerHandler().Server.serverProcess
-            process.finished.connect(self.close)
-            process.write(b"stop\n")
+            # 所有服务器同时安全关闭，全部关闭后closeEvent会再次被调用
+            self.exitingServerProgress = {}
+            for handler in serverRegistry.runningHandlers():
+                handler.supervisor.expectExit()
+                handler.stopper.stop()
             self.exitingMsgBox.show()
             self.quitTimer.start()
 
             a0.ignore()
             return
 
+        ServerStatusPoller().shutdown()
+
         # close thread pool
         QThreadPool.globalInstance().clear()
         QThreadPool.globalInstance().waitForDone()
         QThreadPool.globalInstance().deleteLater()
+        # 线程池中的任务结束后立即写入文件哈希缓存
+        FileHashService().flush()
 
         try:
             workingThreads.closeAllThreads()
@@ -357,9 +373,19 @@ class Window(VerifyFluentWindowBase):
         finally:
             super().closeEvent(a0)
 
+    def onExitingServerStopProgress(self, serverName: str, message: str):
+        """在退出提示框中显示每个服务器的关闭进度"""
+        if not self.exitingMsgBox.isVisible():
+            return
+        self.exitingServerProgress[serverName] = message
+        self.exitingMsgBox.contentLabel.setText(
+            self.tr("安全关闭服务器中...\n\nMCSL2稍后将自行退出。\n\n")
+            + "\n".join(f"{name}：{text}" for name, text in self.exitingServerProgress.items())
+        )
+
     def onForceExit(self):
-        process = ServerHandler().Server.serverProcess
-        process.kill()
+        for handler in serverRegistry.runningHandlers():
+            handler.haltServer()
 
     def catchExceptions(
         self, ty: Type[BaseException], value: BaseException, _traceback: TracebackType
@@ -470,6 +496,7 @@ class Window(VerifyFluentWindowBase):
         self.exitingMsgBox.yesButton.clicked.connect(self.onForceExit)
         self.exitingMsgBox.yesButton.setEnabled(False)
         self.exitingMsgBox.hide()
+        self.exitingServerProgress: Dict[str, str] = {}
         self.quitTimer = QTimer(self)
         self.quitTimer.setInterval(3000)
         self.quitTimer.timeout.connect(lambda: self.exitingMsgBox.yesButton.setEnabled(True))
@@ -589,21 +616,55 @@ class Window(VerifyFluentWindowBase):
         self.selectNewJavaPage.setJavaPath.connect(self.serverManagerInterface.setJavaPath)
 
         # 终端
-        ServerHandler().serverLogOutput.connect(self.consoleInterface.colorConsoleText)
-        if cfg.get(cfg.clearConsoleWhenStopServer):
-            ServerHandler().serverClosed.connect(
-                lambda: self.consoleInterface.serverOutput.setPlainText("")
-            )
-        ServerHandler().serverClosed.connect(self.consoleInterface.showErrorHandlerReport)
+        serverHelper.serverName.connect(
+            lambda name: self.consoleInterface.bindServerHandler(serverRegistry.getOrCreate(name))
+        )
+        # 每个服务器的信号只在创建时连接一次
+        serverRegistry.handlerCreated.connect(self.connectServerHandler)
+        for handler in serverRegistry.handlers():
+            self.connectServerHandler(handler.serverName)
         # fmt: off
         self.pluginsInterface.refreshPluginListBtn.clicked.connect(self.initPluginSystem)
         self.stackedWidget.currentChanged.connect(self.serverManagerInterface.onPageChangedRefresh)
         self.stackedWidget.currentChanged.connect(self.downloadInterface.onPageChangedRefresh)
         # fmt: on
 
+    def connectServerHandler(self, serverName: str):
+        handler = serverRegistry.get(serverName)
+        handler.serverClosed.connect(lambda: self.onServerClosedResetExitBtn(serverName))
+        handler.serverClosed.connect(self.onExitingServerClosed)
+        handler.stopper.stopProgress.connect(
+            lambda _, message: self.onExitingServerStopProgress(serverName, message)
+        )
+        if cfg.get(cfg.clearConsoleWhenStopServer):
+            handler.serverClosed.connect(lambda: self.onServerClosedClearConsole(serverName))
+
+    def onExitingServerClosed(self):
+        """退出时安全关闭服务器，某个服务器关闭后再次尝试退出"""
+        if self.exitingMsgBox.isVisible():
+            self.close()
+
+    def onServerClosedClearConsole(self, serverName: str):
+        handler = serverRegistry.get(serverName)
+        handler.consoleBuffer.clear()
+        if self.consoleInterface.serverHandler is handler:
+            self.consoleInterface.serverOutput.syncModel()
+
     def startServer(self):
         """启动服务器总函数，直接放这里得了"""
-        firstTry = ServerLauncher().startServer()
+        handler = serverRegistry.current()
+        if handler.isServerRunning():
+            self.consoleInterface.bindServerHandler(handler)
+            self.switchTo(self.consoleInterface)
+            return
+        launcher = ServerLauncher(handler)
+        if (
+            cfg.get(cfg.checkMemoryBeforeLaunch)
+            and MojangEula(handler.serverName).checkEula()
+            and not self.confirmMemoryBudget(launcher)
+        ):
+            return
+        firstTry = launcher.startServer()
         if not firstTry:
             w = MessageBox(
                 title=self.tr("提示"),
@@ -613,7 +674,7 @@ class Window(VerifyFluentWindowBase):
                 parent=self,
             )
             w.yesButton.setText(self.tr("同意"))
-            w.yesSignal.connect(MojangEula().acceptEula)
+            w.yesSignal.connect(MojangEula(handler.serverName).acceptEula)
             w.yesSignal.connect(self.startServer)
             w.cancelButton.setText(self.tr("拒绝"))
             eulaBtn = HyperlinkButton(
@@ -623,35 +684,121 @@ class Window(VerifyFluentWindowBase):
             w.exec()
         else:
             self.switchTo(self.consoleInterface)
-            self.consoleInterface.errMsg = ""
-            self.consoleInterface.titleLabel.setText(self.tr(f"终端：{cfg.get(cfg.lastServer)}"))
+            self.consoleInterface.bindServerHandler(handler)
             self.navigationInterface.setCurrentItem(self.consoleInterface.objectName())
-            self.consoleInterface.serverOutput.setPlainText("")
-            self.serverMemThread = MinecraftServerResMonitorUtil(self)
-            self.serverMemThread.memPercent.connect(self.consoleInterface.setMemView)
-            self.serverMemThread.cpuPercent.connect(self.consoleInterface.setCPUView)
+            self.consoleInterface.serverOutput.syncModel()
             try:
                 self.consoleInterface.exitServer.clicked.disconnect()
             except TypeError:
                 pass
-            ServerHandler().serverClosed.connect(self.serverMemThread.onServerClosedHandler)
-            ServerHandler().serverClosed.connect(
-                self.consoleInterface.exitServer.clicked.disconnect
-            )
-            ServerHandler().serverClosed.connect(
-                lambda: self.consoleInterface.exitServer.clicked.connect(
-                    self.homeInterface.startServerBtn.click
-                )
-            )
-            ServerHandler().serverClosed.connect(
-                lambda: self.consoleInterface.exitServer.setText(self.tr("开启服务器"))
-            )
             self.consoleInterface.exitServer.clicked.connect(
                 self.consoleInterface.runQuickMenu_StopServer
             )
             self.consoleInterface.exitServer.setText(self.tr("关闭服务器"))
             GlobalMCSL2Variables.isLoadFinished = True
 
+    @pyqtSlot(list, list)
+    def onServerValidationFinished(self, invalid: list, adopted: list):
+        """报告启动时服务器配置检查的结果"""
+        if adopted:
+            InfoBar.info(
+                title=self.tr("已添加服务器"),
+                content=self.tr("以下服务器目录中有配置文件但不在列表中，已加入列表：\n")
+                + "\n".join(adopted),
+                orient=Qt.Horizontal,
+                isClosable=True,
+                position=InfoBarPosition.TOP,
+                duration=5000,
+                parent=self,
+            )
+        if not invalid:
+            return
+        lines = [
+            f"{result.name}：{'；'.join(result.problems) or self.tr('核心文件已变化')}"
+            for result in invalid[:5]
+        ]
+        if len(invalid) > 5:
+            lines.append(self.tr("等{count}个服务器，详见日志").format(count=len(invalid)))
+        InfoBar.warning(
+            title=self.tr("部分服务器配置有问题"),
+            content="\n".join(lines),
+            orient=Qt.Horizontal,
+            isClosable=True,
+            position=InfoBarPosition.TOP,
+            duration=-1,
+            parent=self,
+        )
+
+    def confirmMemoryBudget(self, launcher: ServerLauncher) -> bool:
+        """启动前检查内存，内存不足时询问是否降低最大内存；返回是否继续启动"""
+        decision = launcher.checkMemoryBudget()
+        if decision.verdict == "ok":
+            return True
+        detail = self.tr(
+            "本服务器预计占用{estimate}(最大内存{heap})，运行中的{count}个服务器预计占用{running}，"
+            "可供服务器使用的内存约{capacity}。"
+        ).format(
+            estimate=formatMemory(decision.estimate),
+            heap=formatMemory(decision.heap),
+            count=len(decision.running),
+            running=formatMemory(decision.needed - decision.estimate),
+            capacity=formatMemory(decision.capacity),
+        )
+        if decision.verdict == "warn":
+            InfoBar.warning(
+                title=self.tr("内存余量不多"),
+                content=detail + self.tr("所有服务器都占满内存时可能使用虚拟内存，导致卡顿。"),
+                orient=Qt.Horizontal,
+                isClosable=True,
+                position=InfoBarPosition.TOP,
+                duration=5000,
+                parent=self,
+            )
+            return True
+        forceStart = []
+        if decision.verdict == "reduce":
+            w = MessageBox(
+                title=self.tr("内存不足"),
+                content=detail
+                + self.tr("\n建议本次以{suggested}最大内存启动，服务器设置不会被修改。").format(
+                    suggested=formatMemory(decision.suggestedHeap)
+                ),
+                parent=self,
+            )
+            w.yesButton.setText(self.tr("降低后启动"))
+        else:
+            w = MessageBox(
+                title=self.tr("内存不足"),
+                content=detail + self.tr("\n即使降低最大内存也不够用，请先关闭其他服务器或程序。"),
+                parent=self,
+            )
+            w.yesButton.hide()
+        w.cancelButton.setText(self.tr("取消"))
+        forceButton = PushButton(self.tr("仍然启动"), w.buttonGroup)
+        forceButton.clicked.connect(lambda: (forceStart.append(True), w.accept()))
+        w.buttonLayout.addWidget(forceButton, 1, Qt.AlignVCenter)
+        if not w.exec():
+            return False
+        if not forceStart:
+            launcher.maxMemOverride = decision.suggestedHeap
+        MCSL2Logger.info(
+            f"服务器 {launcher.handler.serverName} 启动前内存检查：{decision.verdict}，"
+            + ("仍按原设置启动" if forceStart else f"降低为{formatMemory(decision.suggestedHeap)}")
+        )
+        return True
+
+    def onServerClosedResetExitBtn(self, serverName: str):
+        """终端正在显示的服务器关闭后，把关闭按钮恢复为开启按钮"""
+        handler = serverRegistry.get(serverName)
+        if self.consoleInterface.serverHandler is not handler or handler.isServerRunning():
+            return
+        try:
+            self.consoleInterface.exitServer.clicked.disconnect()
+        except TypeError:
+            pass
+        self.consoleInterface.exitServer.clicked.connect(self.homeInterface.startServerBtn.click)
+        self.consoleInterface.exitServer.setText(self.tr("开启服务器"))
+
     def eventFilter(self, a0: QObject, a1: QEvent) -> bool:
         if not GlobalMCSL2Variables.isLoadFinished:
             return super().eventFilter(a0, a1)
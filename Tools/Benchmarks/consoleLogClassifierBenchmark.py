@@ -0,0 +1,133 @@
+# 终端日志分类器的微基准测试
+# 用录制的 Paper/Forge 日志，对比旧版 colorConsoleText 的关键词循环 + replace 链
+# 与新的单次扫描分类器
+# 用法 (在仓库根目录):
+#   python Tools/Benchmarks/consoleLogClassifierBenchmark.py [日志文件] [重复次数]
+
+import sys
+from os import path as osp
+from re import search
+from time import perf_counter
+
+sys.path.insert(0, osp.abspath(osp.join(osp.dirname(__file__), "..", "..")))
+
+from MCSL2Lib.Controllers.consoleLogClassifier import ConsoleLogClassifier  # noqa: E402
+
+TRANSLATIONS = {
+    "Preparing spawn area": "准备生成点区域中",
+    "main/INFO": "主类/信息",
+    "main/WARN": "主类/警告",
+    "main/ERROR": "主类/错误",
+    "main/FATAL": "主类/致命错误",
+    "main/DEBUG": "主类/调试信息",
+    "INFO": "信息",
+    "WARN": "警告",
+    "ERROR": "错误",
+    "FATAL": "致命错误",
+    "DEBUG": "调试信息",
+    "Server thread": "服务器线程",
+    "Server-Worker": "服务器工作进程",
+    "Forge Version Check": "Forge版本检查",
+    "ModLauncher running: args": "ModLauncher运行中: 参数",
+    "All chunks are saved": "所有区块已保存",
+    "Saving the game (this may take a moment!)": "保存游戏存档中（可能需要一些时间）",
+    "Saved the game": "已保存游戏存档",
+}
+
+
+def tr(text):
+    return text
+
+
+def legacyClassify(serverOutput):
+    """旧版 ConsolePage.colorConsoleText 中与界面无关的部分"""
+    # fmt: off
+    greenText = ["INFO", "Info", "info", "tip", "tips", "hint", "HINT", "提示"]
+    orangeText = ["WARN", "Warning", "warn", "alert", "ALERT", "Alert", "CAUTION", "Caution", "警告"]  # noqa: E501
+    redText = ["ERR", "Err", "Fatal", "FATAL", "Critical", "Danger", "DANGER", "错", "at java", "at net", "at oolloo", "Caused by", "at sun"]  # noqa: E501
+    blueText = ["DEBUG", "Debug", "debug", "调试", "TEST", "Test", "Unknown command", "MCSL2"]
+    level = 0
+    for keyword in greenText:
+        if keyword in serverOutput:
+            level = 1
+    for keyword in orangeText:
+        if keyword in serverOutput:
+            level = 2
+    for keyword in redText:
+        if keyword in serverOutput:
+            level = 3
+    for keyword in blueText:
+        if keyword in serverOutput:
+            level = 4
+    serverOutput = (
+        serverOutput.replace("[38;2;170;170;170m", "")
+        .replace("[38;2;255;170;0m", "")
+        .replace("[38;2;255;255;255m", "")
+        .replace("[0m", "")
+        .replace("[38;2;255;255;85m", "")
+        .replace("[38;2;255;255;0m", "")
+        .replace("[38;2;255;85;85m", "")
+        .replace("[38;2;255;255;255m", "")
+        .replace("[3m", "")
+        .replace("[m[", "[")
+        .replace("[32m", "")
+        .replace("Preparing spawn area", tr("准备生成点区域中"))
+        .replace("main/INFO", tr("主类/信息"))
+        .replace("main/WARN", tr("主类/警告"))
+        .replace("main/ERROR", tr("主类/错误"))
+        .replace("main/FATAL", tr("主类/致命错误"))
+        .replace("main/DEBUG", tr("主类/调试信息"))
+        .replace("INFO", tr("信息"))
+        .replace("WARN", tr("警告"))
+        .replace("ERROR", tr("错误"))
+        .replace("FATAL", tr("致命错误"))
+        .replace("DEBUG", tr("调试信息"))
+        .replace("Server thread", tr("服务器线程"))
+        .replace("Server-Worker", tr("服务器工作进程"))
+        .replace("DEBUG", tr("调试信息"))
+        .replace("Forge Version Check", tr("Forge版本检查"))
+        .replace("ModLauncher running: args", tr("ModLauncher运行中: 参数"))
+        .replace("All chunks are saved", tr("所有区块已保存"))
+        .replace("Saving the game (this may take a moment!)", tr("保存游戏存档中（可能需要一些时间）"))  # noqa: E501
+        .replace("Saved the game", tr("已保存游戏存档"))
+    )
+    # fmt: on
+    if "Disabling terminal, you're running in an unsupported environment." in serverOutput:
+        return
+    if "Advanced terminal features are not available in this environment" in serverOutput:
+        return
+    if "Unable to instantiate org.fusesource.jansi.WindowsAnsiOutputStream" in serverOutput:
+        return
+    "Loading libraries, please wait..." in serverOutput
+    search(r"(?=.*Done)(?=.*!)", serverOutput)
+    "�" in serverOutput
+    return serverOutput, level
+
+
+def run(name, func, lines, repeat):
+    start = perf_counter()
+    for _ in range(repeat):
+        for line in lines:
+            func(line)
+    elapsed = perf_counter() - start
+    total = len(lines) * repeat
+    print(f"{name:<12}{total:>10} 行  {elapsed:>8.3f} 秒  {total / elapsed:>12,.0f} 行/秒")
+    return total / elapsed
+
+
+def main():
+    logFile = (
+        sys.argv[1] if len(sys.argv) > 1 else osp.join(osp.dirname(__file__), "sampleServerLog.log")
+    )
+    repeat = int(sys.argv[2]) if len(sys.argv) > 2 else 2000
+    with open(logFile, "r", encoding="utf-8") as f:
+        lines = f.read().splitlines()
+
+    classifier = ConsoleLogClassifier(TRANSLATIONS)
+    before = run("旧版", legacyClassify, lines, repeat)
+    after = run("单次扫描", classifier.classify, lines, repeat)
+    print(f"提升：{after / before:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+# 文件哈希服务的基准测试与校验
+# 生成若干个核心文件大小的临时文件，比较:
+#   1. 原来的做法: 每种哈希各把整个文件读入内存计算一次
+#   2. FileHashService: 分块读取一次同时计算MD5、SHA1、SHA256，在线程池中并行
+#   3. FileHashService: 文件没有变化时使用缓存
+# 用法 (在仓库根目录):
+#   python Tools/Benchmarks/fileHashBenchmark.py [文件数量] [文件MB]
+
+import hashlib
+import os
+import sys
+import tempfile
+from os import path as osp
+from time import perf_counter
+
+sys.path.insert(0, osp.abspath(osp.join(osp.dirname(__file__), "..", "..")))
+
+from MCSL2Lib.Controllers.fileHashController import FileHashService  # noqa: E402
+
+MB = 1048576
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 8
+    size = int(sys.argv[2]) if len(sys.argv) > 2 else 60
+    with tempfile.TemporaryDirectory() as root:
+        block = os.urandom(MB)
+        files = []
+        for i in range(count):
+            file = osp.join(root, f"core{i}.jar")
+            with open(file, "wb") as f:
+                f.write(str(i).encode())
+                for _ in range(size):
+                    f.write(block)
+            files.append(file)
+
+        start = perf_counter()
+        expected = {}
+        for file in files:
+            with open(file, "rb") as f:
+                md5 = hashlib.md5(f.read()).hexdigest()
+            with open(file, "rb") as f:
+                sha1 = hashlib.sha1(f.read()).hexdigest()
+            with open(file, "rb") as f:
+                sha256 = hashlib.sha256(f.read()).hexdigest()
+            expected[file] = (md5, sha1, sha256)
+        whole = perf_counter() - start
+
+        service = FileHashService(osp.join(root, "cache.json"))
+        start = perf_counter()
+        results = service.digestsMany(files)
+        streaming = perf_counter() - start
+        assert {file: tuple(d) for file, d in results.items()} == expected
+
+        start = perf_counter()
+        results = service.digestsMany(files)
+        cached = perf_counter() - start
+        assert {file: tuple(d) for file, d in results.items()} == expected
+        # 删除临时目录前写入缓存，避免延迟写入时目录已不存在
+        service.flush()
+
+    total = count * size
+    print(f"{count}个文件，共{total}MB")
+    print(f"整个读入内存，三种哈希各读一次：{whole * 1000:.0f}ms")
+    print(f"分块读取一次，线程池并行：{streaming * 1000:.0f}ms")
+    print(f"使用缓存：{cached * 1000:.2f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+# JVM hsperfdata 读取的微基准测试与校验
+# 生成一个 G1 布局的模拟 hsperfdata 文件，校验解析结果，并测量每次采样的耗时
+# (对比: 每秒运行一次 jstat 需要启动一个新的 JVM，耗时在数百毫秒量级)
+# 用法 (在仓库根目录):
+#   python Tools/Benchmarks/hsperfdataBenchmark.py [次数]
+#   python Tools/Benchmarks/hsperfdataBenchmark.py --pid <Java进程PID>   读取真实 JVM 并打印统计
+
+import os
+import struct
+import sys
+import tempfile
+from os import path as osp
+from time import perf_counter
+
+sys.path.insert(0, osp.abspath(osp.join(osp.dirname(__file__), "..", "..")))
+
+from MCSL2Lib.Controllers.jvmPerfDataController import HotSpotPerfData  # noqa: E402
+
+MB = 1048576
+FREQUENCY = 1_000_000_000
+COUNTERS = {
+    "sun.os.hrt.frequency": FREQUENCY,
+    "sun.gc.generation.0.spaces": 3,
+    "sun.gc.generation.0.capacity": 256 * MB,
+    "sun.gc.generation.0.maxCapacity": 1024 * MB,
+    "sun.gc.generation.0.space.0.used": 100 * MB,
+    "sun.gc.generation.0.space.1.used": 0,
+    "sun.gc.generation.0.space.2.used": 12 * MB,
+    "sun.gc.generation.1.spaces": 1,
+    "sun.gc.generation.1.capacity": 512 * MB,
+    "sun.gc.generation.1.maxCapacity": 1024 * MB,
+    "sun.gc.generation.1.space.0.used": 300 * MB,
+    "sun.gc.metaspace.used": 80 * MB,
+    "sun.gc.collector.0.invocations": 40,
+    "sun.gc.collector.0.time": 2 * FREQUENCY,
+    "sun.gc.collector.1.invocations": 2,
+    "sun.gc.collector.1.time": FREQUENCY // 2,
+    "sun.rt.safepointTime": 3 * FREQUENCY,
+    "java.cls.loadedClasses": 23456,
+}
+# 填充一些不读取的计数器，使条目数接近真实 JVM (约 300 个)
+FILLER = {f"sun.filler.counter.{i}": i for i in range(280)}
+
+
+def buildEntry(name, value):
+    nameBytes = name.encode("ascii") + b"\x00"
+    if isinstance(value, str):
+        data, dataType, vectorLength = value.encode() + b"\x00", b"B", len(value) + 1
+    else:
+        data, dataType, vectorLength = struct.pack("<q", value), b"J", 0
+    nameOffset = 20
+    dataOffset = (nameOffset + len(nameBytes) + 7) // 8 * 8
+    length = (dataOffset + len(data) + 7) // 8 * 8
+    entry = bytearray(length)
+    struct.pack_into("<iiicBBBi", entry, 0, length, nameOffset, vectorLength, dataType, 0, 0, 0, dataOffset)  # noqa: E501
+    entry[nameOffset : nameOffset + len(nameBytes)] = nameBytes
+    entry[dataOffset : dataOffset + len(data)] = data
+    return bytes(entry), dataOffset
+
+
+def buildPerfData(counters, size=32768):
+    """返回 (文件内容, 计数器名 -> 文件内的数据偏移)"""
+    body = bytearray()
+    offsets = {}
+    for name, value in counters.items():
+        entry, dataOffset = buildEntry(name, value)
+        offsets[name] = 32 + len(body) + dataOffset
+        body += entry
+    prologue = struct.pack(">I", 0xCAFEC0C0) + struct.pack(
+        "<BBBBiiqii", 1, 2, 0, 1, 32 + len(body), 0, 0, 32, len(counters)
+    )
+    return (prologue + body).ljust(size, b"\x00"), offsets
+
+
+def check(path, offsets):
+    perfData = HotSpotPerfData(path)
+    stats = perfData.sample()
+    expected = {
+        "heapUsed": 412 * MB,
+        "heapCommitted": 768 * MB,
+        "heapMax": 2048 * MB,
+        "metaspaceUsed": 80 * MB,
+        "gcCount": 42,
+        "gcTime": 2.5,
+        "safepointTime": 3.0,
+        "loadedClasses": 23456,
+    }
+    failed = [k for k, v in expected.items() if getattr(stats, k) != v]
+    # 映射是共享的：JVM 改写计数器后，不重新打开文件就能读到新值
+    with open(path, "r+b") as f:
+        f.seek(offsets["sun.gc.generation.1.space.0.used"])
+        f.write(struct.pack("<q", 500 * MB))
+    if perfData.sample().heapUsed != 612 * MB:
+        failed.append("heapUsed(更新后)")
+    with open(path, "r+b") as f:
+        f.seek(offsets["sun.gc.generation.1.space.0.used"])
+        f.write(struct.pack("<q", 300 * MB))
+    perfData.close()
+    for name in failed:
+        print(f"校验失败：{name}")
+    return not failed
+
+
+def printLive(pid):
+    perfData = HotSpotPerfData.forPid(pid)
+    if perfData is None:
+        print(f"找不到进程 {pid} 的 hsperfdata 文件")
+        sys.exit(1)
+    print(perfData.path)
+    for key, value in perfData.sample()._asdict().items():
+        print(f"{key:<16}{value}")
+    perfData.close()
+
+
+def main():
+    if len(sys.argv) > 2 and sys.argv[1] == "--pid":
+        printLive(int(sys.argv[2]))
+        return
+    repeat = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    data, offsets = buildPerfData({**FILLER, **COUNTERS})
+    fd, path = tempfile.mkstemp(prefix="hsperfdata-")
+    with os.fdopen(fd, "wb") as f:
+        f.write(data)
+    try:
+        if not check(path, offsets):
+            sys.exit(1)
+        start = perf_counter()
+        perfData = HotSpotPerfData(path)
+        opened = perf_counter() - start
+        start = perf_counter()
+        for _ in range(repeat):
+            perfData.sample()
+        elapsed = perf_counter() - start
+        perfData.close()
+        print(f"打开并解析 {len(COUNTERS) + len(FILLER)} 个计数器：{opened * 1000:.3f} 毫秒")
+        print(f"采样 {repeat} 次：{elapsed:.3f} 秒，每次 {elapsed / repeat * 1e6:.1f} 微秒")
+    finally:
+        os.remove(path)
+
+
+if __name__ == "__main__":
+    main()
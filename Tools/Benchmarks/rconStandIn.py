@@ -0,0 +1,155 @@
+# 本地 RCON 替身服务器，模拟原版 Minecraft 的 RCON 行为，用于测试 MCSL2 的 RCON 客户端
+# 支持认证、指令回显、list、超过 4096 字节的分包响应、未知类型的包；请求按到达顺序逐条处理
+# 用法 (在仓库根目录):
+#   python Tools/Benchmarks/rconStandIn.py [端口] [密码]      作为独立服务器运行
+#   python Tools/Benchmarks/rconStandIn.py --check    启动替身并用 RconClient 做流水线请求校验
+
+import asyncio
+import os
+import struct
+import sys
+import threading
+from os import path as osp
+from time import perf_counter
+
+sys.path.insert(0, osp.abspath(osp.join(osp.dirname(__file__), "..", "..")))
+
+from MCSL2Lib.Controllers.rconController import (  # noqa: E402
+    PACKET_COMMAND,
+    PACKET_LOGIN,
+    PACKET_RESPONSE,
+    encodePacket,
+)
+
+# 原版单个响应包的最大正文长度
+MAX_RESPONSE_BODY = 4096
+PLAYERS = ["Steve", "Alex"]
+
+
+def respond(command: str) -> str:
+    if command == "list":
+        return f"There are {len(PLAYERS)} of a max of 20 players online: {', '.join(PLAYERS)}"
+    if command.startswith("long "):
+        return "x" * int(command.split()[1])
+    return f"ran: {command}"
+
+
+async def handleClient(reader, writer, password):
+    authed = False
+    try:
+        while True:
+            length = struct.unpack("<i", await reader.readexactly(4))[0]
+            payload = await reader.readexactly(length)
+            requestId, packetType = struct.unpack_from("<ii", payload)
+            body = payload[8:].rstrip(b"\x00").decode("utf-8")
+            if packetType == PACKET_LOGIN:
+                authed = body == password
+                writer.write(encodePacket(requestId if authed else -1, PACKET_COMMAND, ""))
+            elif not authed:
+                writer.write(encodePacket(-1, PACKET_COMMAND, ""))
+            elif packetType == PACKET_COMMAND:
+                response = respond(body).encode("utf-8")
+                # 与原版一样按 4096 字节分包
+                for start in range(0, len(response) or 1, MAX_RESPONSE_BODY):
+                    chunk = response[start : start + MAX_RESPONSE_BODY].decode("utf-8")
+                    writer.write(encodePacket(requestId, PACKET_RESPONSE, chunk))
+            else:
+                # 与原版一样回应未知类型的包，客户端以此作为响应结束的标记
+                writer.write(
+                    encodePacket(requestId, PACKET_RESPONSE, f"Unknown request {packetType:x}")
+                )
+            await writer.drain()
+    except (asyncio.IncompleteReadError, ConnectionError):
+        pass
+    finally:
+        writer.close()
+
+
+async def serve(port, password, started=None):
+    server = await asyncio.start_server(
+        lambda r, w: handleClient(r, w, password), "127.0.0.1", port
+    )
+    if started is not None:
+        started.set_result(server.sockets[0].getsockname()[1])
+    async with server:
+        await server.serve_forever()
+
+
+def startInThread(password):
+    """在后台线程启动替身服务器，返回实际监听的端口"""
+    loop = asyncio.new_event_loop()
+    started = loop.create_future()
+    threading.Thread(
+        target=lambda: loop.run_until_complete(serve(0, password, started)), daemon=True
+    ).start()
+    while not started.done():
+        pass
+    return started.result()
+
+
+def check():
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    from PyQt5.QtCore import QCoreApplication, QElapsedTimer
+
+    from MCSL2Lib.Controllers.rconController import RconClient, RconEndpoint
+
+    app = QCoreApplication([])
+    port = startInThread("secret")
+
+    def waitFor(condition, timeout=5000):
+        timer = QElapsedTimer()
+        timer.start()
+        while not condition() and timer.elapsed() < timeout:
+            app.processEvents()
+        return condition()
+
+    failed = []
+    failures = []
+    bad = RconClient(RconEndpoint("127.0.0.1", port, "wrong"))
+    bad.authFailed.connect(lambda: failures.append(1))
+    bad.request("list", failures.append)
+    if not waitFor(lambda: len(failures) == 2) or failures[1] is not None:
+        failed.append("错误密码应认证失败并以None回调")
+
+    client = RconClient(RconEndpoint("127.0.0.1", port, "secret"))
+    count = 500
+    results = {}
+    start = perf_counter()
+    # 认证完成前就发出全部请求，验证排队与流水线
+    for i in range(count):
+        client.request(f"say {i}", lambda r, i=i: results.__setitem__(i, r))
+    client.request("long 10000", lambda r: results.__setitem__("long", r))
+    # 正文恰好为一个包的最大长度
+    client.request(f"long {MAX_RESPONSE_BODY}", lambda r: results.__setitem__("exact", r))
+    client.request("list", lambda r: results.__setitem__("list", r))
+    if not waitFor(lambda: len(results) == count + 3):
+        failed.append(f"只收到 {len(results)} 个响应")
+    elapsed = perf_counter() - start
+    if any(results.get(i) != f"ran: say {i}" for i in range(count)):
+        failed.append("响应与请求id不匹配")
+    if results.get("long") != "x" * 10000:
+        failed.append("分包响应未正确拼接")
+    if results.get("exact") != "x" * MAX_RESPONSE_BODY:
+        failed.append("正文恰好 4096 字节的响应未正确结束")
+    if results.get("list") != respond("list"):
+        failed.append("list 响应不正确")
+    client.close()
+    for item in failed:
+        print(f"校验失败：{item}")
+    if failed:
+        sys.exit(1)
+    print(f"{count + 3} 个流水线请求全部匹配，耗时 {elapsed * 1000:.1f} 毫秒")
+
+
+def main():
+    if len(sys.argv) > 1 and sys.argv[1] == "--check":
+        check()
+        return
+    port = int(sys.argv[1]) if len(sys.argv) > 1 else 25575
+    password = sys.argv[2] if len(sys.argv) > 2 else "mcsl2"
+    print(f"RCON 替身服务器监听 127.0.0.1:{port}，密码 {password}")
+    asyncio.run(serve(port, password))
+
+
+if __name__ == "__main__":
+    main()
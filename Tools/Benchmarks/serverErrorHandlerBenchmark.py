@@ -0,0 +1,258 @@
+# 服务器报错分析器的语料基准测试与回归检查
+# 语料为录制的正常服务器日志中混入已知报错行，对比旧版逐行 if 链与新的规则表
+# 用法 (在仓库根目录):
+#   python Tools/Benchmarks/serverErrorHandlerBenchmark.py [轮数]
+#   python Tools/Benchmarks/serverErrorHandlerBenchmark.py --check   只运行回归检查
+
+import re
+import sys
+from os import path as osp
+from time import perf_counter
+
+sys.path.insert(0, osp.abspath(osp.join(osp.dirname(__file__), "..", "..")))
+
+from MCSL2Lib.Controllers.serverErrorHandler import ServerErrorHandler  # noqa: E402
+
+HERE = osp.dirname(__file__)
+
+# 回归用例：一行日志 -> 期望得到的诊断(None表示不应得到任何诊断)
+REGRESSION_CASES = [
+    (
+        'Exception in thread "main" java.lang.UnsupportedClassVersionError: a/B has been compiled '
+        "by a more recent version of the Java Runtime (class file version 61.0), this version of "
+        "the Java Runtime only recognizes class file versions up to 52.0",
+        "Java版本不正确，请更换Java。\n根据错误报告，推荐使用Java 17。",
+    ),
+    (
+        "Caused by: java.lang.UnsupportedClassVersionError: com/example/Broken has been compiled "
+        "by a more recent version of the Java Runtime",
+        "Java版本不正确，请更换Java。",
+    ),
+    (
+        "[11:02:13] [main/ERROR]: Unsupported Java detected (65.0). Only up to Java 20 is "
+        "supported.",
+        "该服务器正在使用的Java与服务器不兼容。\n请使用Java 20",
+    ),
+    (
+        "Minecraft 1.17 requires running the server with Java 16 or above. Download Java 16 (or "
+        "above) from https://adoptium.net/",
+        "该服务器正在使用的Java与服务器不匹配。\n请使用Java 16 or above！",
+    ),
+    (
+        "java.lang.OutOfMemoryError: Java heap space",
+        "服务器内存溢出。请检查服务器内存设置，不要超出可用内存，也不要太小。",
+    ),
+    (
+        "Invalid maximum heap size: -Xmx99999999G",
+        "服务器最大内存分配有误：\nInvalid maximum heap size: -Xmx99999999G",
+    ),
+    (
+        "Unrecognized VM option 'UseConcMarkSweepGC'",
+        "服务器JVM参数有误，请前往服务器管理页修改或删除以下参数：\nUseConcMarkSweepGC",
+    ),
+    (
+        "There is insufficient memory for the Java Runtime Environment to continue.",
+        "JVM内存分配不足，请尝试增加系统的虚拟内存。",
+    ),
+    (
+        "java.nio.file.FileSystemException: .\\world\\session.lock: 另一个程序正在使用此文件，"
+        "进程无法访问。",
+        "文件被占用，您的服务器可能多开，请检查任务管理器等。",
+    ),
+    (
+        "[12:00:05 WARN]: **** FAILED TO BIND TO PORT!",
+        "端口被占用，您的服务器可能多开，请检查任务管理器等。",
+    ),
+    (
+        "Error: Unable to access jarfile server.jar",
+        "无法访问Jar可执行文件，请检查文件是否存在，或更换服务器核心或名称。",
+    ),
+    ("加载 Java 代理时出错", "无法访问Jar可执行文件，请检查文件是否存在，或更换服务器核心或名称。"),
+    (
+        "java.lang.ArrayIndexOutOfBoundsException: Index 5 out of bounds for length 5",
+        "服务器发生数组越界错误，请尝试更换服务端。",
+    ),
+    (
+        "java.lang.ClassCastException: class A cannot be cast to class B",
+        "服务器发生类转换异常，请检查Java版本是否匹配。",
+    ),
+    (
+        "Error: could not open `C:\\Program Files\\Java\\jre1.8.0_351\\lib\\amd64\\jvm.cfg'",
+        "Java环境异常，请检查Java的安装是否完整，若无法确定原因，请尝试重装Java。",
+    ),
+    (
+        "[12:00:01 ERROR]: Failed to download vanilla jar",
+        "服务器下载原版核心文件失败，请检查网络，必要的情况下请使用代理。",
+    ),
+    (
+        "[12:00:05 ERROR]: Could not load 'plugins/Broken.jar' in folder 'plugins'",
+        "无法加载下列插件：\nplugins/Broken.jar",
+    ),
+    (
+        "[12:00:05 ERROR]: Error loading plugin 'Essentials' vX (Is it up to date?)",
+        "无法加载下列插件：\nEssentials",
+    ),
+    (
+        "[12:00:06 ERROR]: Error occurred while enabling LuckPerms v5.4.102 (Is it up to date?)",
+        "在启用 LuckPerms v5.4.102 时发生了错误",
+    ),
+    (
+        "[11:48:53] [main/FATAL] [net.minecraftforge.fml.ModLoader/LOADING]: Encountered an "
+        "unexpected exception",
+        "服务器出现意外崩溃，可能是由于模组冲突，请检查您的模组列表。\n如果使用的是整合包，"
+        "请使用整合包制作方提供的服务器专用包开服。",
+    ),
+    (
+        "[11:48:53] [main/ERROR]: §cMod §ecreate §crequires §eflywheel 0.6.10 §cor above",
+        "*create 模组出现问题！该模组需要前置 flywheel 0.6.10 或以上版本！",
+    ),
+    (
+        "[11:48:53] [main/ERROR]: \x1b[31mMod jei requires \x1b[0mforge 47.1.3",
+        "*jei 模组出现问题！该模组需要前置 forge 47.1.3！",
+    ),
+    ('[12:00:08 INFO]: Done (6.412s)! For help, type "help"', None),
+    ("[12:00:05 INFO]: Loading plugin LuckPerms v5.4.102", None),
+    (
+        "[12:01:30 WARN]: Can't keep up! Is the server overloaded? Running 2104ms or 42 ticks "
+        "behind",
+        None,
+    ),
+    ("This plugin requires nothing in particular", None),
+]
+
+
+def legacyDetect(errMsg):
+    """旧版 ServerErrorHandler.detect 的逐行 if 链(去掉了50行的限制与类级状态)"""
+    msg = ""
+    if "UnsupportedClassVersionError" in errMsg:
+        msg += "Java版本不正确，请更换Java。\n"
+    elif "Unsupported Java detected" in errMsg:
+        msg += "该服务器正在使用的Java与服务器不兼容。\n"
+        javaStart = errMsg.index("Only up to ") + 11
+        msg += f"请使用{errMsg[javaStart : javaStart + 7]}\n"
+    elif "requires running the server with" in errMsg:
+        msg += "该服务器正在使用的Java与服务器不匹配。\n"
+        msg += f"请使用{errMsg[errMsg.index('Java') + 4: errMsg.index('Java') + 11]}！\n"
+    elif "OutOfMemoryError" in errMsg:
+        msg += "服务器内存溢出。请检查服务器内存设置，不要超出可用内存，也不要太小。\n"
+    elif "Invalid maximum heap size" in errMsg:
+        msg += "服务器最大内存分配有误：\n" + errMsg + "\n"
+    elif "Unrecognized VM option" in errMsg:
+        msg += "服务器JVM参数有误：\n"
+    elif "There is insufficient memory for the Java Runtime Environment to continue" in errMsg:
+        msg += "JVM内存分配不足，请尝试增加系统的虚拟内存。\n"
+    elif "进程无法访问" in errMsg:
+        msg += "文件被占用，您的服务器可能多开，请检查任务管理器等。\n"
+    elif "FAILED TO BIND TO PORT" in errMsg:
+        msg += "端口被占用，您的服务器可能多开，请检查任务管理器等。\n"
+    elif "Unable to access jarfile" in errMsg:
+        msg += "无法访问Jar可执行文件，请检查文件是否存在，或更换服务器核心或名称。\n"
+    elif "加载 Java 代理时出错" in errMsg:
+        msg += "无法访问Jar可执行文件，请检查文件是否存在，或更换服务器核心或名称。\n"
+    elif "ArraylndexOutOfBoundsException" in errMsg:
+        msg += "服务器发生数组越界错误，请尝试更换服务端。\n"
+    elif "ClassCastException" in errMsg:
+        msg += "服务器发生类转换异常，请检查Java版本是否匹配。\n"
+    elif "could not open" in errMsg and "jvm.cfg" in errMsg:
+        msg += "Java环境异常，请检查Java的安装是否完整，若无法确定原因，请尝试重装Java。\n"
+    elif "Failed to download vanilla jar" in errMsg:
+        msg += "服务器下载原版核心文件失败，请检查网络，必要的情况下请使用代理。\n"
+    elif 'Exception in thread "main"' in errMsg:
+        msg += '服务端给出了如下报错：\nException in thread "main"\n请尝试更换Java版本或服务端。'
+    if "Could not load" in errMsg and "plugin" in errMsg:
+        startIdx = errMsg.index("Could not load '") + 16
+        msg += "无法加载下列插件：\n{}\n".format(errMsg[startIdx : errMsg.index("' ", startIdx)])
+    elif "Error loading plugin" in errMsg:
+        startIdx = errMsg.index(" '") + 2
+        msg += "无法加载下列插件：\n{}\n".format(errMsg[startIdx : errMsg.index("' ", startIdx)])
+    elif "Error occurred while enabling " in errMsg:
+        msg += f"在启用 {errMsg[errMsg.index('enabling ') + 9: errMsg.index(' (')]} 时发生了错误\n"
+    elif "Encountered an unexpected exception" in errMsg:
+        msg += "服务器出现意外崩溃，可能是由于模组冲突，请检查您的模组列表。\n"
+    elif "Mod" in errMsg and "requires" in errMsg:
+        modNameMatch = re.search(r"Mod (\w+) requires", errMsg)
+        preModMatch = re.search(r"requires (\w+ \d+\.\d+\.\d+)", errMsg)
+        if modNameMatch and preModMatch:
+            msg += f"*{modNameMatch.group(1)} 模组出现问题！\n"
+    return msg
+
+
+def check() -> bool:
+    failed = 0
+    for line, expected in REGRESSION_CASES:
+        diagnoses = ServerErrorHandler().detect(line)
+        if (expected is None and diagnoses) or (expected is not None and expected not in diagnoses):
+            failed += 1
+            print(f"失败：{line!r}\n  期望：{expected!r}\n  实际：{diagnoses!r}")
+    # 整批扫描与逐行扫描的结果应当一致，且重复的报错只保留一条
+    lines = [line for line, _ in REGRESSION_CASES] * 3
+    byLine, byBatch = ServerErrorHandler(), ServerErrorHandler()
+    for line in lines:
+        byLine.detect(line)
+    byBatch.detectLines(lines)
+    if list(byLine.diagnoses) != list(byBatch.diagnoses):
+        failed += 1
+        print("失败：整批扫描与逐行扫描的结果不一致")
+    expectedCount = len(
+        {d for line, _ in REGRESSION_CASES for d in ServerErrorHandler().detect(line)}
+    )
+    if len(byBatch.diagnoses) != expectedCount:
+        failed += 1
+        print(f"失败：去重后应有{expectedCount}条诊断，实际{len(byBatch.diagnoses)}条")
+    print(f"回归检查：{len(REGRESSION_CASES) + 2 - failed}/{len(REGRESSION_CASES) + 2} 通过")
+    return not failed
+
+
+def run(funcs, repeat):
+    """三种实现交替运行，各取最快的一轮，减少机器负载波动的影响"""
+    best = {name: float("inf") for name in funcs}
+    for _ in range(repeat):
+        for name, func in funcs.items():
+            start = perf_counter()
+            lines = func()
+            best[name] = min(best[name], perf_counter() - start)
+    speeds = {}
+    for name, elapsed in best.items():
+        speeds[name] = lines / elapsed
+        print(f"{name:<10}{lines:>10} 行  {elapsed * 1000:>8.3f} 毫秒{speeds[name]:>12,.0f} 行/秒")
+    return speeds
+
+
+def main():
+    if not check():
+        sys.exit(1)
+    if "--check" in sys.argv:
+        return
+    repeat = int(sys.argv[1]) if len(sys.argv) > 1 else 400
+    with open(osp.join(HERE, "sampleServerLog.log"), "r", encoding="utf-8") as f:
+        normal = f.read().splitlines()
+    with open(osp.join(HERE, "serverErrorCorpus.log"), "r", encoding="utf-8") as f:
+        errors = f.read().splitlines()
+    # 一次开服的日志：大量正常输出中夹杂少量报错
+    corpus = normal * 30 + errors + normal * 30
+
+    def legacy():
+        errMsg = ""
+        for line in corpus:
+            errMsg += legacyDetect(line)
+        return len(corpus)
+
+    def perLine():
+        handler = ServerErrorHandler()
+        for line in corpus:
+            handler.detect(line)
+        return len(corpus)
+
+    def batched():
+        handler = ServerErrorHandler()
+        for i in range(0, len(corpus), 2000):
+            handler.detectLines(corpus[i : i + 2000])
+        return len(corpus)
+
+    speeds = run({"旧版": legacy, "规则表逐行": perLine, "规则表整批": batched}, repeat)
+    print(f"逐行提升：{speeds['规则表逐行'] / speeds['旧版']:.2f}x")
+    print(f"整批提升：{speeds['规则表整批'] / speeds['旧版']:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+# Server List Ping 轮询基准：启动若干本地替身服务器，对比同一事件循环并发轮询与逐个轮询的耗时
+# 替身服务器按原版协议回应握手、状态请求和ping，每个回应前等待固定的延迟
+# 用法 (在仓库根目录): python Tools/Benchmarks/serverListPingBenchmark.py [服务器数] [延迟毫秒]
+
+import asyncio
+import json
+import sys
+from os import path as osp
+from time import perf_counter
+
+sys.path.insert(0, osp.abspath(osp.join(osp.dirname(__file__), "..", "..")))
+
+from MCSL2Lib.Controllers.serverStatusController import (  # noqa: E402
+    encodeString,
+    packet,
+    ping,
+    readVarInt,
+)
+
+STATUS = {
+    "version": {"name": "1.20.4", "protocol": 765},
+    "players": {"max": 20, "online": 2, "sample": [{"name": "Steve"}, {"name": "§aAlex"}]},
+    "description": {"text": "§6A ", "extra": [{"text": "Minecraft"}, " Server"]},
+}
+
+
+async def handleClient(reader, writer, delay):
+    try:
+        # 握手
+        await reader.readexactly(await readVarInt(reader))
+        # 状态请求
+        await readVarInt(reader)
+        await readVarInt(reader)
+        await asyncio.sleep(delay)
+        writer.write(packet(0x00, encodeString(json.dumps(STATUS))))
+        await writer.drain()
+        # ping
+        await readVarInt(reader)
+        await readVarInt(reader)
+        payload = await reader.readexactly(8)
+        await asyncio.sleep(delay)
+        writer.write(packet(0x01, payload))
+        await writer.drain()
+    except (asyncio.IncompleteReadError, ConnectionError):
+        pass
+    finally:
+        writer.close()
+
+
+async def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    delay = (int(sys.argv[2]) if len(sys.argv) > 2 else 20) / 1000
+    servers = [
+        await asyncio.start_server(lambda r, w: handleClient(r, w, delay), "127.0.0.1", 0)
+        for _ in range(count)
+    ]
+    ports = [s.sockets[0].getsockname()[1] for s in servers]
+
+    status = await ping("127.0.0.1", ports[0], 3.0)
+    assert status.online, status.error
+    assert status.playersOnline == 2 and status.sample == ("Steve", "Alex"), status
+    assert status.motd == "A Minecraft Server", status.motd
+    assert status.hasFullSample()
+    offline = await ping("127.0.0.1", 1, 1.0)
+    assert not offline.online
+
+    start = perf_counter()
+    for port in ports:
+        await ping("127.0.0.1", port, 3.0)
+    sequential = perf_counter() - start
+
+    start = perf_counter()
+    results = await asyncio.gather(*(ping("127.0.0.1", port, 3.0) for port in ports))
+    concurrent = perf_counter() - start
+    assert all(r.online for r in results)
+
+    print(f"{count} 个服务器，每次回应延迟 {delay * 1000:.0f} 毫秒")
+    print(f"逐个轮询：{sequential * 1000:.1f} 毫秒")
+    print(f"并发轮询：{concurrent * 1000:.1f} 毫秒 (延迟 {status.latency:.1f} 毫秒)")
+    for server in servers:
+        server.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
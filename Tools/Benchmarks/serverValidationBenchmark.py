@@ -0,0 +1,73 @@
+# 启动时服务器配置检查的基准测试
+# 在临时目录中生成若干个带核心文件的服务器，分别测量第一次检查(需要计算MD5)
+# 和之后的检查(使用MD5缓存)的耗时，并校验有问题的服务器能被报告
+# 用法 (在仓库根目录):
+#   python Tools/Benchmarks/serverValidationBenchmark.py [服务器数量] [核心文件MB]
+
+import os
+import sys
+import tempfile
+from os import path as osp
+from time import perf_counter
+
+sys.path.insert(0, osp.abspath(osp.join(osp.dirname(__file__), "..", "..")))
+
+from MCSL2Lib.Controllers.fileHashController import FileHashService  # noqa: E402
+from MCSL2Lib.Controllers.serverConfigRepository import ServerConfigRepository  # noqa: E402
+from MCSL2Lib.Controllers.ServerSettingController import ServerSettingController  # noqa: E402
+
+MB = 1048576
+BASE_CONFIG = {
+    "core_file_name": "server.jar",
+    "java_path": "java",
+    "min_memory": 1,
+    "max_memory": 4,
+    "memory_unit": "G",
+    "jvm_arg": [],
+    "output_decoding": "utf-8",
+    "input_encoding": "utf-8",
+    "icon": "Grass.png",
+    "server_type": "forge",
+    "extra_data": {},
+}
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    coreSize = int(sys.argv[2]) if len(sys.argv) > 2 else 60
+    with tempfile.TemporaryDirectory() as root:
+        os.chdir(root)
+        os.makedirs("MCSL2")
+        repository = ServerConfigRepository()
+        block = os.urandom(MB)
+        for i in range(count):
+            name = f"Server{i}"
+            os.makedirs(osp.join("Servers", name))
+            with open(osp.join("Servers", name, "server.jar"), "wb") as f:
+                # 每个核心文件的内容不同
+                f.write(name.encode())
+                for _ in range(coreSize):
+                    f.write(block)
+            repository.append(dict(BASE_CONFIG, name=name))
+        os.remove(osp.join("Servers", "Server0", "server.jar"))
+
+        controller = ServerSettingController()
+        start = perf_counter()
+        invalid = controller.load()
+        cold = perf_counter() - start
+        start = perf_counter()
+        invalid = controller.load()
+        warm = perf_counter() - start
+        assert [r.name for r in invalid] == ["Server0"], invalid
+        # 删除临时目录前写入缓存，避免延迟写入时目录已不存在
+        FileHashService().flush()
+        os.chdir(osp.dirname(root))
+
+    total = count * coreSize
+    print(f"{count}个服务器，核心文件共{total}MB")
+    print(f"第一次检查(计算MD5)：{cold * 1000:.0f}ms，{total / cold:.0f}MB/s")
+    print(f"之后的检查(使用缓存)：{warm * 1000:.1f}ms")
+
+
+if __name__ == "__main__":
+    main()
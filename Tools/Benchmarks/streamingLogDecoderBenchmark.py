@@ -0,0 +1,70 @@
+# 服务器输出解码的微基准测试
+# 把录制的日志按 CRLF 编码后切成 QProcess 常见的 4KB 块，对比旧版逐行 decode 与流式解码器
+# 用法 (在仓库根目录):
+#   python Tools/Benchmarks/streamingLogDecoderBenchmark.py [日志文件] [轮数]
+
+import sys
+from os import path as osp
+from time import perf_counter
+
+sys.path.insert(0, osp.abspath(osp.join(osp.dirname(__file__), "..", "..")))
+
+from MCSL2Lib.Controllers.serverOutputController import StreamingLogDecoder  # noqa: E402
+
+
+def legacyDecode(chunks, decoding="utf-8"):
+    """旧版 ServerHandler.serverLogOutputHandler 的切分与解码"""
+    partialData = b""
+    result = []
+    for newData in chunks:
+        partialData += newData
+        lines = partialData.split(b"\n")
+        partialData = lines.pop()
+        result.extend(line.decode(decoding, errors="replace")[:-1] for line in lines)
+    return result
+
+
+def streamingDecode(chunks):
+    decoder = StreamingLogDecoder()
+    result = []
+    for newData in chunks:
+        result.extend(decoder.feed(newData))
+    result.extend(decoder.flush())
+    return result
+
+
+def run(funcs, chunks, repeat):
+    """各实现交替运行，各取最快的一轮，减少机器负载波动的影响"""
+    best = {name: float("inf") for name in funcs}
+    for _ in range(repeat):
+        for name, func in funcs.items():
+            start = perf_counter()
+            lines = len(func(chunks))
+            best[name] = min(best[name], perf_counter() - start)
+    speeds = {}
+    for name, elapsed in best.items():
+        speeds[name] = lines / elapsed
+        print(f"{name:<10}{lines:>10} 行  {elapsed * 1000:>8.3f} 毫秒{speeds[name]:>12,.0f} 行/秒")
+    return speeds
+
+
+def main():
+    logFile = (
+        sys.argv[1] if len(sys.argv) > 1 else osp.join(osp.dirname(__file__), "sampleServerLog.log")
+    )
+    repeat = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+    with open(logFile, "r", encoding="utf-8") as f:
+        lines = f.read().splitlines() * 50
+    data = "".join(f"{line}\r\n" for line in lines).encode("utf-8")
+    chunks = [data[i : i + 4096] for i in range(0, len(data), 4096)]
+
+    # 旧版在多字节字符被切断时会得到替换字符，这里只统计新版解码正确与否
+    if streamingDecode(chunks) != lines:
+        print("流式解码结果与原文不一致！")
+        sys.exit(1)
+    speeds = run({"旧版": legacyDecode, "流式解码": streamingDecode}, chunks, repeat)
+    print(f"提升：{speeds['流式解码'] / speeds['旧版']:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,3 @@
-from json import dumps, loads
 from os import getcwd
 from re import search
 from PyQt5.QtCore import pyqtSlot, QSize, Qt, QRect, QThread, pyqtSignal
@@ -30,6 +29,7 @@ from qfluentwidgets import (
     InfoBar,
     StateToolTip,
 )
+from MCSL2Lib.Controllers.serverConfigRepository import ServerConfigRepository
 from MCSL2Lib.Controllers.settingsController import cfg
 from shutil import copytree
 from MCSL2Lib.variables import MCSLv1ImportVariables
@@ -708,47 +708,9 @@ class MCSLv1(QWidget):
             )
             return
 
-        # 写入全局配置
+        # 写入服务器配置
         try:
-            with open(
-                r"MCSL2/MCSL2_ServerList.json", "r", encoding="utf-8"
-            ) as globalServerListFile:
-                # old
-                globalServerList = loads(globalServerListFile.read())
-                globalServerListFile.close()
-
-            with open(
-                r"MCSL2/MCSL2_ServerList.json", "w+", encoding="utf-8"
-            ) as newGlobalServerListFile:
-                # 添加新的
-                globalServerList["MCSLServerList"].append(serverConfig)
-                newGlobalServerListFile.write(dumps(globalServerList, indent=4))
-            exitCode = 0
-        except Exception as e:
-            exitCode = 1
-            exit1Msg += f"\n{e}"
-
-        # 写入单独配置
-        try:
-            if not cfg.get(cfg.onlySaveGlobalServerConfig):
-                with open(
-                    f"Servers//{importVariables.serverName}//MCSL2ServerConfig.json",
-                    "w+",
-                    encoding="utf-8",
-                ) as serverListFile:
-                    serverListFile.write(dumps(serverConfig, indent=4))
-            else:
-                InfoBar.info(
-                    title=self.tr("功能提醒"),
-                    content=self.tr(
-                        "您在设置中开启了“只保存全局服务器设置”。\n将不会保存单独服务器设置。\n这有可能导致服务器迁移较为繁琐。"
-                    ),
-                    orient=Qt.Horizontal,
-                    isClosable=True,
-                    position=InfoBarPosition.TOP,
-                    duration=3000,
-                    parent=self,
-                )
+            ServerConfigRepository().append(serverConfig)
             exitCode = 0
         except Exception as e:
             exitCode = 1